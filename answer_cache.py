@@ -0,0 +1,209 @@
+"""
+Answer cache for /ask-question
+
+Answers are keyed by conversation, retrieval variant (e.g. the retrieval mode
+and context limits the answer was built with) and normalized question. A
+lookup that misses on the exact key falls back to the most similar cached
+question of the same conversation and variant when its embedding similarity is
+above a threshold. Entries
+are evicted LRU-first when over the entry or memory cap, expire after a TTL,
+and are dropped when a conversation is re-indexed. Concurrent identical
+questions share a single in-flight computation; if the request computing it is
+cancelled, a waiting request takes over instead of failing with it.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from embeddings import normalize_question
+
+# Result handed to coalesced waiters when the computing request was cancelled
+_ABANDONED = object()
+
+
+class AnswerCache:
+    def __init__(self, max_entries=1024, ttl_seconds=3600, max_bytes=64 * 1024 * 1024, similarity_threshold=0.95):
+        """
+        Args:
+            max_entries (int): Maximum cached answers (0 disables the cache)
+            ttl_seconds (float): Seconds an answer stays valid
+            max_bytes (int): Approximate memory cap for cached answers and question vectors
+            similarity_threshold (float): Minimum cosine similarity for a semantic hit
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()
+        # (conversation_id, variant) -> keys, the candidates for a semantic hit
+        self._buckets = {}
+        self._generations = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expired": 0}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, conversation_id, question, question_vector=None, variant=None):
+        """
+        Returns:
+            tuple: (value, hit_type) where hit_type is "exact" or "semantic", or (None, None) on a miss
+        """
+        if not self.enabled:
+            return None, None
+        key = self._key(conversation_id, question, variant)
+        now = time.time()
+        with self._lock:
+            entry = self._live_entry(key, now)
+            if entry is not None:
+                self._stats["exact_hits"] += 1
+                return entry["value"], "exact"
+
+            if question_vector is not None and self.similarity_threshold < 1.0:
+                best_key, best_score = None, self.similarity_threshold
+                for candidate in list(self._buckets.get(key[:2], ())):
+                    candidate_entry = self._live_entry(candidate, now, touch=False)
+                    if candidate_entry is None or candidate_entry["vector"] is None:
+                        continue
+                    score = float(np.dot(candidate_entry["vector"], question_vector))
+                    if score >= best_score:
+                        best_key, best_score = candidate, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self._stats["semantic_hits"] += 1
+                    return self._entries[best_key]["value"], "semantic"
+
+            self._stats["misses"] += 1
+            return None, None
+
+    def put(self, conversation_id, question, value, question_vector=None, generation=None, variant=None):
+        """Cache an answer; skipped if the conversation was invalidated since `generation` was read"""
+        if not self.enabled:
+            return
+        key = self._key(conversation_id, question, variant)
+        vector = None if question_vector is None else np.asarray(question_vector, dtype=np.float32)
+        size = len(json.dumps(value, default=str)) + (vector.nbytes if vector is not None else 0) + len(key[2])
+        with self._lock:
+            if generation is not None and generation != self._generations.get(conversation_id, 0):
+                return
+            self._remove(key)
+            self._entries[key] = {
+                "value": value,
+                "vector": vector,
+                "expires_at": time.time() + self.ttl_seconds,
+                "size": size
+            }
+            self._buckets.setdefault(key[:2], set()).add(key)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def generation(self, conversation_id):
+        with self._lock:
+            return self._generations.get(conversation_id, 0)
+
+    def invalidate(self, conversation_id):
+        """Drop every cached answer for a conversation (called when it is re-indexed)"""
+        with self._lock:
+            self._generations[conversation_id] = self._generations.get(conversation_id, 0) + 1
+            for bucket in [bucket for bucket in self._buckets if bucket[0] == conversation_id]:
+                for key in list(self._buckets.get(bucket, ())):
+                    self._remove(key)
+
+    async def get_or_compute(self, conversation_id, question, compute, question_vector=None, variant=None):
+        """
+        Return a cached answer or compute it, coalescing identical concurrent questions
+
+        Args:
+            conversation_id (str): Conversation being asked about
+            question (str): The question
+            compute (callable): Async function returning (value, cacheable)
+            question_vector (numpy.ndarray, optional): Question embedding for semantic lookup
+            variant (hashable, optional): How the answer is built (e.g. retrieval mode and limits); answers
+                for different variants are cached and coalesced separately
+
+        Returns:
+            tuple: (value, hit_type) where hit_type is "exact", "semantic", "coalesced" or None
+        """
+        value, hit_type = self.get(conversation_id, question, question_vector, variant)
+        if hit_type is not None:
+            return value, hit_type
+
+        key = self._key(conversation_id, question, variant)
+        while key in self._in_flight:
+            value = await asyncio.shield(self._in_flight[key])
+            if value is not _ABANDONED:
+                self._stats["coalesced"] += 1
+                return value, "coalesced"
+            # The computing request was cancelled; the first waiter to get here computes it instead
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        generation = self.generation(conversation_id)
+        try:
+            value, cacheable = await compute()
+            if cacheable:
+                self.put(conversation_id, question, value, question_vector, generation=generation, variant=variant)
+            future.set_result(value)
+            return value, None
+        except asyncio.CancelledError:
+            # Only this request went away; the waiters' requests are still alive
+            future.set_result(_ABANDONED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark retrieved so an unobserved failure isn't logged
+            future.exception()
+            raise
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["exact_hits"] + self._stats["semantic_hits"] + self._stats["misses"]
+            hits = self._stats["exact_hits"] + self._stats["semantic_hits"]
+            return {
+                **self._stats,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "in_flight": len(self._in_flight)
+            }
+
+    @staticmethod
+    def _key(conversation_id, question, variant):
+        return conversation_id, variant, normalize_question(question)
+
+    def _live_entry(self, key, now, touch=True):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] < now:
+            self._remove(key)
+            self._stats["expired"] += 1
+            return None
+        if touch:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry["size"]
+        keys = self._buckets.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._buckets[key[:2]]
@@ -0,0 +1,404 @@
+"""
+Audio preprocessing before transcription
+
+Uploads arrive in whatever shape the recorder produced: stereo, 44.1 or
+48 kHz, with long silent stretches. Whisper works on 16 kHz mono, so the rest
+is upload bandwidth and billed transcription time spent on nothing.
+`preprocess_audio` streams a recording through:
+
+1. decoding, block by block: PCM WAV files with the standard library, other
+   formats through an ffmpeg subprocess
+2. downmixing to mono and resampling to 16 kHz
+3. an energy-based voice-activity detector over 30 ms frames, which shortens
+   silences longer than `min_silence_ms` to `padding_ms` on each side
+
+and writes a 16-bit mono WAV. Memory use is bounded by the block size, not by
+the length of the recording. The RMS level of every frame of the output is
+returned too, so segmented transcription can find its cut points without
+decoding the file again.
+
+Cutting silence shifts every later timestamp, so the OffsetMap returned with
+the result maps times in the processed audio back to the original recording.
+Only quiet audio is removed; music or background chatter is kept.
+"""
+
+import bisect
+import logging
+import os
+import shutil
+import subprocess
+import wave
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 30
+BLOCK_SECONDS = 10.0
+
+
+class UnsupportedAudio(Exception):
+    """The recording can't be decoded here (not PCM WAV, and no ffmpeg to decode it)"""
+
+
+class OffsetMap:
+    """Maps times in the preprocessed audio back to the original recording"""
+
+    def __init__(self):
+        # Span i starts at output_starts[i] in the processed audio and at original_starts[i] in the original
+        self.output_starts = [0.0]
+        self.original_starts = [0.0]
+
+    def add(self, output_start, original_start):
+        self.output_starts.append(output_start)
+        self.original_starts.append(original_start)
+
+    @property
+    def cuts(self):
+        return len(self.output_starts) - 1
+
+    def to_original(self, seconds, end=False):
+        """
+        Args:
+            seconds (float): Time in the processed audio
+            end (bool): The time ends an interval, so at a cut it belongs to the span before the cut
+
+        Returns:
+            float: The same moment in the original recording
+        """
+        find = bisect.bisect_left if end else bisect.bisect_right
+        i = max(find(self.output_starts, seconds) - 1, 0)
+        return self.original_starts[i] + (seconds - self.output_starts[i])
+
+    def map_segments(self, segments):
+        """Timed segments ({"start", "end", ...}) with their times moved to the original recording"""
+        return [
+            {
+                **segment,
+                "start": round(self.to_original(float(segment.get("start", 0.0))), 3),
+                "end": round(self.to_original(float(segment.get("end", 0.0)), end=True), 3)
+            }
+            for segment in segments
+        ]
+
+
+def _pcm_to_float(raw, sample_width):
+    """Little-endian PCM bytes -> float32 samples in [-1, 1)"""
+    if sample_width == 1:
+        return (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    if sample_width == 2:
+        return np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    if sample_width == 3:
+        data = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = data[:, 0] | (data[:, 1] << 8) | (data[:, 2] << 16)
+        # Sign-extend the 24-bit values
+        values = (values << 8) >> 8
+        return values.astype(np.float32) / 8388608.0
+    if sample_width == 4:
+        return np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    raise UnsupportedAudio(f"Unsupported sample width: {sample_width} bytes")
+
+
+def _to_pcm16(samples):
+    return (np.clip(samples, -1.0, 32767 / 32768.0) * 32768.0).astype("<i2").tobytes()
+
+
+def _wav_blocks(wav, block_seconds):
+    channels, width = wav.getnchannels(), wav.getsampwidth()
+    frame_bytes = channels * width
+    block = max(int(wav.getframerate() * block_seconds), 1)
+    with wav:
+        while True:
+            raw = wav.readframes(block)
+            # A truncated file can end in the middle of a frame
+            raw = raw[:len(raw) // frame_bytes * frame_bytes]
+            if not raw:
+                break
+            yield _pcm_to_float(raw, width).reshape(-1, channels)
+
+
+def _ffmpeg_blocks(process, path, sample_rate, block_seconds):
+    block_bytes = max(int(sample_rate * block_seconds), 1) * 2
+    try:
+        while True:
+            raw = process.stdout.read(block_bytes)
+            raw = raw[:len(raw) // 2 * 2]
+            if not raw:
+                break
+            yield _pcm_to_float(raw, 2).reshape(-1, 1)
+        error = process.stderr.read().decode("utf-8", errors="replace").strip()
+        if process.wait() != 0:
+            raise UnsupportedAudio(f"ffmpeg could not decode {path}: {error[-300:]}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def open_audio(path, sample_rate, block_seconds=BLOCK_SECONDS):
+    """
+    Start decoding a recording
+
+    PCM WAV files are read directly at their own rate and channel count; other
+    formats are decoded by ffmpeg, which also downmixes and resamples them.
+
+    Returns:
+        tuple: (iterator of float32 arrays shaped (samples, channels), their sample rate)
+
+    Raises:
+        UnsupportedAudio: Not PCM WAV and ffmpeg is not installed
+    """
+    try:
+        wav = wave.open(str(path), "rb")
+    except (wave.Error, EOFError):
+        pass
+    else:
+        return _wav_blocks(wav, block_seconds), wav.getframerate()
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise UnsupportedAudio(f"{os.path.basename(path)} is not PCM WAV and ffmpeg is not installed")
+    process = subprocess.Popen(
+        [ffmpeg, "-nostdin", "-v", "error", "-i", str(path), "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    return _ffmpeg_blocks(process, path, sample_rate, block_seconds), sample_rate
+
+
+def frame_levels(samples, frame):
+    """RMS level of each whole `frame`-sample frame of mono samples"""
+    count = len(samples) // frame
+    return np.sqrt(np.mean(np.square(samples[:count * frame].reshape(count, frame)), axis=1))
+
+
+class LevelMeter:
+    """RMS level of every FRAME_MS frame of a stream of mono samples"""
+
+    def __init__(self, sample_rate):
+        self.frame = max(int(sample_rate * FRAME_MS / 1000), 1)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._levels = []
+
+    def process(self, samples):
+        pending = np.concatenate([self._pending, samples])
+        count = len(pending) // self.frame
+        if count:
+            self._levels.append(frame_levels(pending, self.frame))
+        self._pending = pending[count * self.frame:]
+
+    def levels(self):
+        """
+        Returns:
+            numpy.ndarray: float32 levels so far, the last (shorter) frame included
+        """
+        parts = list(self._levels)
+        if len(self._pending):
+            parts.append(frame_levels(self._pending, len(self._pending)))
+        return np.concatenate(parts).astype(np.float32) if parts else np.zeros(0, dtype=np.float32)
+
+
+def audio_levels(path, block_seconds=BLOCK_SECONDS):
+    """
+    RMS level of every FRAME_MS frame of a recording, downmixed to mono and read block by block
+
+    Returns:
+        numpy.ndarray: float32 levels, one per frame
+
+    Raises:
+        UnsupportedAudio: The recording can't be decoded here
+    """
+    blocks, sample_rate = open_audio(path, 16000, block_seconds)
+    meter = LevelMeter(sample_rate)
+    for samples in blocks:
+        meter.process(samples.mean(axis=1, dtype=np.float32) if samples.shape[1] > 1 else samples[:, 0])
+    return meter.levels()
+
+
+class Resampler:
+    """
+    Streaming linear-interpolation resampler
+
+    When downsampling, a moving average over one output period is applied
+    first so frequencies above the new Nyquist limit don't alias into speech.
+    State carries over between blocks, so the output is continuous.
+    """
+
+    def __init__(self, source_rate, target_rate):
+        self.step = source_rate / target_rate
+        self.width = max(int(round(self.step)), 1)
+        self._history = np.zeros(self.width - 1, dtype=np.float32)
+        self._last = None
+        # Position of the next output sample, in source samples from the start of the next block
+        self._position = 0.0
+
+    def process(self, samples):
+        if self.step == 1.0:
+            return samples
+        if self.width > 1:
+            padded = np.concatenate([self._history, samples])
+            sums = np.concatenate([[0.0], np.cumsum(padded, dtype=np.float64)])
+            filtered = ((sums[self.width:] - sums[:-self.width]) / self.width).astype(np.float32)
+            self._history = padded[len(padded) - (self.width - 1):]
+        else:
+            filtered = samples
+        if not len(filtered):
+            return filtered
+
+        # The previous block's last sample lets outputs fall between two blocks
+        buffer = filtered if self._last is None else np.concatenate([[self._last], filtered])
+        start = self._position + (len(buffer) - len(filtered))
+        last_index = len(buffer) - 1
+        count = int((last_index - start) // self.step) + 1 if last_index >= start else 0
+        positions = start + self.step * np.arange(count)
+        self._position = start + self.step * count - len(buffer)
+        self._last = buffer[-1]
+        return np.interp(positions, np.arange(len(buffer)), buffer).astype(np.float32)
+
+
+class SilenceTrimmer:
+    """
+    Streaming energy-based voice-activity detection and silence removal
+
+    Frames (FRAME_MS long) whose RMS level is below threshold_db (dBFS) are
+    silent. A silent run longer than min_silence_ms is cut down to padding_ms
+    after the preceding speech and padding_ms before the next; each cut is
+    recorded in the OffsetMap. Shorter pauses are kept as they are.
+    """
+
+    def __init__(self, sample_rate, threshold_db, min_silence_ms, padding_ms, offsets):
+        self.sample_rate = sample_rate
+        self.frame = max(int(sample_rate * FRAME_MS / 1000), 1)
+        self.threshold = 10 ** (threshold_db / 20)
+        self.min_silence = max(int(min_silence_ms // FRAME_MS), 1)
+        self.padding = min(max(int(padding_ms // FRAME_MS), 0), self.min_silence // 2)
+        self.offsets = offsets
+        self.input_samples = 0
+        self.output_samples = 0
+        self._pending = np.zeros(0, dtype=np.float32)
+        # Silent frames since the last speech, as (input position, frame), until the run is long enough to cut
+        self._run = []
+        self._cutting = False
+        self._tail = deque(maxlen=self.padding)
+        self._heard_speech = False
+
+    def process(self, samples):
+        """
+        Returns:
+            numpy.ndarray: The samples to keep so far
+        """
+        pending = np.concatenate([self._pending, samples])
+        count = len(pending) // self.frame
+        out = []
+        if count:
+            # One row per frame, a view on the buffer
+            frames = pending[:count * self.frame].reshape(count, self.frame)
+            levels = np.sqrt(np.mean(np.square(frames), axis=1))
+            for frame, level in zip(frames, levels):
+                self._add(frame, level >= self.threshold, out)
+        self._pending = pending[count * self.frame:]
+        return np.concatenate(out) if out else np.zeros(0, dtype=np.float32)
+
+    def flush(self):
+        """Samples still held back at the end of the stream"""
+        out = []
+        if len(self._pending):
+            level = np.sqrt(np.mean(np.square(self._pending)))
+            self._add(self._pending, level >= self.threshold, out)
+            self._pending = np.zeros(0, dtype=np.float32)
+        if not self._cutting:
+            # A short pause at the end is kept; a long one keeps only the padding after the last speech
+            self._emit([frame for _, frame in self._run], out)
+        self._run = []
+        return np.concatenate(out) if out else np.zeros(0, dtype=np.float32)
+
+    def _add(self, frame, is_speech, out):
+        position = self.input_samples
+        self.input_samples += len(frame)
+        if not is_speech:
+            if self._cutting:
+                self._tail.append((position, frame))
+                return
+            self._run.append((position, frame))
+            if len(self._run) > self.min_silence:
+                # Long enough to cut: the padding after the previous speech is kept now, the rest waits in the tail
+                if self._heard_speech:
+                    self._emit([f for _, f in self._run[:self.padding]], out)
+                self._tail.extend(self._run[len(self._run) - self.padding:] if self.padding else [])
+                self._run = []
+                self._cutting = True
+            return
+
+        if self._cutting:
+            resume_at = self._tail[0][0] if self._tail else position
+            self.offsets.add(self.output_samples / self.sample_rate, resume_at / self.sample_rate)
+            self._emit([f for _, f in self._tail], out)
+            self._tail.clear()
+            self._cutting = False
+        else:
+            self._emit([f for _, f in self._run], out)
+        self._run = []
+        self._heard_speech = True
+        self._emit([frame], out)
+
+    def _emit(self, frames, out):
+        for frame in frames:
+            out.append(frame)
+            self.output_samples += len(frame)
+
+
+def preprocess_audio(input_path, output_path, sample_rate=16000, threshold_db=-45.0, min_silence_ms=1000,
+                     padding_ms=300, block_seconds=BLOCK_SECONDS):
+    """
+    Downmix, resample and trim silence from a recording, streaming it block by block
+
+    Args:
+        input_path (str): The uploaded recording
+        output_path (str): Where to write the processed 16-bit mono WAV
+        sample_rate (int): Output sample rate
+        threshold_db (float): Frames quieter than this RMS level (dBFS) are silence
+        min_silence_ms (int): Silences at least this long are cut
+        padding_ms (int): Silence kept on each side of a cut
+        block_seconds (float): Audio decoded per block
+
+    Returns:
+        dict: input_bytes, output_bytes, input_seconds, output_seconds, "offsets" (OffsetMap to the original times)
+        and "levels" (RMS level of every FRAME_MS frame of the output)
+
+    Raises:
+        UnsupportedAudio: The recording can't be decoded here
+    """
+    blocks, source_rate = open_audio(input_path, sample_rate, block_seconds)
+    resampler = Resampler(source_rate, sample_rate)
+    offsets = OffsetMap()
+    trimmer = SilenceTrimmer(sample_rate, threshold_db, min_silence_ms, padding_ms, offsets)
+    meter = LevelMeter(sample_rate)
+
+    def write(out, samples):
+        meter.process(samples)
+        out.writeframes(_to_pcm16(samples))
+
+    try:
+        with wave.open(str(output_path), "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(sample_rate)
+            for samples in blocks:
+                mono = samples.mean(axis=1, dtype=np.float32) if samples.shape[1] > 1 else samples[:, 0]
+                write(out, trimmer.process(resampler.process(mono)))
+            write(out, trimmer.flush())
+    except BaseException:
+        blocks.close()
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    return {
+        "input_bytes": os.path.getsize(input_path),
+        "output_bytes": os.path.getsize(output_path),
+        "input_seconds": round(trimmer.input_samples / sample_rate, 3),
+        "output_seconds": round(trimmer.output_samples / sample_rate, 3),
+        "offsets": offsets,
+        "levels": meter.levels()
+    }
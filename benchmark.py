@@ -0,0 +1,545 @@
+"""
+Reproducible end-to-end performance benchmark
+
+Starts local stand-ins for the Friendli chat-completions and transcription
+endpoints (with configurable latency and payload size), runs the app under
+uvicorn with the in-process numpy vector store and the hashing embedder, and
+drives /upload-audio and /ask-question over HTTP at a controlled concurrency.
+
+Reports throughput and p50/p95/p99 latency per pipeline stage:
+
+- upload: the HTTP request, the job stages (preprocessing, transcribing,
+  chunking, indexing) and end-to-end time until the conversation is searchable
+- ask: the HTTP request, question embedding, retrieval and LLM generation
+
+Faults can be injected to exercise the client's retries, hedging and circuit
+breaker: a fraction of stub requests answered with 503, or stalled for
+--stall-seconds before answering.
+
+Results can be saved as a baseline and later runs compared against it; any
+stage slower (or throughput lower) than the baseline by more than the
+tolerance is reported as a regression and the exit code is 1.
+
+Usage:
+    python benchmark.py                                  # run, compare with benchmark_baseline.json if present
+    python benchmark.py --save-baseline benchmark_baseline.json
+    python benchmark.py --uploads 16 --ask-concurrency 32 --llm-latency 0.5 --output bench.json
+    python benchmark.py --llm-error-rate 0.05 --llm-stall-rate 0.03 --hedge --output faults.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import io
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_BASELINE = Path(__file__).with_name("benchmark_baseline.json")
+SAMPLE_RATE = 16000
+VOCABULARY = (
+    "budget roadmap launch hiring security latency parquet dataset customer pricing migration "
+    "database incident review design deadline owner risk metrics dashboard contract vendor "
+    "training model inference storage network release quarter revenue forecast onboarding"
+).split()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Concurrent benchmark clients must not queue up in the listen backlog
+    request_queue_size = 512
+
+
+class FriendliStub:
+    """
+    Local stand-in for the Friendli chat-completions and transcription endpoints
+
+    Chat requests get an answer of llm_tokens words after llm_latency seconds
+    (plus uniform jitter). Transcription requests get verbose_json segments
+    covering the uploaded WAV, words_per_second words per second of audio,
+    after whisper_latency seconds plus whisper_latency_per_minute per minute of audio.
+
+    Injected faults: a fraction of requests per endpoint (error_rates) fail
+    with 503, and a fraction (stall_rates) sleep stall_seconds before answering.
+    """
+
+    def __init__(self, llm_latency, llm_jitter, llm_tokens, whisper_latency, whisper_latency_per_minute,
+                 words_per_second, seed, error_rates=None, stall_rates=None, stall_seconds=0.0):
+        self.llm_latency = llm_latency
+        self.llm_jitter = llm_jitter
+        self.llm_tokens = llm_tokens
+        self.whisper_latency = whisper_latency
+        self.whisper_latency_per_minute = whisper_latency_per_minute
+        self.words_per_second = words_per_second
+        self.seed = seed
+        self.error_rates = error_rates or {}
+        self.stall_rates = stall_rates or {}
+        self.stall_seconds = stall_seconds
+        self.requests = {"llm": 0, "whisper": 0}
+        self.faults = {"error": 0, "stall": 0}
+        self._fault_rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = None
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                fault = stub.fault("whisper" if self.path.startswith("/whisper") else "llm")
+                if fault == "error":
+                    self.send_json(503, {"error": "injected fault"})
+                    return
+                if fault == "stall":
+                    time.sleep(stub.stall_seconds)
+                if self.path.startswith("/whisper"):
+                    payload = stub.transcription(body, self.headers.get("Content-Type", ""))
+                else:
+                    payload = stub.completion(json.loads(body))
+                self.send_json(200, payload)
+
+            def send_json(self, status, payload):
+                out = json.dumps(payload).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(out)))
+                    self.end_headers()
+                    self.wfile.write(out)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on this request (e.g. the losing half of a hedged pair)
+                    self.close_connection = True
+
+        self.server = StubServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+
+    def fault(self, endpoint):
+        """The fault injected into the next request to an endpoint: "error", "stall" or None"""
+        with self._lock:
+            draw = self._fault_rng.random()
+            error_rate = self.error_rates.get(endpoint, 0.0)
+            if draw < error_rate:
+                fault = "error"
+            elif draw < error_rate + self.stall_rates.get(endpoint, 0.0):
+                fault = "stall"
+            else:
+                return None
+            self.faults[fault] += 1
+            return fault
+
+    def completion(self, request):
+        with self._lock:
+            self.requests["llm"] += 1
+            rng = random.Random(self.seed + self.requests["llm"])
+        time.sleep(self.llm_latency + rng.uniform(0, self.llm_jitter))
+        answer = " ".join(rng.choice(VOCABULARY) for _ in range(self.llm_tokens))
+        return {"choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}]}
+
+    def transcription(self, body, content_type):
+        with self._lock:
+            self.requests["whisper"] += 1
+        duration = wav_duration(multipart_file(body, content_type))
+        time.sleep(self.whisper_latency + self.whisper_latency_per_minute * duration / 60.0)
+        # Text depends only on the audio length, so re-runs produce identical transcripts
+        rng = random.Random(self.seed + int(duration * 1000))
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + 5.0, duration)
+            words = [rng.choice(VOCABULARY) for _ in range(max(1, int((end - start) * self.words_per_second)))]
+            segments.append({"start": start, "end": end, "text": " ".join(words).capitalize() + "."})
+            start = end
+        return {"text": " ".join(segment["text"] for segment in segments), "segments": segments, "duration": duration}
+
+
+def multipart_file(body, content_type):
+    """Bytes of the first file field in a multipart/form-data body"""
+    boundary = content_type.split("boundary=")[-1].strip('"').encode("utf-8")
+    for part in body.split(b"--" + boundary):
+        header, _, content = part.partition(b"\r\n\r\n")
+        if b"filename=" in header:
+            return content[:-2] if content.endswith(b"\r\n") else content
+    return b""
+
+
+def wav_duration(audio_bytes):
+    try:
+        with wave.open(io.BytesIO(audio_bytes)) as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError):
+        return 0.0
+
+
+def synthetic_wav(seconds, seed):
+    """Speech-like 16 kHz mono WAV: 2-4 s tone bursts separated by short silences"""
+    rng = np.random.default_rng(seed)
+    samples = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    position = 0
+    while position < len(samples):
+        burst = int(rng.uniform(2.0, 4.0) * SAMPLE_RATE)
+        t = np.arange(min(burst, len(samples) - position)) / SAMPLE_RATE
+        samples[position:position + len(t)] = 0.3 * np.sin(2 * np.pi * rng.uniform(150, 400) * t)
+        position += burst + int(rng.uniform(0.4, 0.9) * SAMPLE_RATE)
+    # Different seeds give different bytes, so uploads are not deduplicated
+    samples += rng.normal(0, 0.002, len(samples)).astype(np.float32)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def summarize(values):
+    """Latency summary in milliseconds"""
+    if not values:
+        return {"count": 0}
+    ms = np.asarray(values, dtype=np.float64) * 1000
+    return {
+        "count": int(len(ms)),
+        "mean": round(float(ms.mean()), 2),
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p95": round(float(np.percentile(ms, 95)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2),
+        "max": round(float(ms.max()), 2)
+    }
+
+
+class StageTimer:
+    """Collects durations per stage by wrapping app functions"""
+
+    def __init__(self):
+        self.durations = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.durations.setdefault(stage, []).append(seconds)
+
+    def wrap(self, owner, name, stage):
+        original = getattr(owner, name)
+        if asyncio.iscoroutinefunction(original):
+            @functools.wraps(original)
+            async def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    self.add(stage, time.perf_counter() - started)
+        else:
+            @functools.wraps(original)
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.add(stage, time.perf_counter() - started)
+        setattr(owner, name, timed)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(args, stub_url, work_dir):
+    """Point the app at the stubs and at throwaway data directories (before main is imported)"""
+    os.environ.update({
+        "FRIENDLI_LLM_URL": f"{stub_url}/chat/completions",
+        "FRIENDLI_WHISPER_URL": f"{stub_url}/whisper",
+        "FRIENDLI_API_KEY": "benchmark",
+        "SPEAKSEEK_VECTOR_BACKEND": "numpy",
+        "SPEAKSEEK_EMBEDDER": "hashing",
+        "SPEAKSEEK_VECTORS_DIR": str(work_dir / "vectors"),
+        "SPEAKSEEK_KEYWORD_INDEX_DIR": str(work_dir / "keyword_index"),
+        "SPEAKSEEK_UPLOAD_DIR": str(work_dir / "uploaded_audio"),
+        "SPEAKSEEK_TRANSCRIPTS_DIR": str(work_dir / "transcripts"),
+        "SPEAKSEEK_JOBS_DB": str(work_dir / "jobs.db"),
+        "SPEAKSEEK_INGEST_WORKERS": str(args.ingest_workers),
+        # Every question is distinct work; caches would hide the pipeline being measured
+        "SPEAKSEEK_ANSWER_CACHE_SIZE": "0",
+        "SPEAKSEEK_QUERY_VECTOR_CACHE_SIZE": "0",
+        "SPEAKSEEK_QUERY_VECTOR_CACHE_PATH": "",
+        "FRIENDLI_LLM_HEDGE": "true" if args.hedge else "false",
+        "FRIENDLI_WHISPER_HEDGE": "true" if args.hedge else "false"
+    })
+
+
+async def run_uploads(client, args, timer):
+    semaphore = asyncio.Semaphore(args.upload_concurrency)
+    results = []
+
+    async def upload(i):
+        audio = synthetic_wav(args.audio_seconds, args.seed + i)
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                "/upload-audio",
+                files={"file": (f"bench_{i}.wav", audio, "audio/wav")},
+                data={"conversation_name": f"bench {i}"}
+            )
+            timer.add("request", time.perf_counter() - started)
+            response.raise_for_status()
+            body = response.json()
+            # End to end: until the job reports the conversation searchable
+            while True:
+                job = (await client.get(f"/jobs/{body['job_id']}")).json()
+                if job["stage"] in ("completed", "failed"):
+                    break
+                await asyncio.sleep(0.02)
+            timer.add("end_to_end", time.perf_counter() - started)
+            if job["stage"] == "failed":
+                raise RuntimeError(f"Upload {i} failed: {job['error']}")
+            for stage, seconds in job["stage_timings"].items():
+                timer.add(stage, seconds)
+            results.append(body["conversation_id"])
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(upload(i) for i in range(args.uploads)), return_exceptions=True)
+    return results, time.perf_counter() - started, [str(e) for e in outcomes if isinstance(e, Exception)]
+
+
+async def run_questions(client, args, conversation_ids, timer):
+    semaphore = asyncio.Semaphore(args.ask_concurrency)
+    rng = random.Random(args.seed)
+    questions = [
+        (rng.choice(conversation_ids), f"What was said about {rng.choice(VOCABULARY)} and {rng.choice(VOCABULARY)}? ({i})")
+        for i in range(args.questions)
+    ]
+
+    async def ask(conversation_id, question):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/ask-question", json={"conversation_id": conversation_id, "question": question})
+            timer.add("request", time.perf_counter() - started)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(ask(*q) for q in questions), return_exceptions=True)
+    return time.perf_counter() - started, [str(e) for e in outcomes if isinstance(e, Exception)]
+
+
+def run_benchmark(args):
+    import httpx
+    import uvicorn
+
+    stub = FriendliStub(
+        args.llm_latency, args.llm_jitter, args.llm_tokens,
+        args.whisper_latency, args.whisper_latency_per_minute, args.words_per_second, args.seed,
+        error_rates={"llm": args.llm_error_rate, "whisper": args.whisper_error_rate},
+        stall_rates={"llm": args.llm_stall_rate},
+        stall_seconds=args.stall_seconds
+    )
+    stub_url = stub.start()
+    work_dir = Path(tempfile.mkdtemp(prefix="speakseek-bench-"))
+    configure_environment(args, stub_url, work_dir)
+    if not args.verbose:
+        os.environ["SPEAKSEEK_LOG_LEVEL"] = "WARNING"
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        import main
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+        server.install_signal_handlers = lambda: None
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+        # The server answers before the backends are up; wait for readiness
+        while httpx.get(f"http://127.0.0.1:{port}/readyz").status_code != 200:
+            if main.backend_status["state"] == "failed":
+                raise RuntimeError(f"Backends failed to start: {main.backend_status['error']}")
+            time.sleep(0.05)
+
+        upload_timer, ask_timer = StageTimer(), StageTimer()
+        ask_timer.wrap(main.query_vectors, "embed_query", "embed")
+        ask_timer.wrap(main, "retrieve_contexts", "retrieve")
+        ask_timer.wrap(main, "generate_answer", "generate")
+
+        async def drive():
+            limits = httpx.Limits(max_connections=max(args.upload_concurrency, args.ask_concurrency) * 2)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=300, limits=limits) as client:
+                conversation_ids, upload_seconds, upload_errors = await run_uploads(client, args, upload_timer)
+                if not conversation_ids:
+                    raise RuntimeError(f"Every upload failed: {upload_errors[:3]}")
+                ask_seconds, ask_errors = await run_questions(client, args, conversation_ids, ask_timer)
+            return conversation_ids, upload_seconds, upload_errors, ask_seconds, ask_errors
+
+        try:
+            conversation_ids, upload_seconds, upload_errors, ask_seconds, ask_errors = asyncio.run(drive())
+        finally:
+            server.should_exit = True
+            thread.join(timeout=10)
+            stub.stop()
+
+    return {
+        "config": benchmark_config(args),
+        "upload": {
+            "throughput_per_s": round(len(conversation_ids) / upload_seconds, 3),
+            "errors": len(upload_errors),
+            "stages": {stage: summarize(values) for stage, values in sorted(upload_timer.durations.items())}
+        },
+        "ask": {
+            "throughput_per_s": round((args.questions - len(ask_errors)) / ask_seconds, 3),
+            "errors": len(ask_errors),
+            "stages": {stage: summarize(values) for stage, values in sorted(ask_timer.durations.items())}
+        },
+        "stub_requests": stub.requests,
+        "stub_faults": stub.faults,
+        "friendli_events": {name: policy.stats() for name, policy in main.POLICIES.items()}
+    }
+
+
+def benchmark_config(args):
+    """Settings that must match for two runs to be comparable"""
+    names = [
+        "uploads", "upload_concurrency", "audio_seconds", "ingest_workers", "questions", "ask_concurrency",
+        "llm_latency", "llm_jitter", "llm_tokens", "whisper_latency", "whisper_latency_per_minute",
+        "words_per_second", "seed"
+    ]
+    config = {name: getattr(args, name) for name in names}
+    # Fault injection and hedging only appear when used, so runs without them still match older baselines
+    for name in ("llm_error_rate", "llm_stall_rate", "whisper_error_rate", "hedge"):
+        if getattr(args, name):
+            config[name] = getattr(args, name)
+    if args.llm_stall_rate:
+        config["stall_seconds"] = args.stall_seconds
+    return config
+
+
+def compared_percentiles(count):
+    """Tail percentiles of a handful of samples are single observations, too noisy to gate on"""
+    return [p for p, minimum in (("p50", 1), ("p95", 20), ("p99", 100)) if count >= minimum]
+
+
+def compare(result, baseline, tolerance, slack_ms):
+    """
+    Returns:
+        list: Regression messages (empty when the run is within tolerance of the baseline)
+    """
+    regressions = []
+    for scenario in ("upload", "ask"):
+        current, previous = result[scenario], baseline.get(scenario, {})
+        if previous.get("throughput_per_s") and current["throughput_per_s"] < previous["throughput_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{scenario} throughput {current['throughput_per_s']}/s < baseline {previous['throughput_per_s']}/s"
+            )
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{scenario} errors {current['errors']} > baseline {previous.get('errors', 0)}")
+        for stage, stats in current["stages"].items():
+            previous_stats = previous.get("stages", {}).get(stage)
+            if not previous_stats or not stats.get("count"):
+                continue
+            for percentile in compared_percentiles(min(stats["count"], previous_stats["count"])):
+                # The absolute slack keeps sub-millisecond stages from flagging on noise
+                limit = previous_stats[percentile] * (1 + tolerance) + slack_ms
+                if stats[percentile] > limit:
+                    regressions.append(
+                        f"{scenario}.{stage} {percentile} {stats[percentile]}ms > baseline "
+                        f"{previous_stats[percentile]}ms (+{tolerance:.0%} + {slack_ms}ms)"
+                    )
+    return regressions
+
+
+def print_report(result):
+    for scenario in ("upload", "ask"):
+        data = result[scenario]
+        print(f"\n{scenario}: {data['throughput_per_s']} /s, {data['errors']} error(s)")
+        print(f"  {'stage':<14}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'max ms':>11}")
+        for stage, stats in data["stages"].items():
+            if stats.get("count"):
+                print(f"  {stage:<14}{stats['count']:>7}{stats['p50']:>11}{stats['p95']:>11}{stats['p99']:>11}{stats['max']:>11}")
+    if any(result["stub_faults"].values()):
+        print(f"\ninjected faults: {result['stub_faults']}")
+    for name, stats in result.get("friendli_events", {}).items():
+        if stats["events"]:
+            print(f"  {name}: circuit {stats['circuit']}, {stats['events']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark upload and question answering against local Friendli stubs")
+    parser.add_argument("--uploads", type=int, default=8, help="Audio files uploaded")
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--audio-seconds", type=float, default=60.0, help="Length of each synthetic recording")
+    parser.add_argument("--ingest-workers", type=int, default=2, help="SPEAKSEEK_INGEST_WORKERS for the app")
+    parser.add_argument("--questions", type=int, default=200, help="Questions asked over the uploaded conversations")
+    parser.add_argument("--ask-concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per chat completion")
+    parser.add_argument("--llm-jitter", type=float, default=0.05, help="Extra uniform random latency per completion")
+    parser.add_argument("--llm-tokens", type=int, default=120, help="Words per generated answer")
+    parser.add_argument("--whisper-latency", type=float, default=0.3, help="Seconds per transcription request")
+    parser.add_argument("--whisper-latency-per-minute", type=float, default=0.5, help="Extra seconds per minute of audio")
+    parser.add_argument("--words-per-second", type=float, default=2.5, help="Transcript words per second of audio")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of chat requests failed with 503")
+    parser.add_argument("--llm-stall-rate", type=float, default=0.0, help="Fraction of chat requests stalled")
+    parser.add_argument("--stall-seconds", type=float, default=5.0, help="Extra latency of a stalled request")
+    parser.add_argument("--whisper-error-rate", type=float, default=0.0, help="Fraction of transcriptions failed with 503")
+    parser.add_argument("--hedge", action="store_true", help="Enable hedged Friendli requests in the app")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before failing")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="Allowed absolute slowdown per percentile")
+    parser.add_argument("--output", help="Write the full result as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's own output")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run_benchmark(args)
+    print_report(result)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(result, indent=2) + "\n")
+        print(f"\nSaved baseline to {args.save_baseline}")
+        return 0
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print(f"\nNo baseline at {baseline_path}; run with --save-baseline to create one")
+        return 0
+    baseline = json.loads(baseline_path.read_text())
+    if baseline.get("config") != result["config"]:
+        print(f"\nBaseline {baseline_path} was recorded with different settings: {baseline.get('config')}")
+        return 2
+    regressions = compare(result, baseline, args.tolerance, args.slack_ms)
+    if regressions:
+        print(f"\nREGRESSION against {baseline_path}:")
+        for message in regressions:
+            print(f"  - {message}")
+        return 1
+    print(f"\nNo regressions against {baseline_path} (tolerance {args.tolerance:.0%} + {args.slack_ms}ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Timestamp-aware transcript chunking
+
+Transcripts are handled as a stream of timed segments ({"start", "end",
+"text"} in seconds, as returned by Whisper's verbose_json output or parsed from
+the "HH:MM:SS,mmm --> HH:MM:SS,mmm" transcript files). Segments are split into
+sentences and whole sentences are packed into chunks up to a token budget,
+with a configurable overlap between consecutive chunks. Every chunk records
+the start and end time of the audio it covers. Everything is a generator, so
+long transcripts are never materialized as one word list.
+"""
+
+import re
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+TIMESTAMP_LINE = re.compile(
+    r"^\s*(\d+):(\d{2}):(\d{2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{1,3})\s*(?:\[(.+?)\])?\s*$"
+)
+
+
+def count_tokens(text):
+    """Approximate token count: words and punctuation marks"""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def _seconds(hours, minutes, seconds, millis):
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(millis.ljust(3, "0")) / 1000.0
+
+
+def parse_transcript_segments(lines):
+    """
+    Parse transcript text into timed segments
+
+    Lines in "HH:MM:SS,mmm --> HH:MM:SS,mmm [Speaker N]" blocks become segments
+    with real times. Plain text without timestamp lines becomes one untimed
+    segment per paragraph (start and end are None).
+
+    Args:
+        lines (iterable): Transcript lines (an open file works)
+
+    Yields:
+        dict: Segments with "start", "end", "text" and optional "speaker"
+    """
+    current = None
+    text_lines = []
+
+    def flush():
+        text = " ".join(line.strip() for line in text_lines if line.strip())
+        if text:
+            segment = dict(current) if current else {"start": None, "end": None}
+            segment["text"] = text
+            return segment
+        return None
+
+    for line in lines:
+        match = TIMESTAMP_LINE.match(line)
+        if match:
+            segment = flush()
+            if segment:
+                yield segment
+            groups = match.groups()
+            current = {"start": _seconds(*groups[0:4]), "end": _seconds(*groups[4:8])}
+            if groups[8]:
+                current["speaker"] = groups[8]
+            text_lines = []
+        elif not line.strip() and current is None:
+            # Paragraph break in an untimed transcript
+            segment = flush()
+            if segment:
+                yield segment
+            text_lines = []
+        else:
+            text_lines.append(line)
+
+    segment = flush()
+    if segment:
+        yield segment
+
+
+def iter_sentences(segments):
+    """
+    Split segments into sentences, interpolating each sentence's start and end
+    time from its character position within the segment
+
+    Yields:
+        dict: Sentences with "text", "start", "end", "tokens" and "segment" (position of their segment in the stream)
+    """
+    for segment_index, segment in enumerate(segments):
+        text = segment.get("text", "").strip()
+        if not text:
+            continue
+        start, end = segment.get("start"), segment.get("end")
+        timed = start is not None and end is not None
+        length = len(text)
+        position = 0
+        for sentence in SENTENCE_BOUNDARY.split(text):
+            if not sentence:
+                continue
+            offset = text.find(sentence, position)
+            position = offset + len(sentence)
+            yield {
+                "text": sentence,
+                "start": start + (end - start) * offset / length if timed else start,
+                "end": start + (end - start) * position / length if timed else end,
+                "tokens": count_tokens(sentence),
+                "segment": segment_index
+            }
+
+
+def _split_long_sentence(sentence, max_tokens):
+    """Break a sentence longer than the budget into word windows, keeping times proportional"""
+    words = sentence["text"].split()
+    pieces = []
+    current = []
+    current_tokens = 0
+    for word in words:
+        word_tokens = count_tokens(word)
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append(current)
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append(current)
+
+    timed = sentence["start"] is not None and sentence["end"] is not None
+    duration = (sentence["end"] - sentence["start"]) if timed else 0
+    done = 0
+    for piece in pieces:
+        piece_start = sentence["start"] + duration * done / len(words) if timed else sentence["start"]
+        done += len(piece)
+        text = " ".join(piece)
+        yield {
+            "text": text,
+            "start": piece_start,
+            "end": sentence["start"] + duration * done / len(words) if timed else sentence["end"],
+            "tokens": count_tokens(text),
+            "segment": sentence["segment"]
+        }
+
+
+def chunk_segments(segments, max_tokens=120, overlap_tokens=30):
+    """
+    Pack whole sentences from a segment stream into chunks
+
+    Args:
+        segments (iterable): Timed segments ({"start", "end", "text"})
+        max_tokens (int): Token budget per chunk
+        overlap_tokens (int): Tokens of trailing sentences repeated at the start of the next chunk
+
+    Yields:
+        dict: Chunks with "content", "start", "end" (seconds, None when untimed), "index", and
+        "first_segment" / "last_segment" (positions of the segments the chunk was cut from)
+    """
+    window = []
+    window_tokens = 0
+    index = 0
+    fresh = 0  # sentences in the window not yet emitted in a previous chunk
+
+    def make_chunk():
+        return {
+            "index": index,
+            "content": " ".join(sentence["text"] for sentence in window),
+            "start": window[0]["start"],
+            "end": window[-1]["end"],
+            "first_segment": window[0]["segment"],
+            "last_segment": window[-1]["segment"]
+        }
+
+    for sentence in iter_sentences(segments):
+        pieces = [sentence] if sentence["tokens"] <= max_tokens else _split_long_sentence(sentence, max_tokens)
+        for piece in pieces:
+            if window and window_tokens + piece["tokens"] > max_tokens:
+                yield make_chunk()
+                index += 1
+                # Carry trailing sentences into the next chunk as overlap
+                carried = []
+                carried_tokens = 0
+                for previous in reversed(window):
+                    if carried_tokens + previous["tokens"] > overlap_tokens or len(carried) + 1 >= len(window):
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous["tokens"]
+                while carried and carried_tokens + piece["tokens"] > max_tokens:
+                    carried_tokens -= carried.pop(0)["tokens"]
+                window, window_tokens, fresh = carried, carried_tokens, 0
+            window.append(piece)
+            window_tokens += piece["tokens"]
+            fresh += 1
+
+    if window and fresh:
+        yield make_chunk()
+
+
+def _timestamp(seconds):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def format_transcript(segments):
+    """Render timed segments in the transcript file format read by parse_transcript_segments"""
+    blocks = []
+    for segment in segments:
+        text = segment.get("text", "").strip()
+        if not text:
+            continue
+        header = f"{_timestamp(segment['start'])} --> {_timestamp(segment['end'])}"
+        if segment.get("speaker"):
+            header += f" [{segment['speaker']}]"
+        blocks.append(f"{header}\n{text} \n")
+    return "\n".join(blocks)
@@ -0,0 +1,154 @@
+"""
+Context assembly for answer prompts
+
+Retrieval over-fetches candidate chunks for a question; this module decides
+which of them go into the prompt:
+
+1. Hits whose vector similarity is below a threshold are dropped (hits found
+   only by BM25 carry no vector score and are kept).
+2. The remaining hits are picked one at a time by maximal marginal relevance,
+   trading relevance against word overlap with the chunks already picked, so
+   overlapping windows and near-duplicate chunks don't fill the prompt.
+3. Picking stops when the token budget or the context limit is reached.
+
+Tokens are counted with a real tokenizer when one is available: a tiktoken
+encoding name (default cl100k_base) or the path of a Hugging Face
+tokenizer.json (needs the tokenizers package). tiktoken is in
+requirements.txt; without it the word-and-punctuation approximation from
+chunking is used, and a warning says so once per tokenizer.
+"""
+
+import logging
+import os
+import re
+from functools import lru_cache
+
+from chunking import count_tokens as approximate_token_count
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER = os.getenv("SPEAKSEEK_TOKENIZER", "cl100k_base")
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Questions whose answers are naturally longer than one or two sentences
+LONG_ANSWER_PATTERN = re.compile(
+    r"\b(summari[sz]e|summary|list|explain|describe|compare|steps|overview|why|how does|how do|what are)\b",
+    re.IGNORECASE
+)
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(tokenizer=None):
+    """
+    Token counting function for the configured tokenizer
+
+    Args:
+        tokenizer (str, optional): tiktoken encoding name or path to a tokenizer.json (defaults to SPEAKSEEK_TOKENIZER)
+
+    Returns:
+        callable: Function of a string returning its token count
+    """
+    tokenizer = tokenizer or TOKENIZER
+    try:
+        if tokenizer.endswith(".json"):
+            from tokenizers import Tokenizer
+
+            encoding = Tokenizer.from_file(tokenizer)
+            return lambda text: len(encoding.encode(text, add_special_tokens=False).ids)
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(tokenizer)
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except ImportError:
+        logger.warning("No tokenizer package for '%s', prompt token budgets use approximate counts", tokenizer)
+    except Exception as e:
+        logger.warning("Could not load tokenizer '%s', using approximate token counts: %s", tokenizer, e)
+    return approximate_token_count
+
+
+def _word_set(text):
+    return frozenset(WORD_PATTERN.findall(text.lower()))
+
+
+def _similarity(a, b):
+    # Jaccard overlap of the two chunks' vocabularies
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def select_contexts(hits, token_budget, max_contexts, min_score=None, mmr_lambda=0.7, count_tokens=None):
+    """
+    Choose the hits that go into a prompt
+
+    Args:
+        hits (list): Candidate hits, best first (dicts with "content", "score" and optionally "vector_score")
+        token_budget (int): Maximum total tokens of the chosen contents (the best hit is always kept)
+        max_contexts (int): Maximum number of chosen hits
+        min_score (float, optional): Drop hits whose "vector_score" is below this
+        mmr_lambda (float): 1.0 ranks by relevance only, lower values penalize redundancy more
+        count_tokens (callable, optional): Token counter (defaults to get_token_counter())
+
+    Returns:
+        list: Chosen hits in the order they were picked, each with its token count in "tokens"
+    """
+    count_tokens = count_tokens or get_token_counter()
+    candidates = []
+    seen = set()
+    for hit in hits:
+        if min_score is not None and hit.get("vector_score") is not None and hit["vector_score"] < min_score:
+            continue
+        # Exact duplicates (e.g. the same chunk indexed twice) never need a second look
+        if hit["content"] in seen:
+            continue
+        seen.add(hit["content"])
+        candidates.append(hit)
+    if not candidates:
+        return []
+
+    # Relevance normalized to [0, 1] so it is comparable with the overlap penalty
+    scores = [hit.get("score", 0.0) for hit in candidates]
+    low, high = min(scores), max(scores)
+    relevance = [(score - low) / (high - low) if high > low else 1.0 for score in scores]
+    words = [_word_set(hit["content"]) for hit in candidates]
+
+    # Highest overlap of each candidate with any chunk picked so far, updated after every pick
+    redundancy = [0.0] * len(candidates)
+    selected = []
+    remaining = list(range(len(candidates)))
+    used_tokens = 0
+    while remaining and len(selected) < max_contexts and used_tokens < token_budget:
+        best = max(remaining, key=lambda i: mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy[i])
+        remaining.remove(best)
+        tokens = count_tokens(candidates[best]["content"])
+        if selected and used_tokens + tokens > token_budget:
+            # Too big for what is left of the budget; a shorter candidate may still fit
+            continue
+        used_tokens += tokens
+        selected.append({**candidates[best], "tokens": tokens})
+        for i in remaining:
+            redundancy[i] = max(redundancy[i], _similarity(words[i], words[best]))
+    return selected
+
+
+def answer_token_limit(question, context_tokens, min_tokens, max_tokens):
+    """
+    max_tokens to request for an answer
+
+    Short factual questions over little context get a small limit; questions
+    asking for a summary, list or explanation, and larger contexts, get more room.
+
+    Args:
+        question (str): The question being answered
+        context_tokens (int): Tokens of context in the prompt
+        min_tokens (int): Smallest limit returned
+        max_tokens (int): Largest limit returned
+
+    Returns:
+        int: Completion token limit
+    """
+    limit = min_tokens + context_tokens // 4
+    if LONG_ANSWER_PATTERN.search(question):
+        limit *= 2
+    return max(min_tokens, min(max_tokens, limit))
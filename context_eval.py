@@ -0,0 +1,194 @@
+"""
+Fixed evaluation of context assembly and prompt size
+
+Indexes the transcript named in context_eval.json (numpy vector store and
+hashing embedder in a throwaway directory, unless overridden) and, for every
+question in the file, compares two ways of building the answer prompt:
+
+- legacy: the top 3 hybrid hits in the old verbose prompt, max_tokens=500
+- assembled: over-retrieval, score threshold, MMR de-duplication and the
+  token budget (SPEAKSEEK_CONTEXT_* settings), the compact prompt and the
+  adaptive max_tokens
+
+A question's context counts as a hit when every expected phrase appears in the
+contexts. With --answers both prompts are also sent to the Friendli LLM
+(FRIENDLI_API_KEY must be set), and answer latency, the prompt tokens reported
+by the API and answer hits are compared as well.
+
+Usage:
+    python context_eval.py [--eval context_eval.json] [--embedder hashing] [--answers] [--output eval.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from chunking import count_tokens as approximate_token_count
+from context_assembly import TOKENIZER
+
+DEFAULT_EVAL = Path(__file__).with_name("context_eval.json")
+
+# The prompt /ask-question used before context assembly, kept for comparison
+LEGACY_LIMIT = 3
+LEGACY_MAX_TOKENS = 500
+
+
+def legacy_prompt(question, contexts):
+    context_str = "\n".join([f"Context {i+1}: {ctx}" for i, ctx in enumerate(contexts)])
+    return f"""
+        Based on the following transcription from an audio file, please answer this question:
+
+        Question: {question}
+
+        {context_str}
+
+        Please provide a concise and accurate answer based only on the information provided in the contexts.
+        """
+
+
+def configure_environment(args, work_dir):
+    """Throwaway data directories and an in-process backend (before main is imported)"""
+    os.environ.update({
+        "SPEAKSEEK_VECTOR_BACKEND": "numpy",
+        "SPEAKSEEK_EMBEDDER": args.embedder,
+        "SPEAKSEEK_VECTORS_DIR": str(work_dir / "vectors"),
+        "SPEAKSEEK_KEYWORD_INDEX_DIR": str(work_dir / "keyword_index"),
+        "SPEAKSEEK_UPLOAD_DIR": str(work_dir / "uploaded_audio"),
+        "SPEAKSEEK_TRANSCRIPTS_DIR": str(work_dir / "transcripts"),
+        "SPEAKSEEK_JOBS_DB": str(work_dir / "jobs.db"),
+        "SPEAKSEEK_QUERY_VECTOR_CACHE_PATH": "",
+        "SPEAKSEEK_LOG_LEVEL": os.getenv("SPEAKSEEK_LOG_LEVEL", "WARNING")
+    })
+    if not args.answers:
+        # The clients are created at startup but never called
+        os.environ.setdefault("FRIENDLI_API_KEY", "unused")
+
+
+def contains_all(text, phrases):
+    text = text.lower()
+    return all(phrase.lower() in text for phrase in phrases)
+
+
+def ask_llm(main, prompt, max_tokens):
+    started = time.perf_counter()
+    response = main.friendli_llm_client.generate_response(
+        prompt=prompt, system_prompt=main.SYSTEM_PROMPT, max_tokens=max_tokens, temperature=0
+    )
+    seconds = time.perf_counter() - started
+    answer = response["choices"][0]["message"]["content"] if response and response.get("choices") else ""
+    usage = (response or {}).get("usage") or {}
+    return answer, seconds, usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+
+def run_eval(args):
+    eval_set = json.loads(Path(args.eval).read_text())
+    configure_environment(args, Path(tempfile.mkdtemp(prefix="speakseek-eval-")))
+
+    import main
+
+    main.init_backends()
+    count_tokens = main.get_token_counter()
+    transcript_path = Path(args.eval).parent / eval_set["transcript"]
+    conversation_id = "context_eval"
+    report = main.vectorize_transcript(conversation_id, transcript_text=transcript_path.read_text())
+    if report["failed"]:
+        raise RuntimeError(f"Indexing failed: {report['failed'][0]['error']}")
+
+    async def retrieve(question):
+        legacy_hits = (await main.search_conversation_many(conversation_id, [question], limit=LEGACY_LIMIT))[0]
+        assembled = (await main.retrieve_contexts_many(conversation_id, [question]))[0]
+        return [hit["content"] for hit in legacy_hits], assembled
+
+    rows = []
+    for item in eval_set["questions"]:
+        question, expected = item["question"], item["expected"]
+        legacy_contexts, assembled_contexts = asyncio.run(retrieve(question))
+        variants = {
+            "legacy": (legacy_contexts, legacy_prompt(question, legacy_contexts), LEGACY_MAX_TOKENS),
+            "assembled": (
+                assembled_contexts,
+                main._build_prompt(question, assembled_contexts)[0],
+                main.answer_max_tokens(question, assembled_contexts)
+            )
+        }
+        row = {"question": question}
+        for name, (contexts, prompt, max_tokens) in variants.items():
+            result = {
+                "contexts": len(contexts),
+                "context_hit": contains_all(" ".join(contexts), expected),
+                "prompt_tokens": count_tokens(main.SYSTEM_PROMPT + prompt),
+                "max_tokens": max_tokens
+            }
+            if args.answers:
+                answer, seconds, api_prompt_tokens, completion_tokens = ask_llm(main, prompt, max_tokens)
+                result.update({
+                    "answer_hit": contains_all(answer, expected),
+                    "llm_seconds": round(seconds, 3),
+                    "api_prompt_tokens": api_prompt_tokens,
+                    "completion_tokens": completion_tokens
+                })
+            row[name] = result
+        rows.append(row)
+    tokenizer = "approximate" if count_tokens is approximate_token_count else TOKENIZER
+    return {"chunks": report["total"], "tokenizer": tokenizer, "questions": rows}
+
+
+def summarize(rows, variant):
+    results = [row[variant] for row in rows]
+    summary = {
+        "context_recall": round(sum(r["context_hit"] for r in results) / len(results), 3),
+        "mean_contexts": round(statistics.mean(r["contexts"] for r in results), 2),
+        "mean_prompt_tokens": round(statistics.mean(r["prompt_tokens"] for r in results), 1),
+        "mean_max_tokens": round(statistics.mean(r["max_tokens"] for r in results), 1)
+    }
+    if "answer_hit" in results[0]:
+        summary.update({
+            "answer_accuracy": round(sum(r["answer_hit"] for r in results) / len(results), 3),
+            "mean_llm_seconds": round(statistics.mean(r["llm_seconds"] for r in results), 3),
+            "p95_llm_seconds": round(sorted(r["llm_seconds"] for r in results)[int(0.95 * (len(results) - 1))], 3)
+        })
+    return summary
+
+
+def print_report(result):
+    rows = result["questions"]
+    print(f"{len(rows)} questions over {result['chunks']} chunks, {result['tokenizer']} token counts\n")
+    print(f"  {'':<4}{'legacy':>20}{'assembled':>20}  question")
+    for i, row in enumerate(rows, 1):
+        cells = [
+            f"{'hit' if row[v]['context_hit'] else 'miss'} {row[v]['contexts']}ctx {row[v]['prompt_tokens']}tok"
+            for v in ("legacy", "assembled")
+        ]
+        print(f"  {i:<4}{cells[0]:>20}{cells[1]:>20}  {row['question'][:60]}")
+    print()
+    legacy, assembled = summarize(rows, "legacy"), summarize(rows, "assembled")
+    for key in legacy:
+        print(f"  {key:<20}{legacy[key]:>12}{assembled[key]:>12}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare legacy and assembled answer prompts on a fixed question set")
+    parser.add_argument("--eval", default=str(DEFAULT_EVAL), help="Eval set JSON (transcript path and questions)")
+    parser.add_argument("--embedder", default="hashing", help="SPEAKSEEK_EMBEDDER used for the eval index")
+    parser.add_argument("--answers", action="store_true", help="Also generate answers with the Friendli LLM")
+    parser.add_argument("--output", help="Write the per-question results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run_eval(args)
+    print_report(result)
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""
+Conversation ids
+
+Conversation ids name files in the data directories (transcripts, uploads,
+vectors, keyword indexes, summaries), so they are built from conversation
+names by slugifying: lowercase letters, digits and underscores only. Ids
+that arrive in requests are checked against the same safe pattern before any
+store builds a path from them.
+"""
+
+import re
+import uuid
+
+# Hyphens are allowed for ids created before names were slugified; never dots or slashes
+CONVERSATION_ID_PATTERN = re.compile(r"[a-z0-9_-]{1,128}")
+
+
+class InvalidConversationId(ValueError):
+    def __init__(self, conversation_id):
+        super().__init__(f"Invalid conversation id: {conversation_id!r}")
+        self.conversation_id = conversation_id
+
+
+def check_conversation_id(conversation_id):
+    """
+    Returns:
+        str: conversation_id, if it is safe to use in a file name
+
+    Raises:
+        InvalidConversationId: Anything else
+    """
+    if not isinstance(conversation_id, str) or not CONVERSATION_ID_PATTERN.fullmatch(conversation_id):
+        raise InvalidConversationId(conversation_id)
+    return conversation_id
+
+
+def slugify(name, default="conversation"):
+    """Lowercase name with every run of other characters replaced by one underscore"""
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_") or default
+
+
+def new_conversation_id(conversation_name):
+    """A fresh id: the slugified name plus a random suffix"""
+    return f"{slugify(conversation_name)}_{uuid.uuid4().hex[:8]}"
@@ -0,0 +1,90 @@
+"""
+Content-addressed deduplication of uploaded audio
+
+Uploads are hashed (SHA-256) while they are written to disk. Once a recording
+has been transcribed and indexed, its hash is mapped to the conversation that
+holds the transcript and vectors. A later upload of the same bytes becomes a
+new conversation that copies that transcript and index instead of calling
+Whisper and the embedder again.
+
+The mapping is keyed by the hash and an index signature (embedder, chunking
+settings and retrieval backend), so a changed pipeline configuration never
+reuses an index built under different settings.
+"""
+
+import sqlite3
+import threading
+import time
+
+
+class ContentIndex:
+    """SQLite table of content hash -> conversation holding its transcript and index"""
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._stats = {"hits": 0, "misses": 0, "bytes_saved": 0}
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS audio_content (
+                    content_hash TEXT NOT NULL,
+                    index_signature TEXT NOT NULL,
+                    conversation_id TEXT NOT NULL,
+                    file_path TEXT,
+                    transcript_path TEXT,
+                    size INTEGER,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (content_hash, index_signature)
+                )
+                """
+            )
+
+    def lookup(self, content_hash, index_signature, size=0):
+        """
+        Find the conversation already indexed from these bytes, counting the hit or miss
+
+        Returns:
+            dict: The stored mapping, or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM audio_content WHERE content_hash = ? AND index_signature = ?",
+                (content_hash, index_signature)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["bytes_saved"] += size
+            return dict(row)
+
+    def record(self, content_hash, index_signature, conversation_id, file_path, transcript_path, size=None):
+        """Map a hash to a conversation whose transcript and index are complete"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO audio_content "
+                "(content_hash, index_signature, conversation_id, file_path, transcript_path, size, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, index_signature, conversation_id, str(file_path), str(transcript_path), size, time.time())
+            )
+
+    def forget(self, content_hash, index_signature):
+        """Drop a mapping whose conversation can no longer be copied"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM audio_content WHERE content_hash = ? AND index_signature = ?",
+                (content_hash, index_signature)
+            )
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            entries = self._conn.execute("SELECT COUNT(*) FROM audio_content").fetchone()[0]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": entries
+            }
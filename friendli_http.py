@@ -0,0 +1,100 @@
+"""
+Shared HTTP settings for the Friendli API clients
+
+The async clients share one pooled, keep-alive httpx.AsyncClient created at
+app startup; the sync clients each keep a requests.Session. Both use the same
+connect/read timeouts.
+
+Every call also goes through the ResiliencePolicy of its endpoint ("llm" or
+"whisper"), shared by the sync and async clients: a deadline per call,
+retries with jittered backoff for transient failures, optional hedged
+requests and a circuit breaker (see resilience.py).
+"""
+
+import os
+import threading
+
+import httpx
+from dotenv import load_dotenv
+
+from resilience import ResiliencePolicy
+
+# Load environment variables
+load_dotenv()
+
+CONNECT_TIMEOUT = float(os.getenv("FRIENDLI_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("FRIENDLI_READ_TIMEOUT", "120"))
+MAX_CONNECTIONS = int(os.getenv("FRIENDLI_MAX_CONNECTIONS", "32"))
+MAX_CONCURRENCY = int(os.getenv("FRIENDLI_MAX_CONCURRENCY", "16"))
+
+# Tail-latency controls, per endpoint where the two differ
+LLM_DEADLINE = float(os.getenv("FRIENDLI_LLM_DEADLINE", "60"))
+WHISPER_DEADLINE = float(os.getenv("FRIENDLI_WHISPER_DEADLINE", "600"))
+LLM_MAX_RETRIES = int(os.getenv("FRIENDLI_MAX_RETRIES", "2"))
+WHISPER_MAX_RETRIES = int(os.getenv("FRIENDLI_WHISPER_SEGMENT_RETRIES", "2"))
+RETRY_BACKOFF = float(os.getenv("FRIENDLI_RETRY_BACKOFF", "0.25"))
+RETRY_BACKOFF_MAX = float(os.getenv("FRIENDLI_RETRY_BACKOFF_MAX", "5"))
+LLM_HEDGE = os.getenv("FRIENDLI_LLM_HEDGE", "false").lower() in ("1", "true", "yes")
+WHISPER_HEDGE = os.getenv("FRIENDLI_WHISPER_HEDGE", "false").lower() in ("1", "true", "yes")
+HEDGE_MIN_DELAY = float(os.getenv("FRIENDLI_HEDGE_MIN_DELAY", "0.1"))
+HEDGE_INITIAL_DELAY = float(os.getenv("FRIENDLI_HEDGE_INITIAL_DELAY", "2"))
+BREAKER_FAILURES = int(os.getenv("FRIENDLI_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("FRIENDLI_BREAKER_RESET_SECONDS", "30"))
+
+# Endpoint name -> ResiliencePolicy, created on first use
+POLICIES = {}
+_policies_lock = threading.Lock()
+
+
+def requests_attempt_timeout(remaining):
+    """(connect, read) tuple for one attempt of a call with `remaining` seconds left before its deadline"""
+    return (min(CONNECT_TIMEOUT, remaining), min(READ_TIMEOUT, remaining))
+
+
+def httpx_attempt_timeout(remaining):
+    """httpx.Timeout for one attempt of a call with `remaining` seconds left before its deadline"""
+    return httpx.Timeout(min(READ_TIMEOUT, remaining), connect=min(CONNECT_TIMEOUT, remaining))
+
+
+def friendli_policy(endpoint):
+    """
+    The resilience policy shared by all clients of an endpoint
+
+    Args:
+        endpoint (str): "llm" or "whisper"
+
+    Returns:
+        ResiliencePolicy: One instance per endpoint, so its circuit breaker sees every call
+    """
+    with _policies_lock:
+        if endpoint not in POLICIES:
+            llm = endpoint == "llm"
+            POLICIES[endpoint] = ResiliencePolicy(
+                endpoint,
+                deadline=LLM_DEADLINE if llm else WHISPER_DEADLINE,
+                max_retries=LLM_MAX_RETRIES if llm else WHISPER_MAX_RETRIES,
+                backoff_base=RETRY_BACKOFF,
+                backoff_max=RETRY_BACKOFF_MAX,
+                hedge=LLM_HEDGE if llm else WHISPER_HEDGE,
+                hedge_min_delay=HEDGE_MIN_DELAY,
+                hedge_initial_delay=HEDGE_INITIAL_DELAY,
+                failure_threshold=BREAKER_FAILURES,
+                reset_seconds=BREAKER_RESET_SECONDS
+            )
+        return POLICIES[endpoint]
+
+
+def create_async_http_client():
+    """
+    Build the pooled async HTTP client shared by the async Friendli clients
+
+    Returns:
+        httpx.AsyncClient: Client with keep-alive pooling and configured timeouts
+    """
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_CONNECTIONS
+        )
+    )
@@ -4,79 +4,102 @@ Friendli AI LLM API Client for Processing Semantic Search Results
 
 import os
 import json
+import time
+import asyncio
+import logging
+import httpx
 import requests
 from dotenv import load_dotenv
 from pathlib import Path
+from friendli_http import MAX_CONCURRENCY, friendli_policy, httpx_attempt_timeout, requests_attempt_timeout
+from structured_logging import sampled
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class FriendliLLMAPI:
     def __init__(self):
         self.api_key = os.getenv('FRIENDLI_API_KEY')
         self.endpoint_id = os.getenv('FRIENDLI_LLM_ENDPOINT_ID', 'depkg9bk8f3in12')  # Default from provided info
-        self.base_url = "https://api.friendli.ai/dedicated/v1/chat/completions"
+        self.base_url = os.getenv('FRIENDLI_LLM_URL', "https://api.friendli.ai/dedicated/v1/chat/completions")
         
         if not self.api_key:
             raise ValueError("FRIENDLI_API_KEY environment variable not set")
-    
-    def generate_response(self, prompt, system_prompt=None, max_tokens=500, temperature=0.7):
-        """
-        Generate a response using Friendli AI LLM API
         
-        Args:
-            prompt (str): User prompt/question
-            system_prompt (str, optional): System prompt to guide the model's behavior
-            max_tokens (int, optional): Maximum tokens to generate
-            temperature (float, optional): Temperature for response generation
-            
-        Returns:
-            dict: Response from the API
-        """
-        # Prepare headers
+        # Reuse connections across calls
+        self.session = requests.Session()
+        # Deadline, retries and circuit breaker shared with every other LLM client
+        self.policy = friendli_policy("llm")
+    
+    def _build_request(self, prompt, system_prompt=None, max_tokens=500, temperature=0.7):
+        """Build the headers and JSON body for a chat completion request"""
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
         
-        # Prepare messages
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
         
         messages.append({"role": "user", "content": prompt})
         
-        # Prepare request body
         data = {
             "model": self.endpoint_id,
             "messages": messages,
             "max_tokens": max_tokens,
             "temperature": temperature
         }
+        return headers, data
+    
+    def _log_request(self, data, status_code, started):
+        """Sampled debug record of one call; never includes the Authorization header or the prompt text"""
+        logger.debug(
+            "LLM API request",
+            extra=sampled(
+                endpoint_id=self.endpoint_id,
+                status_code=status_code,
+                prompt_chars=sum(len(message["content"]) for message in data["messages"]),
+                max_tokens=data["max_tokens"],
+                stream=data.get("stream", False),
+                elapsed_ms=round((time.perf_counter() - started) * 1000, 1)
+            )
+        )
+    
+    def generate_response(self, prompt, system_prompt=None, max_tokens=500, temperature=0.7):
+        """
+        Generate a response using Friendli AI LLM API
         
-        # Print request details for debugging
-        print(f"LLM API - Request URL: {self.base_url}")
-        print(f"LLM API - Headers: {headers}")
-        print(f"LLM API - Messages: {messages}")
-        print(f"LLM API - Endpoint ID: {self.endpoint_id}")
+        Args:
+            prompt (str): User prompt/question
+            system_prompt (str, optional): System prompt to guide the model's behavior
+            max_tokens (int, optional): Maximum tokens to generate
+            temperature (float, optional): Temperature for response generation
+            
+        Returns:
+            dict: Response from the API
+        """
+        headers, data = self._build_request(prompt, system_prompt, max_tokens, temperature)
         
-        try:
-            response = requests.post(
+        def attempt(timeout):
+            started = time.perf_counter()
+            response = self.session.post(
                 self.base_url,
                 headers=headers,
-                json=data
+                json=data,
+                timeout=requests_attempt_timeout(timeout)
             )
-            
-            # Print response details for debugging
-            print(f"Status code: {response.status_code}")
-            print(f"Response headers: {response.headers}")
-            print(f"Response content: {response.text[:200]}...")
+            self._log_request(data, response.status_code, started)
             
             # Check for successful response
             response.raise_for_status()
             
             return response.json()
-            
+        
+        try:
+            return self.policy.call(attempt)
         except requests.exceptions.RequestException as e:
             error_msg = f"Error calling Friendli LLM API: {str(e)}"
             if hasattr(e, 'response') and e.response is not None:
@@ -85,9 +108,125 @@ class FriendliLLMAPI:
                     error_msg += f" - Details: {error_detail}"
                 except ValueError:
                     error_msg += f" - Response text: {e.response.text}"
-            print(error_msg)
+            logger.error(error_msg)
             raise Exception(error_msg)
 
+class AsyncFriendliLLMAPI(FriendliLLMAPI):
+    def __init__(self, http_client, max_concurrency=MAX_CONCURRENCY):
+        """
+        Args:
+            http_client (httpx.AsyncClient): Shared pooled client created at app startup
+            max_concurrency (int, optional): Maximum requests in flight from this client
+        """
+        super().__init__()
+        self.http_client = http_client
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def generate_response(self, prompt, system_prompt=None, max_tokens=500, temperature=0.7):
+        """
+        Generate a response using Friendli AI LLM API without blocking the event loop
+        
+        Args:
+            prompt (str): User prompt/question
+            system_prompt (str, optional): System prompt to guide the model's behavior
+            max_tokens (int, optional): Maximum tokens to generate
+            temperature (float, optional): Temperature for response generation
+            
+        Returns:
+            dict: Response from the API
+        """
+        headers, data = self._build_request(prompt, system_prompt, max_tokens, temperature)
+        
+        async def attempt(timeout):
+            async with self._semaphore:
+                started = time.perf_counter()
+                response = await self.http_client.post(
+                    self.base_url, headers=headers, json=data, timeout=httpx_attempt_timeout(timeout)
+                )
+                self._log_request(data, response.status_code, started)
+            response.raise_for_status()
+            return response.json()
+        
+        try:
+            return await self.policy.call_async(attempt)
+        except httpx.HTTPError as e:
+            raise self._http_error(e)
+    
+    def _http_error(self, e):
+        error_msg = f"Error calling Friendli LLM API: {str(e)}"
+        if isinstance(e, httpx.HTTPStatusError):
+            error_msg += f" - Response text: {e.response.text}"
+        logger.error(error_msg)
+        return Exception(error_msg)
+    
+    async def _stream_once(self, headers, data, timeout):
+        """One streaming request; yields content deltas"""
+        async with self._semaphore:
+            started = time.perf_counter()
+            async with self.http_client.stream(
+                "POST", self.base_url, headers=headers, json=data, timeout=httpx_attempt_timeout(timeout)
+            ) as response:
+                self._log_request(data, response.status_code, started)
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    chunk = json.loads(payload)
+                    for choice in chunk.get("choices", []):
+                        content = (choice.get("delta") or {}).get("content")
+                        if content:
+                            yield content
+
+    async def stream_response(self, prompt, system_prompt=None, max_tokens=500, temperature=0.7):
+        """
+        Stream a response from the chat-completions endpoint
+        
+        Args:
+            prompt (str): User prompt/question
+            system_prompt (str, optional): System prompt to guide the model's behavior
+            max_tokens (int, optional): Maximum tokens to generate
+            temperature (float, optional): Temperature for response generation
+            
+        Yields:
+            str: Content deltas as they arrive
+        """
+        headers, data = self._build_request(prompt, system_prompt, max_tokens, temperature)
+        data["stream"] = True
+        
+        deadline, probe = self.policy.start()
+        attempt = 0
+        try:
+            while True:
+                yielded = False
+                try:
+                    async for content in self._stream_once(headers, data, self.policy.remaining(deadline)):
+                        yielded = True
+                        yield content
+                except Exception as e:
+                    probe = False
+                    # Only retry before the first token; afterwards a retry would repeat text the caller already has
+                    delay = self.policy.failed(e, self.policy.max_retries if yielded else attempt, deadline)
+                    if delay is None:
+                        self.policy.give_up(e, deadline)
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    probe = self.policy.before_retry()
+                    continue
+                # Not observed as latency: a stream's duration depends on the answer length
+                self.policy.succeeded()
+                return
+        except httpx.HTTPError as e:
+            raise self._http_error(e)
+        except BaseException:
+            # Cancelled, or closed early (GeneratorExit) because the SSE client disconnected
+            self.policy.abandoned(probe)
+            raise
+
 # Example usage
 def main():
     if __name__ == "__main__":
@@ -1,22 +1,58 @@
+import io
 import os
+import time
+import wave
+import asyncio
+import logging
+import tempfile
+import httpx
+import numpy as np
 import requests
 from dotenv import load_dotenv
 import json
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from friendli_http import MAX_CONCURRENCY, friendli_policy, httpx_attempt_timeout, requests_attempt_timeout
+from structured_logging import sampled
+from audio_preprocessing import FRAME_MS, audio_levels, preprocess_audio
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class FriendliWhisperAPI:
     def __init__(self):
         self.api_key = os.getenv('FRIENDLI_API_KEY')
         self.endpoint_id = os.getenv('FRIENDLI_ENDPOINT_ID', 'dep2zfjfglqfzjb')  # Default from your provided info
-        self.base_url = "https://api.friendli.ai/dedicated/v1/audio/transcriptions"
+        self.base_url = os.getenv('FRIENDLI_WHISPER_URL', "https://api.friendli.ai/dedicated/v1/audio/transcriptions")
+        
+        # Segmented transcription settings
+        self.segment_concurrency = int(os.getenv('FRIENDLI_WHISPER_CONCURRENCY', '4'))
+        self.segment_target_seconds = float(os.getenv('FRIENDLI_WHISPER_SEGMENT_SECONDS', '30'))
         
         if not self.api_key:
             raise ValueError("FRIENDLI_API_KEY environment variable not set")
+        
+        # Reuse connections across calls and segments
+        self.session = requests.Session()
+        # Deadline, retries (FRIENDLI_WHISPER_SEGMENT_RETRIES) and circuit breaker shared with every other Whisper client
+        self.policy = friendli_policy("whisper")
     
-    def transcribe_audio(self, audio_file_path, language=None, prompt=None):
+    def _log_request(self, file_name, size, status_code, started):
+        """Sampled debug record of one call; never includes the Authorization header or the response body"""
+        logger.debug(
+            "Whisper API request",
+            extra=sampled(
+                endpoint_id=self.endpoint_id,
+                file_name=file_name,
+                bytes=size,
+                status_code=status_code,
+                elapsed_ms=round((time.perf_counter() - started) * 1000, 1)
+            )
+        )
+    
+    def transcribe_audio(self, audio_file_path, language=None, prompt=None, response_format=None):
         """
         Transcribe audio using Friendli Whisper API
         
@@ -24,6 +60,7 @@ class FriendliWhisperAPI:
             audio_file_path (str): Path to the audio file
             language (str, optional): Language code (e.g., 'en', 'es')
             prompt (str, optional): Optional prompt to guide the transcription
+            response_format (str, optional): e.g. 'verbose_json' to get timed segments
             
         Returns:
             dict: Transcription response from the API
@@ -38,21 +75,15 @@ class FriendliWhisperAPI:
             "Authorization": f"Bearer {self.api_key}"
         }
         
-        # Open the file to make sure it exists and is readable
+        # Make sure the file is readable and not empty
         try:
-            file_content = open(audio_path, "rb")
             file_size = os.path.getsize(audio_path)
-            print(f"API - Reading file: {audio_path}, Size: {file_size} bytes")
             if file_size == 0:
                 raise ValueError(f"File is empty: {audio_path}")
         except Exception as e:
             raise ValueError(f"Error reading audio file: {str(e)}")
-            
-        # Prepare files and additional form data
-        files = {
-            "file": (audio_path.name, file_content)
-        }
         
+        # Prepare additional form data
         data = {
             "model": self.endpoint_id
         }
@@ -62,41 +93,30 @@ class FriendliWhisperAPI:
             data["language"] = language
         if prompt:
             data["prompt"] = prompt
-            
-        # Print request details for debugging
-        print(f"API - Request URL: {self.base_url}")
-        print(f"API - Headers: {headers}")
-        print(f"API - Data: {data}")
-        print(f"API - File name: {audio_path.name}")
-        print(f"API - Endpoint ID: {self.endpoint_id}")
-        print(f"API - API Key (first 10 chars): {self.api_key[:10]}...")
-        print(f"API - Files dictionary keys: {files.keys()}")
-
+        if response_format:
+            data["response_format"] = response_format
         
-        try:
-            response = requests.post(
-                self.base_url,
-                headers=headers,
-                files=files,
-                data=data
-            )
-            
-            # Close the file after the request
-            files["file"][1].close()
-            
-            # Print response details for debugging
-            print(f"Status code: {response.status_code}")
-            print(f"Response headers: {response.headers}")
-            print(f"Response content: {response.text}")
+        def attempt(timeout):
+            # Each attempt uploads the file from the start
+            with open(audio_path, "rb") as file_content:
+                started = time.perf_counter()
+                response = self.session.post(
+                    self.base_url,
+                    headers=headers,
+                    files={"file": (audio_path.name, file_content)},
+                    data=data,
+                    timeout=requests_attempt_timeout(timeout)
+                )
+            self._log_request(audio_path.name, file_size, response.status_code, started)
             
             # Check for successful response
             response.raise_for_status()
             
             return response.json()
-            
+        
+        try:
+            return self.policy.call(attempt)
         except requests.exceptions.RequestException as e:
-            # Close the file in case of an exception
-            files["file"][1].close()
             error_msg = f"Error calling Friendli API: {str(e)}"
             if hasattr(e, 'response') and e.response is not None:
                 try:
@@ -104,9 +124,244 @@ class FriendliWhisperAPI:
                     error_msg += f" - Details: {error_detail}"
                 except ValueError:
                     error_msg += f" - Response text: {e.response.text}"
-            print(error_msg)
+            logger.error(error_msg)
             raise Exception(error_msg)
 
+    def transcribe_audio_segmented(self, audio_file_path, language=None, prompt=None, max_concurrency=None, levels=None):
+        """
+        Transcribe a long recording by splitting it at silence points and
+        transcribing the segments concurrently
+        
+        Args:
+            audio_file_path (str): Path to the audio file
+            language (str, optional): Language code (e.g., 'en', 'es')
+            prompt (str, optional): Optional prompt to guide the transcription
+            max_concurrency (int, optional): Segments in flight at once (defaults to FRIENDLI_WHISPER_CONCURRENCY)
+            levels (numpy.ndarray, optional): RMS level of every FRAME_MS frame of the file, as returned by
+                preprocess_audio; measured here in one streaming pass when not given
+            
+        Returns:
+            dict: Stitched transcription with "text", "segments" (absolute start/end seconds) and "duration"
+        """
+        audio_path = Path(audio_file_path)
+        if not audio_path.exists():
+            raise FileNotFoundError(f"Audio file not found: {audio_file_path}")
+        
+        wav_path = audio_path
+        try:
+            try:
+                with wave.open(str(audio_path), "rb") as wav:
+                    params = wav.getparams()
+            except (wave.Error, EOFError):
+                # Not PCM WAV: decode it once into a 16 kHz mono WAV (needs ffmpeg); nothing is trimmed
+                fd, decoded = tempfile.mkstemp(suffix=".wav", dir=audio_path.parent)
+                os.close(fd)
+                wav_path = Path(decoded)
+                levels = preprocess_audio(audio_path, wav_path, threshold_db=float("-inf"))["levels"]
+                with wave.open(str(wav_path), "rb") as wav:
+                    params = wav.getparams()
+            if levels is None:
+                levels = audio_levels(wav_path)
+            
+            total_ms = int(params.nframes * 1000 / params.framerate)
+            spans = plan_segments(levels, total_ms, target_ms=int(self.segment_target_seconds * 1000))
+            logger.info("Transcribing %s as %d segment(s)", audio_path.name, len(spans), extra={"segments": len(spans)})
+            
+            def transcribe_span(index_and_span):
+                index, (start_ms, end_ms) = index_and_span
+                file_name = f"{audio_path.stem}_{index:04d}.wav"
+                audio_bytes = read_wav_span(wav_path, start_ms, end_ms)
+                return self._transcribe_segment(audio_bytes, file_name, start_ms / 1000.0, language, prompt)
+            
+            workers = max(1, max_concurrency or self.segment_concurrency)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # map() keeps results in segment order
+                results = list(executor.map(transcribe_span, enumerate(spans)))
+        finally:
+            if wav_path != audio_path:
+                wav_path.unlink(missing_ok=True)
+        
+        segments = [segment for result in results for segment in result["segments"]]
+        return {
+            "text": " ".join(result["text"].strip() for result in results if result["text"].strip()),
+            "segments": segments,
+            "duration": total_ms / 1000.0
+        }
+    
+    def _transcribe_segment(self, audio_bytes, file_name, offset_seconds, language=None, prompt=None):
+        """Transcribe one segment (retried on its own by the policy) and shift its timings by offset_seconds"""
+        data = {
+            "model": self.endpoint_id,
+            "response_format": "verbose_json"
+        }
+        if language:
+            data["language"] = language
+        if prompt:
+            data["prompt"] = prompt
+        headers = {
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        
+        def attempt(timeout):
+            started = time.perf_counter()
+            response = self.session.post(
+                self.base_url,
+                headers=headers,
+                files={"file": (file_name, io.BytesIO(audio_bytes))},
+                data=data,
+                timeout=requests_attempt_timeout(timeout)
+            )
+            self._log_request(file_name, len(audio_bytes), response.status_code, started)
+            response.raise_for_status()
+            return response.json()
+        
+        try:
+            result = self.policy.call(attempt)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise Exception(f"Error transcribing segment {file_name}: {str(e)}")
+        
+        text = result.get("text", "")
+        raw_segments = result.get("segments") or [{"start": 0.0, "end": result.get("duration", 0.0), "text": text}]
+        segments = [
+            {
+                "start": round(offset_seconds + float(segment.get("start", 0.0)), 3),
+                "end": round(offset_seconds + float(segment.get("end", 0.0)), 3),
+                "text": segment.get("text", "").strip()
+            }
+            for segment in raw_segments
+        ]
+        return {"text": text, "segments": segments}
+
+class AsyncFriendliWhisperAPI(FriendliWhisperAPI):
+    def __init__(self, http_client, max_concurrency=MAX_CONCURRENCY):
+        """
+        Args:
+            http_client (httpx.AsyncClient): Shared pooled client created at app startup
+            max_concurrency (int, optional): Maximum requests in flight from this client
+        """
+        super().__init__()
+        self.http_client = http_client
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def transcribe_audio(self, audio_file_path, language=None, prompt=None, response_format=None):
+        """
+        Transcribe audio using Friendli Whisper API without blocking the event loop
+        
+        Args:
+            audio_file_path (str): Path to the audio file
+            language (str, optional): Language code (e.g., 'en', 'es')
+            prompt (str, optional): Optional prompt to guide the transcription
+            response_format (str, optional): e.g. 'verbose_json' to get timed segments
+            
+        Returns:
+            dict: Transcription response from the API
+        """
+        audio_path = Path(audio_file_path)
+        if not audio_path.exists():
+            raise FileNotFoundError(f"Audio file not found: {audio_file_path}")
+        audio_bytes = await asyncio.to_thread(audio_path.read_bytes)
+        if not audio_bytes:
+            raise ValueError(f"File is empty: {audio_path}")
+        return await self.transcribe_bytes(audio_bytes, audio_path.name, language, prompt, response_format)
+    
+    async def transcribe_bytes(self, audio_bytes, file_name, language=None, prompt=None, response_format=None):
+        """Transcribe in-memory audio bytes"""
+        data = {
+            "model": self.endpoint_id
+        }
+        if language:
+            data["language"] = language
+        if prompt:
+            data["prompt"] = prompt
+        if response_format:
+            data["response_format"] = response_format
+        headers = {
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        
+        async def attempt(timeout):
+            async with self._semaphore:
+                started = time.perf_counter()
+                response = await self.http_client.post(
+                    self.base_url,
+                    headers=headers,
+                    files={"file": (file_name, audio_bytes)},
+                    data=data,
+                    timeout=httpx_attempt_timeout(timeout)
+                )
+                self._log_request(file_name, len(audio_bytes), response.status_code, started)
+            response.raise_for_status()
+            return response.json()
+        
+        try:
+            return await self.policy.call_async(attempt)
+        except httpx.HTTPError as e:
+            error_msg = f"Error calling Friendli API: {str(e)}"
+            if isinstance(e, httpx.HTTPStatusError):
+                error_msg += f" - Response text: {e.response.text}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+
+def read_wav_span(path, start_ms, end_ms):
+    """
+    Returns:
+        bytes: A WAV file of the [start_ms, end_ms) part of a PCM WAV file, in its own format
+    """
+    with wave.open(str(path), "rb") as source:
+        rate = source.getframerate()
+        first = min(int(start_ms * rate / 1000), source.getnframes())
+        source.setpos(first)
+        frames = source.readframes(max(int(end_ms * rate / 1000) - first, 0))
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as out:
+            out.setnchannels(source.getnchannels())
+            out.setsampwidth(source.getsampwidth())
+            out.setframerate(rate)
+            out.writeframes(frames)
+    return buffer.getvalue()
+
+def plan_segments(levels, total_ms, target_ms=30_000, max_ms=None, min_silence_ms=400, silence_margin_db=16,
+                  frame_ms=FRAME_MS):
+    """
+    Choose segment boundaries, cutting in the middle of silences close to
+    target_ms and never producing a segment longer than max_ms
+    
+    Args:
+        levels (numpy.ndarray): RMS level of every frame_ms frame of the recording (see audio_preprocessing)
+        total_ms (int): Length of the recording
+        silence_margin_db (float): Frames this far below the recording's overall level are silent
+    
+    Returns:
+        list: (start_ms, end_ms) pairs covering the whole recording
+    """
+    max_ms = max_ms or int(target_ms * 1.5)
+    if total_ms <= max_ms:
+        return [(0, total_ms)]
+    
+    levels = np.asarray(levels, dtype=np.float64)
+    overall = np.sqrt(np.mean(np.square(levels))) if len(levels) else 0.0
+    threshold = overall * 10 ** (-silence_margin_db / 20) if overall > 0 else 10 ** (-60 / 20)
+    silent = np.concatenate([[False], levels < threshold, [False]])
+    # Runs of silent frames: starts where silence begins, ends where it stops
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    runs = edges.reshape(-1, 2)
+    runs = runs[(runs[:, 1] - runs[:, 0]) * frame_ms >= min_silence_ms]
+    cut_points = ((runs[:, 0] + runs[:, 1]) * frame_ms // 2).tolist()
+    
+    spans = []
+    start = 0
+    while total_ms - start > max_ms:
+        # Prefer the silence closest to the target length within the allowed window
+        candidates = [point for point in cut_points if start + target_ms // 2 <= point <= start + max_ms]
+        if candidates:
+            cut = min(candidates, key=lambda point: abs(point - (start + target_ms)))
+        else:
+            cut = start + target_ms
+        spans.append((start, cut))
+        start = cut
+    spans.append((start, total_ms))
+    return spans
+
 # Example usage
 def main():
     # Example usage of the API
@@ -0,0 +1,301 @@
+"""
+Bulk ingestion of a directory of recordings and transcripts
+
+Walks a directory, transcribes audio files through FriendliWhisperAPI and
+indexes them, and sends .txt transcripts (plain or timestamped, like the files
+in transcripts/) straight to chunking and indexing. Transcription and indexing
+run in separate thread pools, so the number of Whisper requests in flight can
+be sized for the API's limits independently of indexing.
+
+Every finished step is appended to a JSONL manifest. Re-running the same
+command skips files that are already indexed (unless they changed on disk)
+and indexes already transcribed audio without calling Whisper again.
+
+With --summaries (or SPEAKSEEK_SUMMARIES=true) each file's summary tree is
+built after indexing, in the index pool.
+
+Usage:
+    python ingest.py ARCHIVE_DIR [--transcribe-workers 2] [--index-workers 2]
+                                 [--manifest ingest_manifest.jsonl] [--keep-names]
+                                 [--summaries] [--retry-failed] [--dry-run]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from pathlib import Path
+
+from conversation_ids import slugify
+
+TEXT_EXTENSIONS = (".txt",)
+
+
+class Manifest:
+    """Append-only JSONL log of ingestion steps; the last record per file wins"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries = {}
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by an interrupted run
+                        continue
+                    self._entries[entry["path"]] = entry
+
+    def get(self, path):
+        return self._entries.get(str(path))
+
+    def outputs(self):
+        """Resolved paths of the transcripts written by earlier runs"""
+        return {
+            str(Path(entry["transcript"]).resolve()) for entry in self._entries.values() if entry.get("transcript")
+        }
+
+    def record(self, path, **fields):
+        entry = {"path": str(path), "recorded_at": time.time(), **fields}
+        with self._lock:
+            self._entries[entry["path"]] = entry
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        return entry
+
+
+class Progress:
+    """Thread-safe counters with a throughput line printed as files finish"""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.bytes_done = 0
+        self.chunks = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def finish(self, path, size, ok, chunks=0, detail=""):
+        with self._lock:
+            if ok:
+                self.done += 1
+                self.chunks += chunks
+            else:
+                self.failed += 1
+            self.bytes_done += size
+            elapsed = max(time.perf_counter() - self.started, 1e-6)
+            finished = self.done + self.failed
+            rate = finished / elapsed
+            eta = (self.total - finished) / rate if rate else 0
+            print(
+                f"[{finished}/{self.total}] {'ok' if ok else 'FAILED'} {path} {detail}| "
+                f"{rate:.2f} files/s, {self.bytes_done / elapsed / 1024 / 1024:.2f} MB/s, "
+                f"{self.chunks / elapsed:.1f} chunks/s, ETA {eta:.0f}s",
+                flush=True
+            )
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return (
+            f"Indexed {self.done} file(s), {self.failed} failed, {self.chunks} chunks "
+            f"in {elapsed:.1f}s ({self.done / elapsed if elapsed else 0:.2f} files/s)"
+        )
+
+
+def conversation_id_for(path, root, keep_names=False):
+    """
+    Stable conversation id for a file, so re-runs overwrite instead of duplicating
+
+    With keep_names the slugified file stem is used (unchanged for files that
+    were saved by the app, e.g. transcripts/<conversation_id>.txt).
+    """
+    if keep_names:
+        return slugify(path.stem, "recording")
+    slug = slugify(path.stem, "recording")
+    digest = hashlib.sha1(str(path.relative_to(root)).encode("utf-8")).hexdigest()[:8]
+    return f"{slug}_{digest}"
+
+
+def discover(root, audio_extensions, manifest, retry_failed=False):
+    """
+    Find files still to ingest
+
+    Transcripts that earlier runs wrote into the transcripts directory are
+    skipped, so walking a directory that contains it doesn't ingest them again.
+
+    Returns:
+        list: Dicts with "path", "kind" ("audio" or "text"), "size", "mtime" and the previous manifest entry
+    """
+    items = []
+    outputs = manifest.outputs()
+    for path in sorted(root.rglob("*")):
+        suffix = path.suffix.lower()
+        if not path.is_file() or suffix not in audio_extensions + TEXT_EXTENSIONS:
+            continue
+        if str(path.resolve()) in outputs:
+            continue
+        stat = path.stat()
+        previous = manifest.get(path)
+        unchanged = previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime
+        if unchanged and previous["status"] == "done":
+            continue
+        if unchanged and previous["status"] == "failed" and not retry_failed:
+            continue
+        items.append({
+            "path": path,
+            "kind": "audio" if suffix in audio_extensions else "text",
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "previous": previous if unchanged else None
+        })
+    return items
+
+
+def run(args):
+    # Imported here so --help and bad arguments don't start the retrieval backend
+    import main
+    from chunking import format_transcript
+    main.init_backends()
+    summaries = args.summaries or main.SUMMARIES_ENABLED
+
+    root = Path(args.directory).resolve()
+    manifest = Manifest(args.manifest or root / "ingest_manifest.jsonl")
+    transcripts_dir = main.TRANSCRIPTS_DIR.resolve()
+    items = discover(root, tuple(main.ALLOWED_AUDIO_EXTENSIONS), manifest, args.retry_failed)
+    audio_count = sum(1 for item in items if item["kind"] == "audio")
+    print(f"{len(items)} file(s) to ingest ({audio_count} audio, {len(items) - audio_count} transcripts) from {root}")
+    if args.dry_run:
+        for item in items:
+            print(f"  {item['kind']:5} {item['path']}")
+        return 0
+
+    progress = Progress(len(items))
+    transcribe_pool = ThreadPoolExecutor(max_workers=args.transcribe_workers, thread_name_prefix="transcribe")
+    index_pool = ThreadPoolExecutor(max_workers=args.index_workers, thread_name_prefix="index")
+
+    def checkpoint(item, **fields):
+        # Keep pointing at a saved transcript, so a failed indexing step never re-runs Whisper
+        if item.get("transcript"):
+            fields["transcript"] = item["transcript"]
+        manifest.record(item["path"], size=item["size"], mtime=item["mtime"], **fields)
+
+    def index_step(item, conversation_id, transcript_text=None, segments=None):
+        started = time.perf_counter()
+        try:
+            report = main.vectorize_transcript(
+                conversation_id, transcript_text=transcript_text, segments=segments,
+                name=item["path"].stem, source="ingest"
+            )
+            if report["failed"]:
+                raise RuntimeError(f"{len(report['failed'])} of {report['total']} chunks failed: {report['failed'][0]['error']}")
+        except Exception as e:
+            checkpoint(item, status="failed", stage="indexing", conversation_id=conversation_id, error=str(e))
+            progress.finish(item["path"], item["size"], False, detail=f"({str(e)}) ")
+            return
+        if summaries:
+            try:
+                main.summarize_conversation(conversation_id, transcript_text=transcript_text, segments=segments)
+            except Exception as e:
+                # Re-running with --retry-failed indexes again (overwriting) and retries the summaries
+                checkpoint(item, status="failed", stage="summarizing", conversation_id=conversation_id, error=str(e))
+                progress.finish(item["path"], item["size"], False, detail=f"({str(e)}) ")
+                return
+        checkpoint(item, status="done", conversation_id=conversation_id, chunks=report["total"],
+                   seconds=round(time.perf_counter() - started, 3))
+        progress.finish(item["path"], item["size"], True, report["total"], detail=f"-> {conversation_id} ")
+
+    def transcribe_step(item, conversation_id):
+        try:
+            # Preprocessed (downmixed, resampled, long silences cut) like uploads; segment times stay in the original
+            text, segments = main.transcribe_file(str(item["path"]))
+            if not text:
+                raise RuntimeError("Empty transcription")
+            transcript_path = main.TRANSCRIPTS_DIR / f"{conversation_id}.txt"
+            with open(transcript_path, "w") as f:
+                f.write(format_transcript(segments) if segments else text)
+        except Exception as e:
+            checkpoint(item, status="failed", stage="transcribing", conversation_id=conversation_id, error=str(e))
+            progress.finish(item["path"], item["size"], False, detail=f"({str(e)}) ")
+            return None
+        item["transcript"] = str(transcript_path)
+        checkpoint(item, status="transcribed", conversation_id=conversation_id)
+        # Hand off to the index pool so this worker can start the next Whisper request
+        return index_pool.submit(index_step, item, conversation_id, text if not segments else None, segments or None)
+
+    index_futures = []
+    transcribe_futures = []
+    try:
+        for item in items:
+            # Files already in the transcripts directory were saved by the app under their conversation id
+            in_transcripts_dir = item["path"].parent == transcripts_dir
+            conversation_id = conversation_id_for(item["path"], root, args.keep_names or in_transcripts_dir)
+            previous = item["previous"]
+            if item["kind"] == "text":
+                text = item["path"].read_text()
+                if not in_transcripts_dir:
+                    # Keep a copy next to the transcripts of uploaded conversations
+                    transcript_path = transcripts_dir / f"{conversation_id}.txt"
+                    transcript_path.write_text(text)
+                    item["transcript"] = str(transcript_path)
+                index_futures.append(index_pool.submit(index_step, item, conversation_id, text))
+            elif previous and previous.get("transcript") and Path(previous["transcript"]).exists():
+                # Transcribed by an earlier run; index the saved transcript
+                item["transcript"] = previous["transcript"]
+                text = Path(previous["transcript"]).read_text()
+                index_futures.append(index_pool.submit(index_step, item, previous["conversation_id"], text))
+            else:
+                transcribe_futures.append(transcribe_pool.submit(transcribe_step, item, conversation_id))
+
+        for future in as_completed(transcribe_futures):
+            if future.result() is not None:
+                index_futures.append(future.result())
+        wait(index_futures)
+    except KeyboardInterrupt:
+        print("Interrupted; finished files are recorded in the manifest, re-run the same command to resume")
+        transcribe_pool.shutdown(wait=False, cancel_futures=True)
+        index_pool.shutdown(wait=False, cancel_futures=True)
+        return 130
+    finally:
+        transcribe_pool.shutdown()
+        index_pool.shutdown()
+
+    print(progress.summary())
+    return 1 if progress.failed else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe and index a directory of recordings and transcripts")
+    parser.add_argument("directory", help="Directory to walk (recursively)")
+    parser.add_argument(
+        "--transcribe-workers",
+        type=int,
+        default=int(os.getenv("SPEAKSEEK_INGEST_TRANSCRIBE_WORKERS", "2")),
+        help="Audio files transcribed at once; each also splits into FRIENDLI_WHISPER_CONCURRENCY segment requests"
+    )
+    parser.add_argument(
+        "--index-workers",
+        type=int,
+        default=int(os.getenv("SPEAKSEEK_INGEST_INDEX_WORKERS", "2")),
+        help="Files chunked, embedded and indexed at once"
+    )
+    parser.add_argument("--manifest", help="Checkpoint manifest (default: ARCHIVE_DIR/ingest_manifest.jsonl)")
+    parser.add_argument(
+        "--summaries",
+        action="store_true",
+        help="Also build chunk/section/meeting summaries for whole-meeting questions (default: SPEAKSEEK_SUMMARIES)"
+    )
+    parser.add_argument("--keep-names", action="store_true", help="Use file names as conversation ids")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry files that failed in a previous run")
+    parser.add_argument("--dry-run", action="store_true", help="List the files that would be ingested")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
@@ -0,0 +1,186 @@
+"""
+Background ingestion jobs for uploaded audio
+
+Uploads are recorded in a small SQLite job table and processed by a bounded
+pool of worker threads, so the HTTP request returns as soon as the file is
+saved. Unfinished jobs are picked up again when the app restarts.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Stages a job moves through, in order ("summarizing" only runs when summaries are enabled)
+JOB_STAGES = ["queued", "preprocessing", "transcribing", "chunking", "indexing", "summarizing", "completed"]
+FINISHED_STAGES = ("completed", "failed")
+
+
+class JobStore:
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    conversation_id TEXT NOT NULL,
+                    conversation_name TEXT,
+                    file_path TEXT,
+                    stage TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    error TEXT,
+                    stage_timings TEXT NOT NULL DEFAULT '{}',
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    content_hash TEXT,
+                    source_conversation_id TEXT
+                )
+                """
+            )
+            # Job tables created before deduplication lack the content columns
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column in ("content_hash", "source_conversation_id"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+
+    def create(self, conversation_id, conversation_name, file_path, content_hash=None, source_conversation_id=None):
+        """
+        Insert a new queued job
+
+        Args:
+            content_hash (str, optional): SHA-256 of the uploaded audio
+            source_conversation_id (str, optional): Already indexed conversation with the same audio to copy from
+
+        Returns:
+            dict: The stored job
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, conversation_id, conversation_name, file_path, stage, created_at, "
+                "content_hash, source_conversation_id) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, conversation_id, conversation_name, str(file_path), time.time(),
+                 content_hash, source_conversation_id)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def update(self, job_id, **fields):
+        if "stage_timings" in fields:
+            fields["stage_timings"] = json.dumps(fields["stage_timings"])
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+                (*fields.values(), job_id)
+            )
+
+    def unfinished(self):
+        """Jobs that were queued or running when the process last stopped"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE stage NOT IN (?, ?) ORDER BY created_at",
+                FINISHED_STAGES
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    @staticmethod
+    def _row_to_job(row):
+        job = dict(row)
+        job["stage_timings"] = json.loads(job["stage_timings"] or "{}")
+        return job
+
+
+class JobContext:
+    """Handed to the job handler so it can report stage changes and progress"""
+
+    def __init__(self, store, job):
+        self.store = store
+        self.job = job
+        self._stage = None
+        self._stage_started = None
+        self._timings = dict(job["stage_timings"])
+
+    def stage(self, name):
+        """Start a new stage, closing the timing of the previous one"""
+        self._close_stage()
+        self._stage = name
+        self._stage_started = time.perf_counter()
+        self.store.update(self.job["job_id"], stage=name, progress=self._base_progress(name),
+                          stage_timings=self._timings)
+
+    def progress(self, fraction):
+        """Report progress within the current stage (0.0 - 1.0)"""
+        start = self._base_progress(self._stage)
+        span = 1.0 / (len(JOB_STAGES) - 1)
+        self.store.update(self.job["job_id"], progress=round(start + span * min(max(fraction, 0.0), 1.0), 4))
+
+    def _close_stage(self):
+        if self._stage is not None:
+            self._timings[self._stage] = round(time.perf_counter() - self._stage_started, 4)
+
+    @staticmethod
+    def _base_progress(stage):
+        if stage not in JOB_STAGES:
+            return 0.0
+        return JOB_STAGES.index(stage) / (len(JOB_STAGES) - 1)
+
+
+class JobQueue:
+    def __init__(self, store, handler, max_workers=2):
+        """
+        Args:
+            store (JobStore): Persistent job table
+            handler (callable): Called as handler(job, context) on a worker thread
+            max_workers (int): Size of the worker pool
+        """
+        self.store = store
+        self.handler = handler
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+
+    def submit(self, job):
+        self._executor.submit(self._run, job["job_id"])
+
+    def resume(self):
+        """Re-queue jobs left unfinished by a previous run"""
+        jobs = self.store.unfinished()
+        for job in jobs:
+            self.store.update(job["job_id"], stage="queued", progress=0.0)
+            self.submit(job)
+        if jobs:
+            logger.info("Resumed %d unfinished ingestion job(s)", len(jobs))
+        return len(jobs)
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or job["stage"] in FINISHED_STAGES:
+            return
+        context = JobContext(self.store, job)
+        self.store.update(job_id, started_at=time.time(), error=None)
+        try:
+            self.handler(job, context)
+            context.stage("completed")
+            self.store.update(job_id, progress=1.0, finished_at=time.time())
+        except Exception as e:
+            logger.error("Ingestion job %s failed: %s", job_id, e, extra={"job_id": job_id, "stage": context._stage})
+            context._close_stage()
+            self.store.update(job_id, stage="failed", error=str(e), finished_at=time.time(),
+                              stage_timings=context._timings)
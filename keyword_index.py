@@ -0,0 +1,358 @@
+"""
+Per-conversation BM25 keyword index and rank fusion with vector results
+
+Each conversation's index is stored as one .npz file of flat arrays: a
+sorted term array, CSR-style posting offsets, int32 chunk ids and term
+frequencies, plus chunk lengths and texts. Terms are looked up with a binary
+search, so a keyword query touches only the postings of its own terms and
+needs no network round trip. Indexes are loaded lazily and only the most
+recently used ones are kept in memory.
+"""
+
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from conversation_ids import check_conversation_id
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['.][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by did do does for from had has have how i if in is it its of on or "
+    "so that the their them then there they this to um uh was we were what when where which who "
+    "why will with you your".split()
+)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, terms, offsets, doc_ids, term_freqs, doc_lengths, contents, starts, ends, k1=1.2, b=0.75):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.contents = contents
+        self.starts = starts
+        self.ends = ends
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, contents, spans=None):
+        """
+        Build an index over chunk texts
+
+        Args:
+            contents (list): Chunk texts, in chunk order
+            spans (list, optional): Per-chunk (start, end) seconds
+
+        Returns:
+            BM25Index: The built index
+        """
+        postings = {}
+        doc_lengths = np.zeros(len(contents), dtype=np.int32)
+        for doc_id, content in enumerate(contents):
+            tokens = tokenize(content)
+            doc_lengths[doc_id] = len(tokens)
+            for term, freq in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_id, freq))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        term_freqs = np.empty(offsets[-1], dtype=np.float32)
+        for i, term in enumerate(terms):
+            entries = np.array(postings[term], dtype=np.int64).reshape(-1, 2)
+            doc_ids[offsets[i]:offsets[i + 1]] = entries[:, 0]
+            term_freqs[offsets[i]:offsets[i + 1]] = entries[:, 1]
+
+        spans = spans or [(None, None)] * len(contents)
+        return cls(
+            np.array(terms, dtype=str),
+            offsets,
+            doc_ids,
+            term_freqs,
+            doc_lengths,
+            np.array(contents, dtype=str),
+            np.array([np.nan if start is None else start for start, _ in spans], dtype=np.float64),
+            np.array([np.nan if end is None else end for _, end in spans], dtype=np.float64)
+        )
+
+    def replace_from(self, start, contents, spans=None):
+        """
+        Index with the chunks from position start on replaced by new ones
+
+        The postings of the kept chunks are reused instead of tokenizing their
+        texts again, so appending to a long transcript only tokenizes the new chunks.
+
+        Args:
+            start (int): Position of the first replaced chunk
+            contents (list): Chunk texts from position start on
+            spans (list, optional): Their (start, end) seconds
+
+        Returns:
+            BM25Index: The new index
+        """
+        added = BM25Index.build(contents, spans)
+        keep = self.doc_ids < start
+        terms = np.concatenate([
+            self.terms[np.repeat(np.arange(len(self.terms)), np.diff(self.offsets))][keep],
+            added.terms[np.repeat(np.arange(len(added.terms)), np.diff(added.offsets))]
+        ])
+        doc_ids = np.concatenate([self.doc_ids[keep], added.doc_ids + start])
+        term_freqs = np.concatenate([self.term_freqs[keep], added.term_freqs])
+        # Regroup the postings by term, in chunk order within each term
+        unique_terms, term_index = np.unique(terms, return_inverse=True)
+        order = np.lexsort((doc_ids, term_index))
+        offsets = np.zeros(len(unique_terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(term_index, minlength=len(unique_terms)))
+        return BM25Index(
+            unique_terms,
+            offsets,
+            doc_ids[order].astype(np.int32),
+            term_freqs[order],
+            np.concatenate([self.doc_lengths[:start], added.doc_lengths]),
+            np.concatenate([self.contents[:start], added.contents]),
+            np.concatenate([self.starts[:start], added.starts]),
+            np.concatenate([self.ends[:start], added.ends]),
+            self.k1,
+            self.b
+        )
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            terms=self.terms,
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            term_freqs=self.term_freqs,
+            doc_lengths=self.doc_lengths,
+            contents=self.contents,
+            starts=self.starts,
+            ends=self.ends
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+    def _postings(self, term):
+        position = int(np.searchsorted(self.terms, term))
+        if position >= len(self.terms) or self.terms[position] != term:
+            return None
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.doc_ids[start:end], self.term_freqs[start:end]
+
+    def term_stats(self, terms):
+        """
+        Returns:
+            tuple: (number of chunks, {term: number of chunks containing it})
+        """
+        frequencies = {}
+        for term in terms:
+            postings = self._postings(term)
+            frequencies[term] = 0 if postings is None else len(postings[0])
+        return len(self.doc_lengths), frequencies
+
+    def search(self, query, limit=10, idf=None):
+        """
+        Args:
+            query (str): Keyword query
+            limit (int): Maximum hits
+            idf (dict, optional): Precomputed {term: idf}, e.g. from global_idf() across conversations
+
+        Returns:
+            list: (chunk_index, score) pairs, best first
+        """
+        if len(self.doc_lengths) == 0:
+            return []
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        n_docs = len(self.doc_lengths)
+        matched = False
+        for term in set(tokenize(query)):
+            postings = self._postings(term)
+            if postings is None:
+                continue
+            matched = True
+            docs, freqs = postings
+            if idf is not None:
+                term_idf = idf.get(term, 0.0)
+            else:
+                term_idf = bm25_idf(n_docs, len(docs))
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[docs] / self.avg_length)
+            scores[docs] += term_idf * freqs * (self.k1 + 1.0) / (freqs + norm)
+        if not matched:
+            return []
+        candidates = np.flatnonzero(scores)
+        k = min(limit, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def hit(self, chunk_index, score, conversation_id):
+        """Format a result like the vector store hits"""
+        start, end = self.starts[chunk_index], self.ends[chunk_index]
+        return {
+            "content": str(self.contents[chunk_index]),
+            "conversation_id": conversation_id,
+            "timestamp": chunk_index if np.isnan(start) else float(start),
+            "end_timestamp": None if np.isnan(end) else float(end),
+            "score": score
+        }
+
+
+class KeywordIndexStore:
+    """Builds, persists and lazily loads one BM25Index per conversation"""
+
+    def __init__(self, root_dir, max_open=256):
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, conversation_id):
+        return self.root_dir / f"{check_conversation_id(conversation_id)}.npz"
+
+    def build(self, conversation_id, contents, spans=None, start=0):
+        """
+        Index a conversation's chunks
+
+        Args:
+            start (int): Position of the first chunk in contents; the stored chunks before it are kept
+        """
+        if start:
+            previous = self.get(conversation_id)
+            if previous is None or len(previous.doc_lengths) < start:
+                raise ValueError(f"Cannot index chunks from position {start} of {conversation_id}")
+            index = previous.replace_from(start, contents, spans)
+        else:
+            index = BM25Index.build(contents, spans)
+        index.save(self._path(conversation_id))
+        with self._lock:
+            self._open.pop(conversation_id, None)
+        return index
+
+    def get(self, conversation_id):
+        with self._lock:
+            if conversation_id in self._open:
+                self._open.move_to_end(conversation_id)
+                return self._open[conversation_id]
+            path = self._path(conversation_id)
+            if not path.exists():
+                return None
+            index = BM25Index.load(path)
+            self._open[conversation_id] = index
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+            return index
+
+    def search(self, conversation_id, query, limit=10, idf=None):
+        """
+        Returns:
+            list: Hits formatted like VectorStore.search results, best first
+        """
+        return self.search_many(conversation_id, [query], limit, idf)[0]
+
+    def search_many(self, conversation_id, queries, limit=10, idf=None):
+        """
+        Search one conversation for several queries, loading its index once
+
+        Loads the index from disk on first use, so call it off the event loop.
+
+        Returns:
+            list: One hit list (as returned by search) per query, in order
+        """
+        index = self.get(conversation_id)
+        if index is None:
+            return [[] for _ in queries]
+        return [
+            [index.hit(i, score, conversation_id) for i, score in index.search(query, limit, idf)]
+            for query in queries
+        ]
+
+    def term_stats(self, conversation_id, terms):
+        """
+        Returns:
+            tuple: (number of chunks, {term: number of chunks containing it}); (0, {}) without an index
+        """
+        index = self.get(conversation_id)
+        if index is None:
+            return 0, {}
+        return index.term_stats(terms)
+
+    def global_idf(self, conversation_ids, query):
+        """
+        IDF of the query terms over the chunks of several conversations, so BM25
+        scores from different conversations can be compared when merging
+        """
+        terms = set(tokenize(query))
+        return idf_from_stats([self.term_stats(conversation_id, terms) for conversation_id in conversation_ids], terms)
+
+    def delete(self, conversation_id):
+        with self._lock:
+            self._open.pop(conversation_id, None)
+        self._path(conversation_id).unlink(missing_ok=True)
+
+
+def idf_from_stats(stats, terms):
+    """
+    Combine per-conversation term statistics into one IDF per term
+
+    Args:
+        stats (list): (number of chunks, {term: chunks containing it}) per conversation, from term_stats
+        terms (set): Query terms
+
+    Returns:
+        dict: {term: idf} for the terms that occur anywhere
+    """
+    total_docs = sum(n_docs for n_docs, _ in stats)
+    frequencies = Counter()
+    for _, term_frequencies in stats:
+        frequencies.update(term_frequencies)
+    return {term: bm25_idf(total_docs, frequencies[term]) for term in terms if frequencies[term]}
+
+
+def bm25_idf(n_docs, doc_freq):
+    return float(np.log(1.0 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5)))
+
+
+def reciprocal_rank_fusion(result_lists, weights=None, k=60, limit=3):
+    """
+    Merge ranked hit lists with weighted reciprocal rank fusion
+
+    Args:
+        result_lists (list): Lists of hits (dicts with "content" and "conversation_id"), each best first
+        weights (list, optional): Weight per list (default 1.0 each)
+        k (int): RRF damping constant
+        limit (int): Number of fused hits to return
+
+    Returns:
+        list: Fused hits, best first, with the fused score in "score"
+    """
+    weights = weights or [1.0] * len(result_lists)
+    fused = {}
+    for hits, weight in zip(result_lists, weights):
+        if weight <= 0:
+            continue
+        for rank, hit in enumerate(hits):
+            key = (hit.get("conversation_id"), hit["content"])
+            if key not in fused:
+                fused[key] = (0.0, hit)
+            score, first_hit = fused[key]
+            fused[key] = (score + weight / (k + rank + 1), first_hit)
+    ranked = sorted(fused.values(), key=lambda item: item[0], reverse=True)[:limit]
+    return [{**hit, "score": score} for score, hit in ranked]
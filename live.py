@@ -0,0 +1,191 @@
+"""
+Rolling-window transcription of a live audio stream
+
+Raw PCM arrives in small pieces (e.g. from a WebSocket). Once a window's worth
+of audio beyond the last finalized point has been buffered, the window is
+wrapped as WAV and transcribed. Segments that end before the window's tail are
+final and handed to a callback; the tail is transcribed again as the start of
+the next window, so words cut by the window boundary are not lost. The buffer
+is only ever advanced past audio whose speech was finalized.
+
+Transcription runs in a single consumer task. When it falls behind by more
+than max_backlog_seconds, feed() stops returning until the backlog drains,
+which stops the caller from reading its socket and pushes back on the sender.
+"""
+
+import asyncio
+import io
+import logging
+import wave
+
+logger = logging.getLogger(__name__)
+
+
+class LiveTranscriber:
+    def __init__(
+        self,
+        transcribe,
+        on_segments,
+        sample_rate=16000,
+        sample_width=2,
+        channels=1,
+        window_seconds=10.0,
+        tail_seconds=2.0,
+        max_backlog_seconds=30.0,
+        retries=2
+    ):
+        """
+        Args:
+            transcribe (callable): Async function (wav_bytes, file_name) -> Whisper verbose_json result
+            on_segments (callable): Async function called with each list of finalized segments
+                ({"start", "end", "text"} in seconds from the start of the stream)
+            sample_rate (int): PCM sample rate in Hz
+            sample_width (int): Bytes per sample (2 for 16-bit PCM)
+            channels (int): Interleaved channels
+            window_seconds (float): Audio transcribed per request
+            tail_seconds (float): End of each window whose segments wait for the next window
+            max_backlog_seconds (float): Untranscribed audio allowed before feed() blocks
+            retries (int): Retries of a failed window before run() gives up
+        """
+        if tail_seconds >= window_seconds:
+            raise ValueError("tail_seconds must be shorter than window_seconds")
+        if max_backlog_seconds < window_seconds:
+            raise ValueError("max_backlog_seconds must be at least window_seconds")
+        self.transcribe = transcribe
+        self.on_segments = on_segments
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.channels = channels
+        self.window_seconds = window_seconds
+        self.tail_seconds = tail_seconds
+        self.max_backlog_seconds = max_backlog_seconds
+        self.retries = retries
+
+        self._frame_bytes = sample_width * channels
+        self._buffer = bytearray()
+        # Stream time (seconds) of the first byte in _buffer, i.e. the last finalized point
+        self._buffer_start = 0.0
+        self._ended = False
+        self._stopped = False
+        self._windows = 0
+        self._changed = asyncio.Condition()
+
+    @property
+    def received_seconds(self):
+        return self._buffer_start + self._seconds(len(self._buffer))
+
+    @property
+    def finalized_seconds(self):
+        return self._buffer_start
+
+    @property
+    def backlog_seconds(self):
+        """Audio received but not yet finalized"""
+        return self._seconds(len(self._buffer))
+
+    async def feed(self, pcm):
+        """Buffer a piece of PCM audio, waiting while transcription is too far behind"""
+        async with self._changed:
+            self._buffer += pcm
+            self._changed.notify_all()
+            await self._changed.wait_for(
+                lambda: self._ended or self._stopped or self.backlog_seconds <= self.max_backlog_seconds
+            )
+
+    async def end(self):
+        """Mark the end of the stream; run() then transcribes what is left and returns"""
+        async with self._changed:
+            self._ended = True
+            self._changed.notify_all()
+
+    async def run(self):
+        """Consume the buffer window by window until end() was called and all audio is finalized"""
+        try:
+            await self._consume()
+        finally:
+            # Never leave feed() waiting on a consumer that has stopped
+            async with self._changed:
+                self._stopped = True
+                self._changed.notify_all()
+
+    async def _consume(self):
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda: self._ended or self.backlog_seconds >= self.window_seconds
+                )
+                if self.backlog_seconds < 0.1 and self._ended:
+                    return
+                window_bytes = self._bytes(self.window_seconds)
+                window = bytes(self._buffer[:window_bytes])
+                window_start = self._buffer_start
+                # The last window of a finished stream has no tail to wait for
+                final = self._ended and len(window) == len(self._buffer)
+
+            window_seconds = self._seconds(len(window))
+            self._windows += 1
+            result = await self._transcribe_window(self._wav(window), f"live_{self._windows:05d}.wav")
+            segments = [
+                {
+                    "start": round(window_start + float(segment.get("start", 0.0)), 3),
+                    "end": round(window_start + min(float(segment.get("end", 0.0)), window_seconds), 3),
+                    "text": segment.get("text", "").strip()
+                }
+                for segment in (result.get("segments") or [])
+                if segment.get("text", "").strip()
+            ]
+
+            window_end = window_start + window_seconds
+            if final:
+                finalized, advance_to = segments, window_end
+            else:
+                cutoff = window_end - self.tail_seconds
+                finalized = [segment for segment in segments if segment["end"] <= cutoff]
+                pending = [segment for segment in segments if segment["end"] > cutoff]
+                # No speech before this point is left pending
+                safe = min([cutoff] + [segment["start"] for segment in pending])
+                advance_to = finalized[-1]["end"] if finalized else safe
+                # Each window must make progress, or a stream without pauses (or with odd timestamps) falls behind
+                floor = window_start + (window_seconds - self.tail_seconds) / 2
+                if advance_to < floor:
+                    if safe >= floor:
+                        # Only silence, or speech in the tail, after the finalized segments
+                        advance_to = safe
+                    else:
+                        # An utterance runs on into the tail; take it rather than stall or skip its start
+                        finalized, advance_to = segments, window_end
+            advance_to = min(advance_to, window_end)
+
+            if finalized:
+                await self.on_segments(finalized)
+
+            async with self._changed:
+                consumed = min(self._bytes(advance_to - window_start), len(self._buffer))
+                del self._buffer[:consumed]
+                self._buffer_start += self._seconds(consumed)
+                self._changed.notify_all()
+
+    async def _transcribe_window(self, wav_bytes, file_name):
+        for attempt in range(self.retries + 1):
+            try:
+                return await self.transcribe(wav_bytes, file_name)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning("Live transcription of %s failed (attempt %d), retrying: %s", file_name, attempt + 1, e)
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    def _bytes(self, seconds):
+        return int(seconds * self.sample_rate) * self._frame_bytes
+
+    def _seconds(self, n_bytes):
+        return n_bytes / self._frame_bytes / self.sample_rate
+
+    def _wav(self, pcm):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(self.channels)
+            wav.setsampwidth(self.sample_width)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(pcm)
+        return buffer.getvalue()
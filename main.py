@@ -1,26 +1,73 @@
 import os
 import json
 import shutil
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+import logging
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Header, Depends, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from friendli_llm_api import FriendliLLMAPI
+from fastapi.concurrency import run_in_threadpool
+from friendli_llm_api import FriendliLLMAPI, AsyncFriendliLLMAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response, JSONResponse
 import uvicorn
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from pathlib import Path
-import weaviate
-import uuid
-import openai
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import numpy as np
 from dotenv import load_dotenv
-from typing import Optional, List
-from friendli_whisper_api import FriendliWhisperAPI
+from typing import Optional, List, Literal, Union
+from contextlib import asynccontextmanager
+from friendli_whisper_api import FriendliWhisperAPI, AsyncFriendliWhisperAPI
+from friendli_http import POLICIES, create_async_http_client
+from jobs import JobStore, JobQueue
+from live import LiveTranscriber
+from dedup import ContentIndex
+from conversation_ids import InvalidConversationId, check_conversation_id, new_conversation_id
+from uploads import ResumableUploads, UploadCompleted, UploadTooLarge, UploadOffsetMismatch, save_upload
+from embeddings import get_embedder, QueryVectorCache, normalize_question
+from answer_cache import AnswerCache
+from chunking import chunk_segments, parse_transcript_segments, format_transcript
+from keyword_index import KeywordIndexStore, idf_from_stats, reciprocal_rank_fusion, tokenize
+from context_assembly import select_contexts, answer_token_limit, get_token_counter
+from audio_preprocessing import UnsupportedAudio, preprocess_audio
+from transcript_store import TranscriptStore, import_transcripts
+from summaries import SummaryStore, SUMMARY_SYSTEM_PROMPT, build_summary_tree, route_question, summary_contexts
+from vector_store import NumpyVectorStore, WeaviateVectorStore
+from resilience import CIRCUIT_STATES
+import metrics
+from metrics import time_stage
+from structured_logging import configure_logging
 
 # Load environment variables
 load_dotenv()
 
+# Leveled JSON logs on stderr (SPEAKSEEK_LOG_LEVEL, SPEAKSEEK_LOG_FORMAT, SPEAKSEEK_LOG_SAMPLE_RATE)
+configure_logging()
+logger = logging.getLogger("speakseek")
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Start serving right away and bring up the backends in the background;
+    endpoints that need them answer 503 until /readyz reports ready
+    """
+    global http_client
+    http_client = create_async_http_client()
+    startup = asyncio.create_task(start_backends())
+    try:
+        yield
+    finally:
+        startup.cancel()
+        job_queue.shutdown()
+        if query_vectors is not None:
+            query_vectors.save()
+        await http_client.aclose()
+
 # Initialize FastAPI app
-app = FastAPI(title="SpeakSeek", description="Audio transcription and question answering API")
+app = FastAPI(title="SpeakSeek", description="Audio transcription and question answering API", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -29,8 +76,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the browser read the server's offset from a 409 on a resumable upload
+    expose_headers=["Upload-Offset"],
 )
 
+# Request counts and latency per route for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Mount static files directory
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -39,299 +91,1455 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 async def read_root():
     return FileResponse("static/index.html")
 
-# Configure OpenAI API
+# Set the environment variable that Weaviate specifically looks for
 openai_api_key = os.getenv("OPENAI_API_KEY")
-openai.api_key = openai_api_key
+if openai_api_key:
+    os.environ["OPENAI_APIKEY"] = openai_api_key
 
-# Set the environment variable that Weaviate specifically looks for
-os.environ["OPENAI_APIKEY"] = openai_api_key
+# API clients, embedder and retrieval backend are created by init_backends(), not at import
+# Sync Friendli clients are used from ingestion worker threads
+friendli_whisper_client = None
+friendli_llm_client = None
+
+# Async clients for request handlers; they share one pooled HTTP client created at startup
+http_client = None
+async_whisper_client = None
+async_llm_client = None
+
+# Chunks and questions are embedded by the app and stored/queried as explicit vectors
+embedder = None
 
-# Initialize API clients
-friendli_whisper_client = FriendliWhisperAPI()
-friendli_llm_client = FriendliLLMAPI()
+# Questions are embedded once and reused across conversations
+query_vectors = None
+
+vector_store = None
+
+# Cache of answers per conversation and question
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("SPEAKSEEK_ANSWER_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("SPEAKSEEK_ANSWER_CACHE_TTL", "3600")),
+    max_bytes=int(float(os.getenv("SPEAKSEEK_ANSWER_CACHE_MAX_MB", "64")) * 1024 * 1024),
+    similarity_threshold=float(os.getenv("SPEAKSEEK_ANSWER_CACHE_SIMILARITY", "0.95"))
+)
 
 # Setup data directories
-UPLOAD_DIR = Path("./uploaded_audio")
-TRANSCRIPTS_DIR = Path("./transcripts")
+UPLOAD_DIR = Path(os.getenv("SPEAKSEEK_UPLOAD_DIR", "./uploaded_audio"))
+TRANSCRIPTS_DIR = Path(os.getenv("SPEAKSEEK_TRANSCRIPTS_DIR", "./transcripts"))
 
 # Create directories if they don't exist
 UPLOAD_DIR.mkdir(exist_ok=True)
 TRANSCRIPTS_DIR.mkdir(exist_ok=True)
+# Conversations, timed segments, chunk -> segment mappings and the full-text index
+TRANSCRIPTS_DB_PATH = os.getenv("SPEAKSEEK_TRANSCRIPTS_DB", str(TRANSCRIPTS_DIR / "transcripts.db"))
 
-# Initialize Weaviate client (using embedded mode for simplicity)
-weaviate_headers = {}
-if os.getenv("OPENAI_API_KEY"):
-    weaviate_headers = {"X-OpenAI-Api-Key": os.getenv("OPENAI_API_KEY")}
+# Background ingestion settings
+JOBS_DB_PATH = os.getenv("SPEAKSEEK_JOBS_DB", "jobs.db")
+INGEST_WORKERS = int(os.getenv("SPEAKSEEK_INGEST_WORKERS", "2"))
+WEAVIATE_BATCH_SIZE = int(os.getenv("SPEAKSEEK_WEAVIATE_BATCH_SIZE", "100"))
+WEAVIATE_URL = os.getenv("WEAVIATE_URL")
+WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
+VECTOR_BACKEND = os.getenv("SPEAKSEEK_VECTOR_BACKEND", "weaviate").lower()
+VECTORS_DIR = Path(os.getenv("SPEAKSEEK_VECTORS_DIR", "./vectors"))
+KEYWORD_INDEX_DIR = Path(os.getenv("SPEAKSEEK_KEYWORD_INDEX_DIR", "./keyword_index"))
+HYBRID_VECTOR_WEIGHT = float(os.getenv("SPEAKSEEK_HYBRID_VECTOR_WEIGHT", "1.0"))
+HYBRID_KEYWORD_WEIGHT = float(os.getenv("SPEAKSEEK_HYBRID_KEYWORD_WEIGHT", "1.0"))
+HYBRID_CANDIDATES = int(os.getenv("SPEAKSEEK_HYBRID_CANDIDATES", "10"))
+SEARCH_CONCURRENCY = int(os.getenv("SPEAKSEEK_SEARCH_CONCURRENCY", "16"))
+SEARCH_PAGE_SIZE = int(os.getenv("SPEAKSEEK_SEARCH_PAGE_SIZE", "64"))
+SEARCH_TIME_BUDGET = float(os.getenv("SPEAKSEEK_SEARCH_TIME_BUDGET", "2.0"))
+CHUNK_MAX_TOKENS = int(os.getenv("SPEAKSEEK_CHUNK_MAX_TOKENS", "120"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("SPEAKSEEK_CHUNK_OVERLAP_TOKENS", "30"))
+LIVE_WINDOW_SECONDS = float(os.getenv("SPEAKSEEK_LIVE_WINDOW_SECONDS", "10"))
+LIVE_TAIL_SECONDS = float(os.getenv("SPEAKSEEK_LIVE_TAIL_SECONDS", "2"))
+LIVE_MAX_BACKLOG_SECONDS = float(os.getenv("SPEAKSEEK_LIVE_MAX_BACKLOG_SECONDS", "30"))
+ASK_BATCH_CONCURRENCY = int(os.getenv("SPEAKSEEK_ASK_BATCH_CONCURRENCY", "16"))
+ASK_PACK_MAX_QUESTIONS = int(os.getenv("SPEAKSEEK_ASK_PACK_MAX_QUESTIONS", "5"))
+ASK_PACK_MAX_CONTEXTS = int(os.getenv("SPEAKSEEK_ASK_PACK_MAX_CONTEXTS", "8"))
+CONTEXT_CANDIDATES = int(os.getenv("SPEAKSEEK_CONTEXT_CANDIDATES", "12"))
+CONTEXT_MAX = int(os.getenv("SPEAKSEEK_CONTEXT_MAX", "6"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("SPEAKSEEK_CONTEXT_TOKEN_BUDGET", "300"))
+# Unset: the embedder's calibrated default (Embedder.min_context_score)
+CONTEXT_MIN_SCORE = float(os.getenv("SPEAKSEEK_CONTEXT_MIN_SCORE")) if os.getenv("SPEAKSEEK_CONTEXT_MIN_SCORE") else None
+CONTEXT_MMR_LAMBDA = float(os.getenv("SPEAKSEEK_CONTEXT_MMR_LAMBDA", "0.7"))
+ANSWER_MIN_TOKENS = int(os.getenv("SPEAKSEEK_ANSWER_MIN_TOKENS", "128"))
+ANSWER_MAX_TOKENS = int(os.getenv("SPEAKSEEK_ANSWER_MAX_TOKENS", "500"))
+SUMMARIES_ENABLED = os.getenv("SPEAKSEEK_SUMMARIES", "false").lower() in ("1", "true", "yes")
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SPEAKSEEK_SUMMARY_CHUNK_TOKENS", "1500"))
+SUMMARY_FANOUT = int(os.getenv("SPEAKSEEK_SUMMARY_FANOUT", "6"))
+SUMMARY_CONCURRENCY = int(os.getenv("SPEAKSEEK_SUMMARY_CONCURRENCY", "4"))
+SUMMARY_CONTEXT_TOKENS = int(os.getenv("SPEAKSEEK_SUMMARY_CONTEXT_TOKENS", "1200"))
+MAX_UPLOAD_BYTES = int(float(os.getenv("SPEAKSEEK_MAX_UPLOAD_MB", "1024")) * 1024 * 1024)
+UPLOAD_CHUNK_BYTES = int(os.getenv("SPEAKSEEK_UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+SEGMENTED_TRANSCRIPTION = os.getenv("SPEAKSEEK_SEGMENTED_TRANSCRIPTION", "true").lower() in ("1", "true", "yes")
+PREPROCESS_ENABLED = os.getenv("SPEAKSEEK_PREPROCESS", "true").lower() in ("1", "true", "yes")
+PREPROCESS_SAMPLE_RATE = int(os.getenv("SPEAKSEEK_PREPROCESS_SAMPLE_RATE", "16000"))
+VAD_THRESHOLD_DB = float(os.getenv("SPEAKSEEK_VAD_THRESHOLD_DB", "-45"))
+VAD_MIN_SILENCE_MS = int(os.getenv("SPEAKSEEK_VAD_MIN_SILENCE_MS", "1000"))
+VAD_PADDING_MS = int(os.getenv("SPEAKSEEK_VAD_PADDING_MS", "300"))
 
-client = weaviate.Client(
-    embedded_options=weaviate.embedded.EmbeddedOptions(),
-    additional_headers=weaviate_headers
-)
+if VECTOR_BACKEND not in ("numpy", "weaviate"):
+    raise ValueError(f"Unknown SPEAKSEEK_VECTOR_BACKEND '{VECTOR_BACKEND}'. Use 'weaviate' or 'numpy'")
 
-# Define schema for Weaviate if it doesn't exist
-def setup_weaviate_schema():
+# Retrieval backend: "weaviate" (external at WEAVIATE_URL, or embedded) or "numpy" (in-process memory-mapped matrices)
+def create_vector_store():
+    if VECTOR_BACKEND == "numpy":
+        return NumpyVectorStore(VECTORS_DIR)
+    
+    # Imported here: the client library is slow to import and unused by the numpy backend
+    import weaviate
+    weaviate_headers = {}
+    if openai_api_key:
+        weaviate_headers = {"X-OpenAI-Api-Key": openai_api_key}
+    if WEAVIATE_URL:
+        client = weaviate.Client(
+            WEAVIATE_URL,
+            auth_client_secret=weaviate.AuthApiKey(api_key=WEAVIATE_API_KEY) if WEAVIATE_API_KEY else None,
+            additional_headers=weaviate_headers
+        )
+    else:
+        # Embedded mode downloads and starts a Weaviate binary, which can take a while
+        client = weaviate.Client(
+            embedded_options=weaviate.embedded.EmbeddedOptions(),
+            additional_headers=weaviate_headers
+        )
+    store = WeaviateVectorStore(client, batch_size=WEAVIATE_BATCH_SIZE)
+    store.setup_schema()
+    return store
+
+# Startup state reported by /readyz
+backends_ready = threading.Event()
+backend_status = {"state": "starting", "error": None, "seconds": None}
+_backends_lock = threading.Lock()
+
+# Create the API clients, embedder and retrieval backend (idempotent; blocking, so call it off the event loop)
+def init_backends():
+    global friendli_whisper_client, friendli_llm_client, async_whisper_client, async_llm_client
+    global embedder, query_vectors, vector_store
+    with _backends_lock:
+        if backends_ready.is_set():
+            return
+        started = time.perf_counter()
+        backend_status.update(state="starting", error=None)
+        try:
+            friendli_whisper_client = FriendliWhisperAPI()
+            friendli_llm_client = FriendliLLMAPI()
+            if http_client is not None:
+                async_whisper_client = AsyncFriendliWhisperAPI(http_client)
+                async_llm_client = AsyncFriendliLLMAPI(http_client)
+            embedder = get_embedder()
+            query_vectors = QueryVectorCache(
+                embedder,
+                max_entries=int(os.getenv("SPEAKSEEK_QUERY_VECTOR_CACHE_SIZE", "10000")),
+                persist_path=os.getenv("SPEAKSEEK_QUERY_VECTOR_CACHE_PATH") or None
+            )
+            vector_store = create_vector_store()
+        except Exception as e:
+            backend_status.update(state="failed", error=str(e), seconds=round(time.perf_counter() - started, 3))
+            raise
+        backend_status.update(state="ready", seconds=round(time.perf_counter() - started, 3))
+        backends_ready.set()
+        logger.info("Backends ready in %.2fs", backend_status["seconds"], extra={"vector_backend": VECTOR_BACKEND})
+
+# Run from the lifespan: initialize the backends, then resume unfinished ingestion jobs
+async def start_backends():
     try:
-        # Check if schema exists
-        schema = client.schema.get()
-        if not any(cls["class"] == "AudioTranscript" for cls in schema["classes"]):
-            # Create schema for audio transcripts
-            class_obj = {
-                "class": "AudioTranscript",
-                "description": "Transcripts from audio files",
-                "properties": [
-                    {
-                        "name": "conversation_id",
-                        "dataType": ["string"],
-                        "description": "Unique identifier for the conversation"
-                    },
-                    {
-                        "name": "content",
-                        "dataType": ["text"],
-                        "description": "Transcribed text content"
-                    },
-                    {
-                        "name": "timestamp",
-                        "dataType": ["number"],
-                        "description": "Timestamp in the audio (in seconds)"
-                    }
-                ],
-                "vectorizer": "text2vec-openai",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "model": "ada",
-                        "modelVersion": "002",
-                        "type": "text"
-                    }
-                }
-            }
-            client.schema.create_class(class_obj)
-    except Exception as e:
-        print(f"Error setting up Weaviate schema: {str(e)}")
-        # Continue anyway, as we might be using an external Weaviate instance
+        await run_in_threadpool(init_backends)
+    except Exception:
+        logger.exception("Backend initialization failed")
+        return
+    # Transcripts written before the transcript store existed (or by hand) become searchable again
+    await run_in_threadpool(
+        import_transcripts, transcript_store, TRANSCRIPTS_DIR, parse_transcript_segments, chunk_transcript_segments
+    )
+    job_queue.resume()
 
-# Call the setup function
-setup_weaviate_schema()
+# Dependency for endpoints that need the API clients and retrieval backend
+def require_backends():
+    if not backends_ready.is_set():
+        detail = f"Backends are not ready ({backend_status['state']})"
+        if backend_status["error"]:
+            detail += f": {backend_status['error']}"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "1"})
+
+# Conversation ids from requests name files in the data directories; anything unsafe is a 400
+def require_valid_conversation_ids(conversation_ids):
+    try:
+        for conversation_id in conversation_ids:
+            check_conversation_id(conversation_id)
+    except InvalidConversationId as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Local BM25 index per conversation, fused with vector results at query time
+keyword_index = KeywordIndexStore(KEYWORD_INDEX_DIR)
+# Summary trees stored next to the transcripts
+summary_store = SummaryStore(TRANSCRIPTS_DIR)
+# Structured transcripts: time-range reads and the full-text fallback for questions retrieval can't answer
+transcript_store = TranscriptStore(TRANSCRIPTS_DB_PATH)
 
 # Models
 class QuestionRequest(BaseModel):
     conversation_id: str
     question: str
+    # "hybrid" (BM25 + vector), "vector" or "keyword"
+    retrieval_mode: Literal["hybrid", "vector", "keyword"] = "hybrid"
 
 class TranscriptionResponse(BaseModel):
     conversation_id: str
     status: str
     message: str
+    job_id: Optional[str] = None
+    # Conversation whose transcript and index are reused for identical audio
+    duplicate_of: Optional[str] = None
+
+class UploadInitRequest(BaseModel):
+    filename: str
+    conversation_name: str
+    # Total size of the file in bytes
+    size: int = Field(..., gt=0)
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    filename: str
+    conversation_name: str
+    size: int
+    offset: int
+    chunk_size: int = UPLOAD_CHUNK_BYTES
+    # Set once the upload was finalized
+    completed_at: Optional[float] = None
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    conversation_id: str
+    stage: str
+    progress: float
+    error: Optional[str] = None
+    stage_timings: dict
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    source_conversation_id: Optional[str] = None
+
+class TranscriptSegment(BaseModel):
+    position: int
+    start: Optional[float] = None
+    end: Optional[float] = None
+    speaker: Optional[str] = None
+    text: str
+
+class TranscriptResponse(BaseModel):
+    conversation_id: str
+    name: Optional[str] = None
+    # "upload", "ingest", "live", "copy" or "import"
+    source: Optional[str] = None
+    duration: Optional[float] = None
+    segment_count: int
+    # Only the segments overlapping the requested time range
+    segments: List[TranscriptSegment]
+
+class BatchQuestionRequest(BaseModel):
+    conversation_id: str
+    questions: List[str] = Field(..., min_items=1, max_items=50)
+    retrieval_mode: Literal["hybrid", "vector", "keyword"] = "hybrid"
+    # "concurrent": one LLM call per question; "packed": questions with overlapping contexts share one call
+    strategy: Literal["concurrent", "packed"] = "concurrent"
+
+class BatchAnswer(BaseModel):
+    question: str
+    answer: str
+    relevant_contexts: List[str]
+    # "exact" or "semantic" when served from the answer cache
+    cache_hit: Optional[str] = None
+    # Milliseconds: embedding and retrieval are shared by the batch, generation is this question's LLM call
+    timings: dict
+
+class BatchAnswerResponse(BaseModel):
+    conversation_id: str
+    results: List[BatchAnswer]
+    llm_calls: int
+    unique_contexts: int
+    elapsed_ms: float
 
 class AnswerResponse(BaseModel):
     answer: str
     relevant_contexts: List[str]
 
-# Helper function to chunk text for vectorization
-def chunk_text(text, chunk_size=500):
-    words = text.split()
-    chunks = []
-    current_chunk = []
-    current_length = 0
-    
-    for word in words:
-        if current_length + len(word) + 1 > chunk_size and current_chunk:  # +1 for space
-            chunks.append(" ".join(current_chunk))
-            current_chunk = [word]
-            current_length = len(word)
-        else:
-            current_chunk.append(word)
-            current_length += len(word) + 1  # +1 for space
+class SearchRequest(BaseModel):
+    query: str
+    # List of conversation ids, or "all"
+    conversation_ids: Union[Literal["all"], List[str]] = "all"
+    limit: int = Field(10, ge=1, le=100)
+    retrieval_mode: Literal["hybrid", "vector", "keyword"] = "hybrid"
+    # Run one LLM call over the merged hits
+    synthesize: bool = False
+
+class SearchHit(BaseModel):
+    conversation_id: str
+    content: str
+    timestamp: Optional[float] = None
+    end_timestamp: Optional[float] = None
+    score: float
+
+class SearchResponse(BaseModel):
+    hits: List[SearchHit]
+    answer: Optional[str] = None
+    conversations_searched: int
+    conversations_total: int
+    # True when the time budget ran out before every conversation was searched
+    truncated: bool
+    elapsed_ms: float
+
+# Helper function to chunk transcript text (plain or timestamped) for vectorization
+def chunk_text(text, max_tokens=None, overlap_tokens=None):
+    return chunk_transcript_segments(parse_transcript_segments(text.splitlines()), max_tokens, overlap_tokens)
+
+# Pack timed segments into sentence-aligned, overlapping chunks with start/end times
+def chunk_transcript_segments(segments, max_tokens=None, overlap_tokens=None):
+    with time_stage("chunk"):
+        return list(chunk_segments(
+            segments,
+            max_tokens=max_tokens or CHUNK_MAX_TOKENS,
+            overlap_tokens=CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        ))
+
+# Helper function to embed transcript chunks and add them to the retrieval backend
+def index_chunks(conversation_id, chunks, on_progress=None):
+    """
+    Args:
+        chunks (list): Chunk dicts from chunk_text / chunk_transcript_segments
+
+    Returns:
+        dict: "indexed" count, "total" count and a "failed" list of {index, uuid, error}
+    """
+    contents = [chunk["content"] for chunk in chunks]
+    spans = [(chunk["start"], chunk["end"]) for chunk in chunks]
     
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
+    with time_stage("vectorize"):
+        # Embed every chunk up front in large batches
+        vectors = embedder.embed(contents)
+        return store_chunks(conversation_id, contents, vectors, spans, on_progress)
+
+# Helper function to write embedded chunks to the retrieval backend and keyword index
+def store_chunks(conversation_id, contents, vectors, spans, on_progress=None, start=0):
+    report = vector_store.add(conversation_id, contents, vectors, spans=spans, on_progress=on_progress, start=start)
+    keyword_index.build(conversation_id, contents, spans, start=start)
+    # Cached answers were built from the previous chunks
+    answer_cache.invalidate(conversation_id)
     
+    for failure in report["failed"]:
+        logger.error(
+            "Error adding chunk %s to %s: %s", failure["index"], vector_store.name, failure["error"],
+            extra={"conversation_id": conversation_id}
+        )
+    logger.info(
+        "Added %d of %d chunks to %s", report["indexed"], report["total"], vector_store.name,
+        extra={"conversation_id": conversation_id, "indexed": report["indexed"], "total": report["total"]}
+    )
+    return report
+
+# Helper function to copy another conversation's transcript, vectors and keyword index (no remote calls)
+def copy_conversation(source_id, conversation_id, name=None, on_progress=None):
+    with time_stage("copy"):
+        contents, vectors, spans = vector_store.export(source_id)
+        if not contents:
+            raise RuntimeError(f"No chunks stored for conversation {source_id}")
+        if not transcript_store.copy(source_id, conversation_id, name=name):
+            raise RuntimeError(f"No transcript stored for conversation {source_id}")
+        if (TRANSCRIPTS_DIR / f"{source_id}.txt").exists():
+            shutil.copyfile(TRANSCRIPTS_DIR / f"{source_id}.txt", TRANSCRIPTS_DIR / f"{conversation_id}.txt")
+        summary_store.copy(source_id, conversation_id)
+        return store_chunks(conversation_id, contents, vectors, spans, on_progress)
+
+# Helper function to index newly finalized live segments, storing only the chunks they change
+def index_live_segments(conversation_id, segments, chunks):
+    """
+    Chunking is greedy from the start, so appended segments only change the
+    last chunk and add chunks after it. The segments from the last chunk's
+    first one on are chunked again and stored from that chunk's position; the
+    earlier chunks are neither re-chunked, re-embedded nor stored again.
+
+    Args:
+        segments (list): Every finalized segment of the conversation so far
+        chunks (list): Chunks stored by the previous calls; updated in place
+
+    Returns:
+        list: Every chunk now stored
+    """
+    start = max(len(chunks) - 1, 0)
+    first_segment = chunks[-1]["first_segment"] if chunks else 0
+    new_chunks = [
+        {
+            **chunk,
+            "index": start + i,
+            "first_segment": chunk["first_segment"] + first_segment,
+            "last_segment": chunk["last_segment"] + first_segment
+        }
+        for i, chunk in enumerate(chunk_transcript_segments(segments[first_segment:]))
+    ]
+    if not new_chunks:
+        return chunks
+    contents = [chunk["content"] for chunk in new_chunks]
+    transcript_store.save_chunks(conversation_id, new_chunks, start)
+    with time_stage("vectorize"):
+        vectors = embedder.embed(contents)
+        store_chunks(conversation_id, contents, vectors, [(chunk["start"], chunk["end"]) for chunk in new_chunks], start=start)
+    del chunks[start:]
+    chunks.extend(new_chunks)
     return chunks
 
-# Helper function to vectorize transcript text
-def vectorize_transcript(conversation_id, transcript_text):
-    chunks = chunk_text(transcript_text)
-    added_chunks = 0
+# Helper function to store and vectorize transcript text
+def vectorize_transcript(conversation_id, transcript_text=None, segments=None, name=None, source=None):
+    segments = segments or list(parse_transcript_segments(transcript_text.splitlines()))
+    chunks = chunk_transcript_segments(segments)
+    transcript_store.save(conversation_id, segments, chunks, name=name, source=source)
+    return index_chunks(conversation_id, chunks)
+
+# Helper function to build and store the chunk -> section -> meeting summary tree of a transcript
+def summarize_conversation(conversation_id, transcript_text=None, segments=None, on_progress=None):
+    segments = segments or list(parse_transcript_segments(transcript_text.splitlines()))
     
-    for i, chunk in enumerate(chunks):
-        # Create a unique object with the chunk
-        object_uuid = str(uuid.uuid4())
-        properties = {
-            "conversation_id": conversation_id,
-            "content": chunk,
-            "timestamp": i  # Using index as a simple timestamp for now
+    def complete(prompt, max_tokens):
+        response = friendli_llm_client.generate_response(
+            prompt=prompt,
+            system_prompt=SUMMARY_SYSTEM_PROMPT,
+            max_tokens=max_tokens,
+            temperature=0.2
+        )
+        return response["choices"][0]["message"]["content"]
+    
+    with time_stage("summarize"):
+        tree = build_summary_tree(
+            segments, complete,
+            chunk_tokens=SUMMARY_CHUNK_TOKENS,
+            fanout=SUMMARY_FANOUT,
+            concurrency=SUMMARY_CONCURRENCY,
+            on_progress=on_progress
+        )
+    summary_store.save(conversation_id, tree)
+    # Whole-meeting answers cached before now were built from retrieved chunks
+    answer_cache.invalidate(conversation_id)
+    logger.info(
+        "Summarized transcript into %d chunk and %d section summaries",
+        len(tree["chunk"]), len(tree["section"]),
+        extra={"conversation_id": conversation_id}
+    )
+    return tree
+
+# Helper function to downmix, resample and trim long silences from a recording before it is sent to Whisper
+# Returns (path to transcribe, OffsetMap or None, frame levels or None); the original path when preprocessing is off or not possible
+def preprocess_file(file_path):
+    if not PREPROCESS_ENABLED:
+        return file_path, None, None
+    output_path = str(Path(file_path).with_suffix(".preprocessed.wav"))
+    try:
+        with time_stage("preprocess"):
+            report = preprocess_audio(
+                file_path, output_path, sample_rate=PREPROCESS_SAMPLE_RATE, threshold_db=VAD_THRESHOLD_DB,
+                min_silence_ms=VAD_MIN_SILENCE_MS, padding_ms=VAD_PADDING_MS
+            )
+    except (UnsupportedAudio, OSError, ValueError) as e:
+        logger.info("Sending %s without preprocessing: %s", Path(file_path).name, e, extra={"file_path": file_path})
+        return file_path, None, None
+    if report["output_seconds"] < 0.5 <= report["input_seconds"]:
+        # Nothing crossed the VAD threshold; a very quiet recording is better sent as it is
+        os.remove(output_path)
+        logger.warning("No audio above %s dBFS in %s, sending it unprocessed", VAD_THRESHOLD_DB, Path(file_path).name)
+        return file_path, None, None
+    metrics.PREPROCESS_BYTES.inc(report["input_bytes"], direction="input")
+    metrics.PREPROCESS_BYTES.inc(report["output_bytes"], direction="output")
+    metrics.PREPROCESS_AUDIO_SECONDS.inc(report["input_seconds"], direction="input")
+    metrics.PREPROCESS_AUDIO_SECONDS.inc(report["output_seconds"], direction="output")
+    logger.info(
+        "Preprocessed %s: %d -> %d bytes, %.1fs -> %.1fs of audio",
+        Path(file_path).name, report["input_bytes"], report["output_bytes"], report["input_seconds"], report["output_seconds"],
+        extra={
+            "file_path": file_path,
+            "saved_bytes": report["input_bytes"] - report["output_bytes"],
+            "saved_seconds": round(report["input_seconds"] - report["output_seconds"], 3),
+            "cuts": report["offsets"].cuts
         }
-        
-        # Add object to Weaviate
+    )
+    return output_path, report["offsets"], report["levels"]
+
+# Transcribe an uploaded file with the Friendli Whisper API (long recordings are split and transcribed concurrently)
+# Returns (text, segments); segments carry start/end seconds in the original recording when the API provides them
+# Errors are raised once the client's retries are used up, so the job fails instead of indexing a made-up transcript
+def transcribe_file(file_path, on_stage=None):
+    if on_stage:
+        on_stage("preprocessing")
+    audio_path, offsets, levels = preprocess_file(file_path)
+    if on_stage:
+        on_stage("transcribing")
+    try:
+        with time_stage("transcribe"):
+            if SEGMENTED_TRANSCRIPTION:
+                # The frame levels measured while preprocessing give the cut points without decoding again
+                transcription_result = friendli_whisper_client.transcribe_audio_segmented(audio_path, levels=levels)
+            else:
+                transcription_result = friendli_whisper_client.transcribe_audio(audio_path, response_format="verbose_json")
+    finally:
+        if audio_path != file_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+    segments = transcription_result.get("segments") or []
+    if offsets is not None and offsets.cuts:
+        segments = offsets.map_segments(segments)
+    return transcription_result.get("text", ""), segments
+
+# Run the transcribe -> chunk -> index pipeline for one upload job (on a worker thread)
+def process_upload_job(job, context):
+    conversation_id = job["conversation_id"]
+    
+    if job.get("source_conversation_id"):
+        # Identical audio was indexed before: copy its transcript and index
+        context.stage("indexing")
         try:
-            client.data_object.create(
-                data_object=properties,
-                class_name="AudioTranscript",
-                uuid=object_uuid
+            report = copy_conversation(
+                job["source_conversation_id"], conversation_id,
+                name=job.get("conversation_name"), on_progress=context.progress
             )
-            added_chunks += 1
+            if not report["failed"]:
+                return
         except Exception as e:
-            print(f"Error adding chunk to Weaviate: {str(e)}")
+            logger.warning(
+                "Could not reuse conversation %s: %s", job["source_conversation_id"], e,
+                extra={"conversation_id": conversation_id}
+            )
+        # The source is gone or incomplete, so stop mapping the audio to it and run the full pipeline
+        if job.get("content_hash"):
+            content_index.forget(job["content_hash"], index_signature())
     
-    print(f"Successfully added {added_chunks} out of {len(chunks)} chunks to Weaviate for conversation {conversation_id}")
-    return added_chunks > 0
+    transcript_text, segments = transcribe_file(job["file_path"], on_stage=context.stage)
+    if not transcript_text:
+        raise RuntimeError("Failed to transcribe audio")
+    
+    # Save transcript (with timestamps when the API returned segments); the .txt file is a readable export
+    transcript_path = TRANSCRIPTS_DIR / f"{conversation_id}.txt"
+    with open(transcript_path, "w") as f:
+        f.write(format_transcript(segments) if segments else transcript_text)
+    
+    context.stage("chunking")
+    segments = segments or list(parse_transcript_segments(transcript_text.splitlines()))
+    chunks = chunk_transcript_segments(segments)
+    transcript_store.save(conversation_id, segments, chunks, name=job.get("conversation_name"), source="upload")
+    
+    # Vectorize transcript for semantic search
+    context.stage("indexing")
+    report = index_chunks(conversation_id, chunks, on_progress=context.progress)
+    if report["failed"]:
+        # Object ids are deterministic, so retrying the job overwrites the chunks that did succeed
+        raise RuntimeError(
+            f"Failed to index {len(report['failed'])} of {report['total']} chunks: {report['failed'][0]['error']}"
+        )
+    
+    # Later uploads of the same bytes can now copy this conversation
+    if job.get("content_hash"):
+        content_index.record(
+            job["content_hash"], index_signature(), conversation_id, job["file_path"], transcript_path,
+            size=os.path.getsize(job["file_path"]) if os.path.exists(job["file_path"]) else None
+        )
+    
+    if SUMMARIES_ENABLED:
+        # The conversation is already searchable; without summaries whole-meeting questions use retrieval
+        context.stage("summarizing")
+        try:
+            summarize_conversation(conversation_id, transcript_text, segments, on_progress=context.progress)
+        except Exception as e:
+            logger.warning("Could not summarize transcript: %s", e, extra={"conversation_id": conversation_id})
+
+# Settings a reused index must have been built with
+def index_signature():
+    return f"{embedder.name}:{embedder.dimension}:{VECTOR_BACKEND}:{CHUNK_MAX_TOKENS}:{CHUNK_OVERLAP_TOKENS}"
+
+# Persisted job table and the worker pool that drains it
+job_store = JobStore(JOBS_DB_PATH)
+# Content hash -> already indexed conversation, kept next to the job table
+content_index = ContentIndex(JOBS_DB_PATH)
+# Partially received resumable uploads
+resumable_uploads = ResumableUploads(UPLOAD_DIR / "partial", MAX_UPLOAD_BYTES, chunk_size=UPLOAD_CHUNK_BYTES)
+job_queue = JobQueue(job_store, process_upload_job, max_workers=INGEST_WORKERS)
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: API clients and retrieval backend are initialized and reachable"""
+    ready = backends_ready.is_set() and await run_in_threadpool(vector_store.is_ready)
+    body = {"status": "ready" if ready else "not_ready", "vector_backend": VECTOR_BACKEND, **backend_status}
+    # Reported, not gating: an open circuit recovers by itself and the other endpoints keep working
+    body["circuits"] = {name: policy.breaker.state for name, policy in list(POLICIES.items())}
+    if backends_ready.is_set() and not ready:
+        body["error"] = f"{vector_store.name} is not reachable"
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+ALLOWED_AUDIO_EXTENSIONS = [".mp3", ".wav", ".m4a", ".flac", ".ogg"]
 
-@app.post("/upload-audio", response_model=TranscriptionResponse)
+# Reject file names the upload endpoints don't accept
+def check_audio_extension(filename):
+    file_ext = Path(filename).suffix.lower()
+    if file_ext not in ALLOWED_AUDIO_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file format. Allowed formats: {', '.join(ALLOWED_AUDIO_EXTENSIONS)}"
+        )
+
+# Helper function to name a saved upload after its sniffed format and queue its ingestion job
+def queue_uploaded_audio(conversation_name, conversation_id, saved_path, digest):
+    """
+    Args:
+        saved_path (str): Where the upload was written
+        digest (UploadDigest): Size, SHA-256 and sniffed format of the upload
+
+    Returns:
+        dict: The TranscriptionResponse body
+    """
+    if digest.size == 0:
+        os.remove(saved_path)
+        raise HTTPException(status_code=400, detail="Empty audio file uploaded")
+    if digest.audio_format is None:
+        os.remove(saved_path)
+        raise HTTPException(status_code=400, detail="Unrecognized audio data; expected MP3, WAV, M4A, FLAC or OGG")
+    
+    # Name the file after its actual container so ffmpeg and Whisper see the right type
+    file_path = str(UPLOAD_DIR / f"{conversation_id}.{digest.audio_format}")
+    os.replace(saved_path, file_path)
+    logger.info("Saved upload %s", file_path, extra={"conversation_id": conversation_id, "bytes": digest.size})
+    
+    # The same recording uploaded again reuses the existing transcript and index
+    source = content_index.lookup(digest.sha256, index_signature(), size=digest.size)
+    source_conversation_id = None
+    if source is not None and transcript_store.get(source["conversation_id"]) is not None:
+        source_conversation_id = source["conversation_id"]
+        if source["file_path"] and Path(source["file_path"]).exists():
+            os.remove(file_path)
+            file_path = source["file_path"]
+    
+    # Hand transcription and indexing off to the background workers
+    job = job_store.create(
+        conversation_id, conversation_name, file_path,
+        content_hash=digest.sha256, source_conversation_id=source_conversation_id
+    )
+    job_queue.submit(job)
+    
+    if source_conversation_id:
+        message = f"Identical audio was already transcribed; reusing the transcript and index of {source_conversation_id}"
+    else:
+        message = "Audio uploaded; transcription and indexing are running in the background"
+    return {
+        "conversation_id": conversation_id,
+        "job_id": job["job_id"],
+        "status": "queued",
+        "message": message,
+        "duplicate_of": source_conversation_id
+    }
+
+@app.post("/upload-audio", response_model=TranscriptionResponse, dependencies=[Depends(require_backends)])
 async def upload_audio(
     file: UploadFile = File(...),
     conversation_name: str = Form(...)
 ):
     # Check if the file is an audio file
-    allowed_extensions = [".mp3", ".wav", ".m4a", ".flac", ".ogg"]
-    file_ext = Path(file.filename).suffix.lower()
-    
-    if file_ext not in allowed_extensions:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file format. Allowed formats: {', '.join(allowed_extensions)}"
-        )
+    check_audio_extension(file.filename)
     
     try:
         # Create conversation ID
-        conversation_id = f"{conversation_name.lower().replace(' ', '_')}_{uuid.uuid4().hex[:8]}"
+        conversation_id = new_conversation_id(conversation_name)
         
         # Ensure directories exist
-        os.makedirs("uploaded_audio", exist_ok=True)
-        os.makedirs("transcripts", exist_ok=True)
-        
-        # Save uploaded file
-        file_path = f"uploaded_audio/{conversation_id}.{file.filename.split('.')[-1]}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Get file size
-        file_size = os.path.getsize(file_path)
-        print(f"File saved at: {file_path}")
-        print(f"File size: {file_size} bytes")
+        UPLOAD_DIR.mkdir(exist_ok=True)
+        TRANSCRIPTS_DIR.mkdir(exist_ok=True)
         
-        if file_size == 0:
-            os.remove(file_path)
-            raise HTTPException(status_code=400, detail="Empty audio file uploaded")
+        # Save uploaded file in fixed-size blocks on a worker thread, hashing and sniffing it on the way
+        saved_path = str(UPLOAD_DIR / f"{conversation_id}.upload")
+        with time_stage("save"):
+            digest = await run_in_threadpool(save_upload, file.file, saved_path, MAX_UPLOAD_BYTES, UPLOAD_CHUNK_BYTES)
+        return await run_in_threadpool(queue_uploaded_audio, conversation_name, conversation_id, saved_path, digest)
         
-        transcript_text = ""
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error processing upload")
+        raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
+
+@app.post("/uploads", response_model=UploadSessionResponse)
+async def create_upload(request: UploadInitRequest):
+    """Start a resumable upload; send the bytes with PATCH /uploads/{upload_id}"""
+    check_audio_extension(request.filename)
+    try:
+        return await run_in_threadpool(resumable_uploads.create, request.filename, request.conversation_name, request.size)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+@app.get("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload(upload_id: str):
+    """Current offset of a resumable upload, to continue after an interruption"""
+    session = await run_in_threadpool(resumable_uploads.get, upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Upload not found: {upload_id}")
+    return session
+
+@app.patch("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def append_upload(upload_id: str, request: Request, upload_offset: int = Header(...)):
+    """Append the request body at the byte offset given in the Upload-Offset header"""
+    try:
+        return await resumable_uploads.append(upload_id, upload_offset, request.stream())
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload not found: {upload_id}")
+    except UploadCompleted as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.expected)})
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+@app.post("/uploads/{upload_id}/finalize", response_model=TranscriptionResponse, dependencies=[Depends(require_backends)])
+async def finalize_upload(upload_id: str):
+    """Turn a fully received upload into a conversation and queue its ingestion job"""
+    session = await run_in_threadpool(resumable_uploads.get, upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Upload not found: {upload_id}")
+    
+    conversation_id = new_conversation_id(session["conversation_name"])
+    saved_path = str(UPLOAD_DIR / f"{conversation_id}.upload")
+    try:
+        with time_stage("save"):
+            digest = await resumable_uploads.complete(upload_id, saved_path)
+    except KeyError:
+        # Expired and cleaned up since it was read
+        raise HTTPException(status_code=404, detail=f"Upload not found: {upload_id}")
+    except UploadCompleted as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=f"Upload incomplete: {e.expected} of {session['size']} bytes received")
+    return await run_in_threadpool(queue_uploaded_audio, session["conversation_name"], conversation_id, saved_path, digest)
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+@app.get("/conversations/{conversation_id}/transcript", response_model=TranscriptResponse)
+async def get_transcript(conversation_id: str, start: Optional[float] = None, end: Optional[float] = None):
+    require_valid_conversation_ids([conversation_id])
+    conversation = await run_in_threadpool(transcript_store.get, conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail=f"Conversation not found: {conversation_id}")
+    segments = await run_in_threadpool(transcript_store.segments, conversation_id, start, end)
+    return {**conversation, "segments": segments}
+
+# Append finalized live segments to a conversation's transcript file
+def append_transcript(transcript_path, segments):
+    with open(transcript_path, "a") as f:
+        f.write(format_transcript(segments) + "\n")
+
+@app.websocket("/live")
+async def live_transcription(websocket: WebSocket, conversation_name: str, sample_rate: int = 16000, channels: int = 1):
+    """
+    Live transcription of a raw 16-bit little-endian PCM stream.
+    
+    The client sends audio as binary messages and the text message "end" when
+    the meeting is over. The server replies with JSON events: "started" (with
+    the conversation_id), "segments" each time transcript segments are
+    finalized and indexed, "backpressure" when transcription is behind and
+    reading pauses, and "completed" or "error" at the end.
+    """
+    if not 8000 <= sample_rate <= 48000 or channels not in (1, 2):
+        await websocket.close(code=1008)
+        return
+    if not backends_ready.is_set():
+        # 1013: try again later
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    
+    conversation_id = new_conversation_id(conversation_name)
+    transcript_path = TRANSCRIPTS_DIR / f"{conversation_id}.txt"
+    transcript_path.touch()
+    await run_in_threadpool(transcript_store.save, conversation_id, [], name=conversation_name, source="live")
+    state = {"segments": [], "chunks": []}
+    send_lock = asyncio.Lock()
+    
+    async def send_event(event, **data):
+        # The client may already be gone; indexing continues regardless
         try:
-            # Try using the Friendli Whisper API
-            whisper_api = FriendliWhisperAPI()
-            transcription_result = whisper_api.transcribe_audio(file_path)
-            transcript_text = transcription_result.get("text", "")
-        except Exception as api_error:
-            print(f"Friendli API error: {api_error}")
-            print("Using fallback transcription method...")
-            
-            # FALLBACK: Use a demo transcript file if it exists
-            if os.path.exists("transcription.txt"):
-                with open("transcription.txt", "r") as f:
-                    transcript_text = f.read()
-                print("Used fallback transcript file")
-            else:
-                # Create a simple demo transcript
-                transcript_text = f"This is a demo transcript for conversation {conversation_name}. "
-                transcript_text += "The Friendli Whisper API endpoint has been terminated. "
-                transcript_text += "This is a fallback transcript for demonstration purposes. "
-                transcript_text += "You can replace this with actual transcript content in the transcription.txt file."
+            async with send_lock:
+                await websocket.send_json({"event": event, **data})
+        except Exception:
+            pass
+    
+    async def transcribe(wav_bytes, file_name):
+        with time_stage("transcribe"):
+            return await async_whisper_client.transcribe_bytes(wav_bytes, file_name, response_format="verbose_json")
+    
+    async def on_segments(segments):
+        state["segments"].extend(segments)
+        await run_in_threadpool(append_transcript, transcript_path, segments)
+        await run_in_threadpool(transcript_store.append, conversation_id, segments)
+        await run_in_threadpool(index_live_segments, conversation_id, state["segments"], state["chunks"])
+        await send_event(
+            "segments",
+            segments=segments,
+            chunks=len(state["chunks"]),
+            lag_seconds=round(transcriber.backlog_seconds, 2)
+        )
+    
+    transcriber = LiveTranscriber(
+        transcribe,
+        on_segments,
+        sample_rate=sample_rate,
+        channels=channels,
+        window_seconds=LIVE_WINDOW_SECONDS,
+        tail_seconds=LIVE_TAIL_SECONDS,
+        max_backlog_seconds=LIVE_MAX_BACKLOG_SECONDS,
+        retries=0  # the Whisper client already retries transient failures
+    )
+    runner = asyncio.create_task(transcriber.run())
+    await send_event("started", conversation_id=conversation_id)
+    
+    try:
+        while not runner.done():
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("text") is not None:
+                if message["text"].strip().lower() == "end":
+                    break
+                continue
+            pcm = message.get("bytes") or b""
+            if transcriber.backlog_seconds + len(pcm) / (2 * channels * sample_rate) > LIVE_MAX_BACKLOG_SECONDS:
+                await send_event("backpressure", backlog_seconds=round(transcriber.backlog_seconds, 2))
+            # Blocks while transcription is behind, so the socket isn't read until it catches up
+            await transcriber.feed(pcm)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await transcriber.end()
+        try:
+            await runner
+            await send_event(
+                "completed",
+                conversation_id=conversation_id,
+                segments=len(state["segments"]),
+                chunks=len(state["chunks"]),
+                duration_seconds=round(transcriber.received_seconds, 2)
+            )
+        except Exception as e:
+            logger.error("Live transcription failed: %s", e, extra={"conversation_id": conversation_id})
+            await send_event("error", detail=str(e))
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+NO_CONTEXT_ANSWER = "I couldn't find any relevant information for your question."
+SYSTEM_PROMPT = "You are a helpful assistant that answers questions based on audio transcripts. Only use information from the provided contexts to answer the question."
+
+# Search one conversation with BM25, vectors or both fused by reciprocal rank
+# Questions are searched together in one vector pass; returns one hit list per question
+async def search_conversation_many(conversation_id, questions, question_vectors=None, mode="hybrid", limit=3):
+    if mode == "keyword":
+        # Loading and scoring an index is blocking work, like the vector search
+        return await run_in_threadpool(keyword_index.search_many, conversation_id, questions, limit)
+    if question_vectors is None:
+        with time_stage("embed_query"):
+            question_vectors = await run_in_threadpool(query_vectors.embed_queries, questions)
+    if mode == "vector":
+        hit_lists = await run_in_threadpool(vector_store.search_many, conversation_id, question_vectors, limit)
+        return [[{**hit, "vector_score": hit["score"]} for hit in hits] for hits in hit_lists]
+    
+    candidates = max(limit, HYBRID_CANDIDATES)
+    vector_hit_lists, keyword_hit_lists = await asyncio.gather(
+        run_in_threadpool(vector_store.search_many, conversation_id, question_vectors, candidates),
+        run_in_threadpool(keyword_index.search_many, conversation_id, questions, candidates)
+    )
+    # Fusion replaces "score"; the similarity is kept for the context threshold
+    vector_hit_lists = [[{**hit, "vector_score": hit["score"]} for hit in hits] for hits in vector_hit_lists]
+    return [
+        reciprocal_rank_fusion(
+            [vector_hits, keyword_hits],
+            weights=[HYBRID_VECTOR_WEIGHT, HYBRID_KEYWORD_WEIGHT],
+            limit=limit
+        )
+        for vector_hits, keyword_hits in zip(vector_hit_lists, keyword_hit_lists)
+    ]
+
+# Find the transcript passages most relevant to a question
+async def retrieve_contexts(conversation_id, question, query_vector=None, mode="hybrid"):
+    query_vector_list = None if query_vector is None else [query_vector]
+    return (await retrieve_contexts_many(conversation_id, [question], query_vector_list, mode))[0]
+
+# Batched retrieve_contexts; returns one context list per question
+async def retrieve_contexts_many(conversation_id, questions, question_vectors=None, mode="hybrid"):
+    with time_stage("retrieve"):
+        # Whole-meeting questions are answered from the summary tree when the conversation has one
+        context_lists = [None] * len(questions)
+        routes = [route_question(question) for question in questions]
+        if any(routes):
+            tree = await run_in_threadpool(summary_store.get, conversation_id)
+            if tree is not None:
+                count_tokens = get_token_counter()
+                for i, route in enumerate(routes):
+                    if route:
+                        context_lists[i] = summary_contexts(tree, route, SUMMARY_CONTEXT_TOKENS, count_tokens) or None
         
-        if not transcript_text:
-            raise HTTPException(status_code=500, detail="Failed to transcribe audio")
+        # Over-retrieve, then keep the relevant, non-redundant candidates that fit the token budget
+        pending = [i for i, contexts in enumerate(context_lists) if contexts is None]
+        if pending:
+            hit_lists = await search_conversation_many(
+                conversation_id,
+                [questions[i] for i in pending],
+                None if question_vectors is None else [question_vectors[i] for i in pending],
+                mode,
+                limit=CONTEXT_CANDIDATES
+            )
+            for i, hits in zip(pending, hit_lists):
+                context_lists[i] = [hit["content"] for hit in assemble_contexts(hits)]
         
-        # Save transcript
-        transcript_path = f"transcripts/{conversation_id}.txt"
-        with open(transcript_path, "w") as f:
-            f.write(transcript_text)
+        # Nothing retrieved (e.g. the index is missing or incomplete): search the stored transcript instead
+        for i, contexts in enumerate(context_lists):
+            if not contexts:
+                context_lists[i] = await run_in_threadpool(transcript_contexts, conversation_id, questions[i])
+    return context_lists
+
+# Full-text search of the stored transcript segments; the opening segments when no words match
+def transcript_contexts(conversation_id, question):
+    hits = transcript_store.search(conversation_id, question, limit=CONTEXT_CANDIDATES)
+    if not hits:
+        segments = transcript_store.segments(conversation_id, limit=CONTEXT_CANDIDATES)
+        # Earlier segments rank higher, so the budget keeps the start of the transcript
+        hits = [{**segment, "score": -segment["position"]} for segment in segments]
+    hits = [{**hit, "content": hit["text"]} for hit in hits if hit["text"]]
+    return [hit["content"] for hit in assemble_contexts(hits)]
+
+# Choose the hits that go into a prompt (threshold, MMR de-duplication, token budget)
+def assemble_contexts(hits):
+    return select_contexts(
+        hits,
+        token_budget=CONTEXT_TOKEN_BUDGET,
+        max_contexts=CONTEXT_MAX,
+        min_score=CONTEXT_MIN_SCORE if CONTEXT_MIN_SCORE is not None else embedder.min_context_score,
+        mmr_lambda=CONTEXT_MMR_LAMBDA
+    )
+
+# Answer cache variant: an answer depends on how its contexts were retrieved and selected
+def answer_variant(retrieval_mode):
+    return (retrieval_mode, CONTEXT_CANDIDATES, CONTEXT_MAX, CONTEXT_TOKEN_BUDGET)
+
+# Completion limit for an answer from its question and contexts
+def answer_max_tokens(question, relevant_contexts):
+    count_tokens = get_token_counter()
+    context_tokens = sum(count_tokens(context) for context in relevant_contexts)
+    return answer_token_limit(question, context_tokens, ANSWER_MIN_TOKENS, ANSWER_MAX_TOKENS)
+
+# Create a prompt with the retrieved contexts
+def build_prompt(question, relevant_contexts):
+    with time_stage("prompt_build"):
+        prompt, context_str = _build_prompt(question, relevant_contexts)
+    metrics.PROMPT_TOKENS.observe(get_token_counter()(SYSTEM_PROMPT + prompt), kind="single")
+    return prompt, context_str
+
+def _build_prompt(question, relevant_contexts):
+    context_str = "\n".join(f"[{i+1}] {ctx}" for i, ctx in enumerate(relevant_contexts))
+    prompt = (
+        f"Transcript excerpts:\n{context_str}\n\n"
+        f"Question: {question}\n"
+        "Answer concisely, using only the excerpts."
+    )
+    return prompt, context_str
+
+# Ask the LLM to answer from the retrieved contexts; returns (answer, ok)
+async def generate_answer(question, relevant_contexts):
+    prompt, context_str = build_prompt(question, relevant_contexts)
+    
+    # Get answer from Friendli LLM API
+    try:
+        with time_stage("llm"):
+            response = await async_llm_client.generate_response(
+                prompt=prompt,
+                system_prompt=SYSTEM_PROMPT,
+                max_tokens=answer_max_tokens(question, relevant_contexts),
+                temperature=0.7
+            )
+        
+        # Extract the answer from the response
+        if response and "choices" in response and len(response["choices"]) > 0:
+            return response["choices"][0]["message"]["content"], True
+        logger.error("Unexpected LLM response structure: %s", str(response)[:200])
+        return "I couldn't generate a proper response based on the available information.", False
+    except Exception as e:
+        logger.error("Error calling Friendli LLM API: %s", e)
+        # Fallback to a simple answer based on the contexts
+        return f"Based on the transcript, I found these relevant sections but couldn't process them further:\n\n{context_str}", False
+
+@app.post("/ask-question", response_model=AnswerResponse, dependencies=[Depends(require_backends)])
+async def ask_question(request: QuestionRequest):
+    require_valid_conversation_ids([request.conversation_id])
+    try:
+        with time_stage("embed_query"):
+            query_vector = await run_in_threadpool(query_vectors.embed_query, request.question)
+        
+        async def answer_question():
+            relevant_contexts = await retrieve_contexts(
+                request.conversation_id, request.question, query_vector, request.retrieval_mode
+            )
             
-        # Vectorize transcript for semantic search
-        vectorize_transcript(conversation_id, transcript_text)
+            if not relevant_contexts:
+                # Not cached: the conversation may still be indexing
+                return {
+                    "answer": NO_CONTEXT_ANSWER,
+                    "relevant_contexts": []
+                }, False
+            
+            answer, ok = await generate_answer(request.question, relevant_contexts)
+            # Fallback answers are not cached so the next ask retries the LLM
+            return {
+                "answer": answer,
+                "relevant_contexts": relevant_contexts
+            }, ok
         
-        return {
-            "conversation_id": conversation_id,
-            "status": "success",
-            "message": "Audio uploaded and processed successfully"
-        }
+        # Repeated and near-identical questions are served from the answer cache
+        result, _ = await answer_cache.get_or_compute(
+            request.conversation_id,
+            request.question,
+            answer_question,
+            question_vector=query_vector,
+            variant=answer_variant(request.retrieval_mode)
+        )
+        return result
         
     except Exception as e:
-        # Log the error
-        print(f"Error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
 
-@app.post("/ask-question", response_model=AnswerResponse)
-async def ask_question(request: QuestionRequest):
+# Group questions so each group's combined contexts stay small enough for one prompt
+def pack_questions(indices, context_lists):
+    groups = []
+    for i in indices:
+        for group in groups:
+            union = group["contexts"] | set(context_lists[i])
+            if len(group["questions"]) < ASK_PACK_MAX_QUESTIONS and len(union) <= ASK_PACK_MAX_CONTEXTS:
+                group["questions"].append(i)
+                group["contexts"] = union
+                break
+        else:
+            groups.append({"questions": [i], "contexts": set(context_lists[i])})
+    return [group["questions"] for group in groups]
+
+# Answer several questions in one LLM call over their de-duplicated contexts
+# Returns one answer per question, or None if the reply couldn't be parsed
+async def generate_packed_answers(questions, context_lists):
+    contexts = list(dict.fromkeys(context for context_list in context_lists for context in context_list))
+    context_str = "\n".join(f"[{i+1}] {ctx}" for i, ctx in enumerate(contexts))
+    question_str = "\n".join(f"{i+1}. {question}" for i, question in enumerate(questions))
+    
+    prompt = (
+        f"Transcript excerpts:\n{context_str}\n\n"
+        f"Questions:\n{question_str}\n\n"
+        "Answer each question concisely, using only the excerpts. "
+        'Reply with only a JSON object mapping each question number to its answer, e.g. {"1": "...", "2": "..."}.'
+    )
+    metrics.PROMPT_TOKENS.observe(get_token_counter()(SYSTEM_PROMPT + prompt), kind="packed")
     try:
-        # Search for relevant contexts in Weaviate
-        query_result = client.query.get(
-            "AudioTranscript", 
-            ["content", "conversation_id"]
-        ).with_where({
-            "path": ["conversation_id"],
-            "operator": "Equal",
-            "valueString": request.conversation_id
-        }).with_near_text({
-            "concepts": [request.question]
-        }).with_limit(3).do()
+        with time_stage("llm"):
+            response = await async_llm_client.generate_response(
+                prompt=prompt,
+                system_prompt=SYSTEM_PROMPT,
+                max_tokens=sum(
+                    answer_max_tokens(question, context_list) for question, context_list in zip(questions, context_lists)
+                ),
+                temperature=0.7
+            )
+        content = response["choices"][0]["message"]["content"]
+        answers = json.loads(content[content.index("{"):content.rindex("}") + 1])
+        return [str(answers[str(i + 1)]) for i in range(len(questions))]
+    except Exception as e:
+        logger.warning("Could not answer %d packed questions, answering them separately: %s", len(questions), e)
+        return None
+
+@app.post("/ask-questions", response_model=BatchAnswerResponse, dependencies=[Depends(require_backends)])
+async def ask_questions(request: BatchQuestionRequest):
+    """
+    Answer many questions about one conversation. Questions are embedded and
+    searched in one batch, cached answers are reused, and the LLM calls for the
+    rest run concurrently (or packed per group of questions with overlapping
+    contexts), so the batch takes about as long as its slowest question.
+    """
+    started = time.perf_counter()
+    elapsed_ms = lambda: round((time.perf_counter() - started) * 1000, 2)
+    conversation_id, questions = request.conversation_id, request.questions
+    require_valid_conversation_ids([conversation_id])
+    try:
+        with time_stage("embed_query"):
+            vectors = await run_in_threadpool(query_vectors.embed_queries, questions)
+        embed_ms = elapsed_ms()
+        generation = answer_cache.generation(conversation_id)
+        variant = answer_variant(request.retrieval_mode)
         
-        relevant_contexts = []
-        if query_result and "data" in query_result and "Get" in query_result["data"] and "AudioTranscript" in query_result["data"]["Get"]:
-            relevant_contexts = [item["content"] for item in query_result["data"]["Get"]["AudioTranscript"]]
+        results = [None] * len(questions)
+        pending = []
+        # Repeated questions are answered once and copied
+        first_asked = {}
+        repeats = {}
+        for i, question in enumerate(questions):
+            first = first_asked.setdefault(normalize_question(question), i)
+            if first != i:
+                repeats[i] = first
         
-        if not relevant_contexts:
-            # If no context found, try to load from transcript file
-            transcript_path = TRANSCRIPTS_DIR / f"{request.conversation_id}.json"
-            if transcript_path.exists():
-                with open(transcript_path, "r") as f:
-                    data = json.load(f)
-                    if "transcript" in data:
-                        relevant_contexts = [data["transcript"]]
+        for i, (question, vector) in enumerate(zip(questions, vectors)):
+            if i in repeats:
+                continue
+            cached, hit_type = answer_cache.get(conversation_id, question, vector, variant)
+            if hit_type is not None:
+                results[i] = {**cached, "question": question, "cache_hit": hit_type,
+                              "timings": {"embed_ms": embed_ms, "total_ms": elapsed_ms()}}
+            else:
+                pending.append(i)
         
-        if not relevant_contexts:
-            return {
-                "answer": "I couldn't find any relevant information for your question.",
-                "relevant_contexts": []
+        context_lists = [[] for _ in questions]
+        if pending:
+            retrieved = await retrieve_contexts_many(
+                conversation_id, [questions[i] for i in pending], [vectors[i] for i in pending], request.retrieval_mode
+            )
+            for i, contexts in zip(pending, retrieved):
+                context_lists[i] = contexts
+        retrieval_ms = round(elapsed_ms() - embed_ms, 2)
+        
+        semaphore = asyncio.Semaphore(ASK_BATCH_CONCURRENCY)
+        llm_calls = 0
+        
+        def finish(i, answer, ok, generation_started):
+            results[i] = {
+                "question": questions[i],
+                "answer": answer,
+                "relevant_contexts": context_lists[i],
+                "cache_hit": None,
+                "timings": {
+                    "embed_ms": embed_ms,
+                    "retrieval_ms": retrieval_ms,
+                    "generation_ms": round((time.perf_counter() - generation_started) * 1000, 2),
+                    "total_ms": elapsed_ms()
+                }
             }
+            # Fallback answers are not cached so the next ask retries the LLM
+            if ok:
+                answer_cache.put(
+                    conversation_id, questions[i], {"answer": answer, "relevant_contexts": context_lists[i]},
+                    vectors[i], generation=generation, variant=variant
+                )
         
-        # Create a prompt with the retrieved contexts
-        context_str = "\n".join([f"Context {i+1}: {ctx}" for i, ctx in enumerate(relevant_contexts)])
+        async def answer_one(i):
+            nonlocal llm_calls
+            generation_started = time.perf_counter()
+            if not context_lists[i]:
+                finish(i, NO_CONTEXT_ANSWER, False, generation_started)
+                return
+            async with semaphore:
+                llm_calls += 1
+                answer, ok = await generate_answer(questions[i], context_lists[i])
+            finish(i, answer, ok, generation_started)
         
-        prompt = f"""
-        Based on the following transcription from an audio file, please answer this question:
+        async def answer_group(group):
+            nonlocal llm_calls
+            if len(group) == 1:
+                return await answer_one(group[0])
+            generation_started = time.perf_counter()
+            async with semaphore:
+                llm_calls += 1
+                answers = await generate_packed_answers([questions[i] for i in group], [context_lists[i] for i in group])
+            if answers is None:
+                await asyncio.gather(*(answer_one(i) for i in group))
+                return
+            for i, answer in zip(group, answers):
+                finish(i, answer, True, generation_started)
         
-        Question: {request.question}
+        answerable = [i for i in pending if context_lists[i]]
+        if request.strategy == "packed":
+            tasks = [answer_group(group) for group in pack_questions(answerable, context_lists)]
+        else:
+            tasks = [answer_one(i) for i in answerable]
+        tasks += [answer_one(i) for i in pending if not context_lists[i]]
+        await asyncio.gather(*tasks)
+        for i, first in repeats.items():
+            results[i] = {**results[first], "question": questions[i]}
         
-        {context_str}
+        return {
+            "conversation_id": conversation_id,
+            "results": results,
+            "llm_calls": llm_calls,
+            "unique_contexts": len({context for contexts in context_lists for context in contexts}),
+            "elapsed_ms": elapsed_ms()
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing questions: {str(e)}")
+
+@app.get("/cache/stats", dependencies=[Depends(require_backends)])
+async def get_cache_stats():
+    return {**answer_cache.stats(), "query_vectors": query_vectors.stats(), "dedup": content_index.stats()}
+
+# Helper function to read hit/miss counts of the answer, question-embedding and dedup caches for /metrics
+def cache_lookup_counts():
+    answers = answer_cache.stats()
+    dedup = content_index.stats()
+    counts = {
+        ("answer", "exact_hit"): answers["exact_hits"],
+        ("answer", "semantic_hit"): answers["semantic_hits"],
+        ("answer", "miss"): answers["misses"],
+        ("dedup", "hit"): dedup["hits"],
+        ("dedup", "miss"): dedup["misses"]
+    }
+    # The question-embedding cache exists once the backends are up
+    if query_vectors is not None:
+        questions = query_vectors.stats()
+        counts[("query_vectors", "hit")] = questions["hits"]
+        counts[("query_vectors", "miss")] = questions["misses"]
+    return counts
+
+metrics.REGISTRY.counter_callback(
+    "speakseek_cache_lookups_total", "Cache lookups by cache and result", cache_lookup_counts, ["cache", "result"]
+)
+metrics.REGISTRY.gauge(
+    "speakseek_cache_entries", "Entries held by each cache",
+    lambda: {
+        ("answer",): answer_cache.stats()["entries"],
+        ("query_vectors",): query_vectors.stats()["entries"] if query_vectors is not None else 0,
+        ("dedup",): content_index.stats()["entries"]
+    },
+    ["cache"]
+)
+metrics.REGISTRY.gauge(
+    "speakseek_circuit_state", "Friendli circuit breaker state per endpoint (0 closed, 1 half-open, 2 open)",
+    lambda: {(name,): CIRCUIT_STATES.index(policy.stats()["circuit"]) for name, policy in list(POLICIES.items())},
+    ["endpoint"]
+)
+metrics.REGISTRY.counter_callback(
+    "speakseek_friendli_events_total", "Friendli call failures, retries, hedges and short-circuited calls",
+    lambda: {
+        (name, event): count
+        for name, policy in list(POLICIES.items()) for event, count in policy.stats()["events"].items()
+    },
+    ["endpoint", "event"]
+)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Stage latency histograms, error and request counters in the Prometheus text format"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# Format one server-sent event
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/ask-question/stream", dependencies=[Depends(require_backends)])
+async def ask_question_stream(request: QuestionRequest):
+    """
+    Streaming variant of /ask-question. Emits server-sent events:
+    "contexts" once retrieval is done, then "token" events as the LLM generates,
+    then "done" with the full answer (or "error").
+    """
+    require_valid_conversation_ids([request.conversation_id])
+    
+    async def event_stream():
+        try:
+            with time_stage("embed_query"):
+                query_vector = await run_in_threadpool(query_vectors.embed_query, request.question)
+            variant = answer_variant(request.retrieval_mode)
+            cached, hit_type = answer_cache.get(request.conversation_id, request.question, query_vector, variant)
+            if hit_type is not None:
+                yield sse_event("contexts", {"relevant_contexts": cached["relevant_contexts"]})
+                yield sse_event("token", {"text": cached["answer"]})
+                yield sse_event("done", {"answer": cached["answer"]})
+                return
+            generation = answer_cache.generation(request.conversation_id)
+            relevant_contexts = await retrieve_contexts(
+                request.conversation_id, request.question, query_vector, request.retrieval_mode
+            )
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error processing question: {str(e)}"})
+            return
         
-        Please provide a concise and accurate answer based only on the information provided in the contexts.
-        """
+        yield sse_event("contexts", {"relevant_contexts": relevant_contexts})
         
-        system_prompt = "You are a helpful assistant that answers questions based on audio transcripts. Only use information from the provided contexts to answer the question."
+        if not relevant_contexts:
+            yield sse_event("token", {"text": NO_CONTEXT_ANSWER})
+            yield sse_event("done", {"answer": NO_CONTEXT_ANSWER})
+            return
         
-        # Get answer from Friendli LLM API
+        prompt, context_str = build_prompt(request.question, relevant_contexts)
+        answer_parts = []
+        streamed = False
         try:
-            response = friendli_llm_client.generate_response(
+            async for token in async_llm_client.stream_response(
                 prompt=prompt,
-                system_prompt=system_prompt,
-                max_tokens=500,
+                system_prompt=SYSTEM_PROMPT,
+                max_tokens=answer_max_tokens(request.question, relevant_contexts),
                 temperature=0.7
+            ):
+                answer_parts.append(token)
+                yield sse_event("token", {"text": token})
+            streamed = True
+        except Exception as e:
+            logger.error("Error streaming from Friendli LLM API: %s", e)
+            if not answer_parts:
+                # Same fallback as /ask-question when nothing was generated
+                fallback = f"Based on the transcript, I found these relevant sections but couldn't process them further:\n\n{context_str}"
+                answer_parts.append(fallback)
+                yield sse_event("token", {"text": fallback})
+            else:
+                yield sse_event("error", {"detail": str(e)})
+                return
+        
+        answer = "".join(answer_parts)
+        if streamed and answer:
+            answer_cache.put(
+                request.conversation_id,
+                request.question,
+                {"answer": answer, "relevant_contexts": relevant_contexts},
+                question_vector=query_vector,
+                generation=generation,
+                variant=variant
             )
+        yield sse_event("done", {"answer": answer})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Keep the k best (score, hit) pairs in a min-heap
+def push_top_k(heap, k, score, hit, counter):
+    entry = (score, next(counter), hit)
+    if len(heap) < k:
+        heapq.heappush(heap, entry)
+    elif score > heap[0][0]:
+        heapq.heapreplace(heap, entry)
+
+def format_seconds(seconds):
+    minutes, secs = divmod(int(seconds or 0), 60)
+    return f"{minutes:02d}:{secs:02d}"
+
+@app.post("/search", response_model=SearchResponse, dependencies=[Depends(require_backends)])
+async def search(request: SearchRequest):
+    """
+    Search many conversations at once. Conversations are searched concurrently
+    page by page; each keeps its own top hits and a global heap keeps the best
+    `limit` overall. Vector and BM25 hits are merged globally by their native
+    scores before hybrid fusion. Paging stops once the time budget is spent.
+    """
+    started = time.perf_counter()
+    if request.conversation_ids != "all":
+        require_valid_conversation_ids(request.conversation_ids)
+    try:
+        if request.conversation_ids == "all":
+            conversation_ids = await run_in_threadpool(vector_store.list_conversations)
+        else:
+            conversation_ids = list(dict.fromkeys(request.conversation_ids))
+        conversations_total = len(conversation_ids)
+        
+        candidates = request.limit if request.retrieval_mode != "hybrid" else max(request.limit, HYBRID_CANDIDATES)
+        query_vector = None
+        if request.retrieval_mode != "keyword":
+            with time_stage("embed_query"):
+                query_vector = await run_in_threadpool(query_vectors.embed_query, request.query)
+        
+        vector_heap, keyword_heap = [], []
+        counter = itertools.count()
+        semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+        truncated = False
+        
+        # BM25 scores are only comparable across conversations with a shared idf. Its term statistics
+        # load every index, so they are gathered page by page within the time budget too; conversations
+        # reached before the budget ran out are the ones searched
+        keyword_idf = None
+        if request.retrieval_mode != "vector":
+            terms = set(tokenize(request.query))
             
-            # Extract the answer from the response
-            if response and "choices" in response and len(response["choices"]) > 0:
-                answer = response["choices"][0]["message"]["content"]
-            else:
-                answer = "I couldn't generate a proper response based on the available information."
-                print(f"Unexpected response structure: {response}")
-        except Exception as e:
-            print(f"Error calling Friendli LLM API: {str(e)}")
-            # Fallback to a simple answer based on the contexts
-            answer = f"Based on the transcript, I found these relevant sections but couldn't process them further:\n\n{context_str}"
+            async def term_stats_one(conversation_id):
+                async with semaphore:
+                    return await run_in_threadpool(keyword_index.term_stats, conversation_id, terms)
+            
+            term_stats = []
+            for page_start in range(0, len(conversation_ids), SEARCH_PAGE_SIZE):
+                if time.perf_counter() - started > SEARCH_TIME_BUDGET:
+                    truncated = True
+                    break
+                page = conversation_ids[page_start:page_start + SEARCH_PAGE_SIZE]
+                results = await asyncio.gather(*(term_stats_one(conversation_id) for conversation_id in page), return_exceptions=True)
+                for conversation_id, result in zip(page, results):
+                    if isinstance(result, Exception):
+                        # Its search fails the same way and is skipped there
+                        logger.warning("Keyword statistics failed: %s", result, extra={"conversation_id": conversation_id})
+                        result = (0, {})
+                    term_stats.append(result)
+            conversation_ids = conversation_ids[:len(term_stats)]
+            keyword_idf = idf_from_stats(term_stats, terms)
+        
+        async def search_one(conversation_id):
+            async with semaphore:
+                vector_hits, keyword_hits = [], []
+                if query_vector is not None:
+                    vector_hits = await run_in_threadpool(vector_store.search, conversation_id, query_vector, candidates)
+                if request.retrieval_mode != "vector":
+                    keyword_hits = await run_in_threadpool(
+                        keyword_index.search, conversation_id, request.query, candidates, keyword_idf
+                    )
+                return vector_hits, keyword_hits
+        
+        searched = 0
+        for page_start in range(0, len(conversation_ids), SEARCH_PAGE_SIZE):
+            if time.perf_counter() - started > SEARCH_TIME_BUDGET:
+                truncated = True
+                break
+            page = conversation_ids[page_start:page_start + SEARCH_PAGE_SIZE]
+            results = await asyncio.gather(*(search_one(conversation_id) for conversation_id in page), return_exceptions=True)
+            for conversation_id, result in zip(page, results):
+                if isinstance(result, Exception):
+                    logger.warning("Search failed: %s", result, extra={"conversation_id": conversation_id})
+                    continue
+                searched += 1
+                vector_hits, keyword_hits = result
+                for hit in vector_hits:
+                    push_top_k(vector_heap, candidates, hit["score"], hit, counter)
+                for hit in keyword_hits:
+                    push_top_k(keyword_heap, candidates, hit["score"], hit, counter)
+        
+        ranked_vector = [hit for _, _, hit in sorted(vector_heap, key=lambda entry: -entry[0])]
+        ranked_keyword = [hit for _, _, hit in sorted(keyword_heap, key=lambda entry: -entry[0])]
+        if request.retrieval_mode == "vector":
+            hits = ranked_vector[:request.limit]
+        elif request.retrieval_mode == "keyword":
+            hits = ranked_keyword[:request.limit]
+        else:
+            hits = reciprocal_rank_fusion(
+                [ranked_vector, ranked_keyword],
+                weights=[HYBRID_VECTOR_WEIGHT, HYBRID_KEYWORD_WEIGHT],
+                limit=request.limit
+            )
+        
+        answer = None
+        if request.synthesize and hits:
+            labelled_contexts = [
+                f"[{hit['conversation_id']} @ {format_seconds(hit.get('timestamp'))}] {hit['content']}"
+                for hit in hits
+            ]
+            answer, _ = await generate_answer(request.query, labelled_contexts)
         
         return {
+            "hits": hits,
             "answer": answer,
-            "relevant_contexts": relevant_contexts
+            "conversations_searched": searched,
+            "conversations_total": conversations_total,
+            "truncated": truncated,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
         }
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error searching conversations: {str(e)}")
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,284 @@
+"""
+Latency histograms and counters exported in the Prometheus text format
+
+Pipeline code wraps each stage (save, transcribe, chunk, vectorize, retrieve,
+prompt build, LLM, ...) in `time_stage`, which records the duration in the
+`speakseek_stage_seconds` histogram and counts failures in
+`speakseek_stage_errors_total`. `render()` produces the body served by
+GET /metrics.
+
+Metrics live in process memory and reset on restart; with several server
+processes each one is scraped separately.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Seconds; wide enough for sub-millisecond retrieval and multi-minute transcriptions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count per label combination"""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [per-bucket counts, sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels):
+        entry = self._values.get(tuple(str(labels[name]) for name in self.labelnames))
+        return entry[2] if entry else 0
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class CallbackMetric:
+    """Values read from a callback at scrape time, e.g. counts a component already keeps"""
+
+    def __init__(self, name, documentation, callback, labelnames=(), type_name="gauge"):
+        """
+        Args:
+            callback (callable): Returns a number, or with labelnames a dict of label value tuple -> number
+            type_name (str): "gauge", or "counter" for values that only increase
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.type_name = type_name
+
+    def samples(self):
+        values = self.callback()
+        if not self.labelnames:
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback, labelnames=()):
+        return self.register(CallbackMetric(name, documentation, callback, labelnames))
+
+    def counter_callback(self, name, documentation, callback, labelnames=()):
+        return self.register(CallbackMetric(name, documentation, callback, labelnames, type_name="counter"))
+
+    def render(self):
+        """
+        Returns:
+            str: Every metric in the Prometheus text exposition format (version 0.0.4)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                # One failing callback must not take down the whole scrape
+                logger.warning("Error collecting metric %s: %s", metric.name, e)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+# Starlette appends the charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "speakseek_stage_seconds", "Time spent in each pipeline stage", ["stage"]
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "speakseek_stage_errors_total", "Pipeline stage runs that raised an exception", ["stage"]
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "speakseek_http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "speakseek_http_request_seconds", "HTTP request latency until the response starts", ["method", "route"]
+)
+PROMPT_TOKENS = REGISTRY.histogram(
+    "speakseek_prompt_tokens", "Tokens sent to the LLM per answer prompt (system prompt included)", ["kind"],
+    buckets=(64, 128, 256, 384, 512, 768, 1024, 1536, 2048, 4096, 8192)
+)
+
+PREPROCESS_BYTES = REGISTRY.counter(
+    "speakseek_preprocess_bytes_total", "Audio file bytes before (input) and after (output) preprocessing", ["direction"]
+)
+PREPROCESS_AUDIO_SECONDS = REGISTRY.counter(
+    "speakseek_preprocess_audio_seconds_total", "Seconds of audio before (input) and after (output) silence trimming",
+    ["direction"]
+)
+
+
+@contextmanager
+def time_stage(stage):
+    """
+    Record how long the enclosed block takes as one run of a pipeline stage
+
+    Works in sync and async code (the timer is plain wall-clock time). A block
+    that raises is counted in speakseek_stage_errors_total and still timed.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+def render():
+    return REGISTRY.render()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting HTTP requests and timing them until the response starts
+
+    Requests are labelled with the route template (e.g. /jobs/{job_id}), not
+    the raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        response = {"status": 500, "timed": False}
+
+        def observe():
+            response["timed"] = True
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"], route=self._route(scope))
+
+        async def send_and_observe(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                observe()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_observe)
+        finally:
+            if not response["timed"]:
+                observe()
+            HTTP_REQUESTS.inc(method=scope["method"], route=self._route(scope), status=response["status"])
+
+    def _route(self, scope):
+        # The router records the matched endpoint in the scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            for route in getattr(scope.get("app"), "routes", []):
+                if getattr(route, "endpoint", None) is endpoint or getattr(route, "app", None) is endpoint:
+                    path = route.path
+                    break
+            else:
+                path = "unmatched"
+            self._route_paths[endpoint] = path
+        return path
@@ -0,0 +1,370 @@
+"""
+Deadlines, retries, hedged requests and circuit breaking for remote calls
+
+A ResiliencePolicy wraps one remote endpoint. Every call through it gets:
+
+- a deadline covering all of its attempts; each attempt is given the time
+  that is left as its timeout
+- retries with jittered exponential backoff, but only for failures that are
+  safe and useful to retry (connection errors, timeouts, 408/425/429/5xx)
+- optionally (async calls only) a hedged duplicate request when the first
+  attempt is slower than the recent p95 latency; the first response wins and
+  the other request is cancelled
+- a circuit breaker shared by all calls to the endpoint: after
+  `failure_threshold` transient failures in a row it opens and calls fail
+  immediately with CircuitOpenError; after `reset_seconds` one probe call is
+  let through (half-open) and its outcome closes or re-opens the circuit. A
+  probe that is cancelled before it has an outcome (the client went away) is
+  released, so the next call becomes the probe
+
+Client errors (other 4xx responses) are raised at once and do not count
+against the circuit.
+"""
+
+import asyncio
+import collections
+import logging
+import random
+import threading
+import time
+
+import httpx
+import requests
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset((408, 425, 429, 500, 502, 503, 504))
+
+CIRCUIT_STATES = ("closed", "half_open", "open")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit is open"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call's deadline passed before any attempt succeeded"""
+
+
+def is_retryable(error):
+    """Whether a failed attempt may succeed if sent again"""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code in RETRY_STATUSES
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRY_STATUSES
+    # Connection failures, timeouts and truncated or malformed response bodies
+    return isinstance(error, (
+        requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError,
+        httpx.TransportError, asyncio.TimeoutError, TimeoutError, ValueError
+    ))
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_seconds=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return self._state
+
+    def before_call(self):
+        """
+        Raise CircuitOpenError unless a call may go through now
+
+        Returns:
+            bool: Whether the call is the half-open probe (see release_probe)
+        """
+        with self._lock:
+            if self._state == "closed":
+                return False
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._state = "half_open"
+                self._probing = False
+            if self._state == "half_open" and not self._probing:
+                # Exactly one probe decides whether the endpoint has recovered
+                self._probing = True
+                return True
+            retry_in = max(self.reset_seconds - (time.monotonic() - self._opened_at), 0.0)
+        raise CircuitOpenError(f"{self.name} circuit is open after repeated failures; retry in {retry_in:.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            if self._state != "closed":
+                logger.info("%s circuit closed", self.name, extra={"endpoint": self.name})
+            self._state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def release_probe(self):
+        """The probe was abandoned without an outcome; let the next call probe instead"""
+        with self._lock:
+            if self._state == "half_open":
+                self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or (self._state == "closed" and self._failures >= self.failure_threshold):
+                if self._state == "closed":
+                    logger.warning(
+                        "%s circuit opened after %d failures", self.name, self._failures, extra={"endpoint": self.name}
+                    )
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful attempts"""
+
+    def __init__(self, size=200):
+        self._samples = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction, min_samples=20):
+        """
+        Returns:
+            float: The latency percentile, or None with fewer than min_samples observations
+        """
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class ResiliencePolicy:
+    def __init__(self, name, deadline=60.0, max_retries=2, backoff_base=0.25, backoff_max=5.0,
+                 hedge=False, hedge_min_delay=0.1, hedge_initial_delay=2.0, failure_threshold=5, reset_seconds=30.0):
+        """
+        Args:
+            name (str): Endpoint name used in errors, logs and metrics
+            deadline (float): Seconds a call may take across all of its attempts
+            max_retries (int): Retries after the first attempt
+            backoff_base (float): Backoff before the first retry; doubles per retry
+            backoff_max (float): Longest backoff
+            hedge (bool): Send a duplicate request when an async attempt is slower than the recent p95
+            hedge_min_delay (float): Never hedge sooner than this many seconds
+            hedge_initial_delay (float): Hedge delay until enough latencies are known for a p95 (0 to not hedge until then)
+            failure_threshold (int): Consecutive transient failures that open the circuit
+            reset_seconds (float): Seconds an open circuit waits before letting a probe through
+        """
+        self.name = name
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_initial_delay = hedge_initial_delay
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_seconds)
+        self.latency = LatencyWindow()
+        self.counts = collections.Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, event):
+        with self._lock:
+            self.counts[event] += 1
+
+    def stats(self):
+        """Circuit state and event counts (failures, retries, hedges, hedge_wins, short_circuited, deadline_exceeded)"""
+        with self._lock:
+            events = dict(self.counts)
+        return {"circuit": self.breaker.state, "events": events}
+
+    def _admit(self):
+        try:
+            return self.breaker.before_call()
+        except CircuitOpenError:
+            self._count("short_circuited")
+            raise
+
+    def start(self):
+        """
+        Begin a call: checks the circuit
+
+        Returns:
+            tuple: (the call's deadline (time.monotonic() based), whether the call is the half-open probe)
+        """
+        probe = self._admit()
+        return time.monotonic() + self.deadline, probe
+
+    def remaining(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._count("deadline_exceeded")
+            raise DeadlineExceeded(f"{self.name} call exceeded its {self.deadline:.0f}s deadline")
+        return remaining
+
+    def succeeded(self, seconds=None):
+        self.breaker.record_success()
+        if seconds is not None:
+            self.latency.observe(seconds)
+
+    def failed(self, error, attempt, deadline):
+        """
+        Record a failed attempt and decide whether to retry it
+
+        Returns:
+            float: Seconds to wait before the next attempt, or None to give up (re-raise the error)
+        """
+        if not is_retryable(error):
+            # The endpoint answered; the request itself is at fault
+            self.breaker.record_success()
+            return None
+        self._count("failures")
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            return None
+        # Equal jitter: half the exponential step plus a random part, so clients that failed together spread out
+        step = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        delay = step / 2 + random.uniform(0, step / 2)
+        if time.monotonic() + delay >= deadline or self.breaker.state == "open":
+            return None
+        self._count("retries")
+        logger.warning(
+            "%s call failed (attempt %d), retrying in %.2fs: %s", self.name, attempt + 1, delay, error,
+            extra={"endpoint": self.name}
+        )
+        return delay
+
+    def give_up(self, error, deadline):
+        """Raise the error of the last attempt (as DeadlineExceeded if the deadline cut the call short)"""
+        if is_retryable(error) and time.monotonic() >= deadline - 0.001:
+            self._count("deadline_exceeded")
+            raise DeadlineExceeded(f"{self.name} call exceeded its {self.deadline:.0f}s deadline: {error}") from error
+        raise error
+
+    def before_retry(self):
+        """
+        Check the circuit again before a retry (another caller may have opened it)
+
+        Returns:
+            bool: Whether the retry is the half-open probe
+        """
+        return self._admit()
+
+    def abandoned(self, probe):
+        """
+        The call ended without an outcome (cancelled, or its caller went away)
+
+        Cancellation says nothing about the endpoint, so it counts as neither
+        success nor failure; a probe is released for the next call.
+        """
+        if probe:
+            self.breaker.release_probe()
+
+    def call(self, attempt):
+        """
+        Run a blocking call with the deadline, retries and circuit breaker
+
+        Args:
+            attempt (callable): attempt(timeout_seconds) -> result; raises on failure
+
+        Returns:
+            The result of the first successful attempt
+        """
+        deadline, probe = self.start()
+        try:
+            for n in range(self.max_retries + 1):
+                if n:
+                    probe = self.before_retry()
+                timeout = self.remaining(deadline)
+                started = time.monotonic()
+                try:
+                    result = attempt(timeout)
+                except Exception as e:
+                    # failed() settles the probe one way or the other
+                    probe = False
+                    delay = self.failed(e, n, deadline)
+                    if delay is None:
+                        self.give_up(e, deadline)
+                    time.sleep(delay)
+                    continue
+                self.succeeded(time.monotonic() - started)
+                return result
+        except BaseException:
+            self.abandoned(probe)
+            raise
+
+    async def call_async(self, attempt):
+        """
+        Async variant of call(), with hedged requests when enabled
+
+        Args:
+            attempt (callable): Coroutine function attempt(timeout_seconds) -> result; raises on failure
+        """
+        deadline, probe = self.start()
+        try:
+            for n in range(self.max_retries + 1):
+                if n:
+                    probe = self.before_retry()
+                timeout = self.remaining(deadline)
+                try:
+                    return await asyncio.wait_for(self._hedged(attempt, timeout), timeout)
+                except Exception as e:
+                    probe = False
+                    delay = self.failed(e, n, deadline)
+                    if delay is None:
+                        self.give_up(e, deadline)
+                    await asyncio.sleep(delay)
+        except BaseException:
+            # asyncio.CancelledError is a BaseException: the caller gave up, not the endpoint
+            self.abandoned(probe)
+            raise
+
+    def hedge_delay(self):
+        """Seconds after which a duplicate request is sent, or None when hedging is off"""
+        if not self.hedge:
+            return None
+        p95 = self.latency.percentile(0.95)
+        if p95 is None:
+            # Warming up: calls made before there is a p95 are hedged after a fixed delay
+            return self.hedge_initial_delay or None
+        return max(p95, self.hedge_min_delay)
+
+    async def _hedged(self, attempt, timeout):
+        async def timed(attempt_timeout):
+            started = time.monotonic()
+            result = await attempt(attempt_timeout)
+            self.succeeded(time.monotonic() - started)
+            return result
+
+        delay = self.hedge_delay()
+        if delay is None or delay >= timeout:
+            return await timed(timeout)
+
+        tasks = [asyncio.ensure_future(timed(timeout))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self._count("hedges")
+                tasks.append(asyncio.ensure_future(timed(timeout - delay)))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
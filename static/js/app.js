@@ -22,8 +22,12 @@ const newUploadBtn = document.getElementById('new-upload-btn');
 
 // API endpoints - using absolute URLs with port 8000 for FastAPI
 const API_BASE_URL = 'http://127.0.0.1:8001';
-const UPLOAD_ENDPOINT = `${API_BASE_URL}/upload-audio`;
 const QUESTION_ENDPOINT = `${API_BASE_URL}/ask-question`;
+const QUESTION_STREAM_ENDPOINT = `${API_BASE_URL}/ask-question/stream`;
+const JOBS_ENDPOINT = `${API_BASE_URL}/jobs`;
+const UPLOADS_ENDPOINT = `${API_BASE_URL}/uploads`;
+const UPLOAD_MAX_RETRIES = 5;
+const JOB_POLL_INTERVAL_MS = 1000;
 
 // Add debug logging for development
 const DEBUG = true;
@@ -134,58 +138,10 @@ async function uploadAudio(file, conversationName) {
     logDebug('Conversation name:', conversationName);
     
     try {
-        const formData = new FormData();
-        formData.append('file', file);
-        formData.append('conversation_name', conversationName);
-        
-        // Simulating upload progress
-        const progressInterval = simulateProgress();
-        
-        logDebug('Sending request to:', UPLOAD_ENDPOINT);
-        
-        const response = await fetch(UPLOAD_ENDPOINT, {
-            method: 'POST',
-            body: formData,
-            // Don't set Content-Type here, browser will set it with boundary for form-data
-        });
-        
-        // Clear progress simulation
-        clearInterval(progressInterval);
+        // Send the file in chunks so an interrupted upload continues where it stopped
+        const data = await uploadResumable(file, conversationName);
         uploadProgressBar.style.width = '100%';
         
-        logDebug('Response status:', response.status);
-        logDebug('Response headers:', response.headers);
-        
-        // Check response status and try to parse response
-        if (!response.ok) {
-            let errorMessage = `Error ${response.status}: ${response.statusText}`;
-            try {
-                const errorData = await response.json();
-                errorMessage = errorData.detail || errorMessage;
-            } catch (parseError) {
-                // If JSON parsing fails, try to get text
-                try {
-                    const errorText = await response.text();
-                    if (errorText) {
-                        errorMessage += ` - ${errorText}`;
-                    }
-                } catch (textError) {
-                    // Ignore text parsing error
-                }
-            }
-            throw new Error(errorMessage);
-        }
-        
-        // Try to parse JSON response
-        let data;
-        try {
-            const responseText = await response.text();
-            logDebug('Response text:', responseText);
-            data = JSON.parse(responseText);
-        } catch (e) {
-            throw new Error(`Error parsing response: ${e.message}`);
-        }
-        
         logDebug('Response data:', data);
         
         if (data && data.conversation_id) {
@@ -195,6 +151,12 @@ async function uploadAudio(file, conversationName) {
             throw new Error('Invalid response format: missing conversation_id');
         }
         
+        // Wait for background transcription and indexing to finish
+        if (data.job_id) {
+            showUploadStatus('Upload complete. Transcribing and indexing...', 'info');
+            await waitForJob(data.job_id);
+        }
+        
         // Show success message
         showUploadStatus('Audio processed successfully!', 'success');
         
@@ -221,6 +183,31 @@ async function uploadAudio(file, conversationName) {
     }
 }
 
+// Poll the ingestion job until it completes or fails
+async function waitForJob(jobId) {
+    while (true) {
+        const response = await fetch(`${JOBS_ENDPOINT}/${jobId}`);
+        if (!response.ok) {
+            throw new Error(`Error ${response.status} while checking job status`);
+        }
+        
+        const job = await response.json();
+        logDebug('Job status:', job);
+        
+        uploadProgressBar.style.width = `${Math.round(job.progress * 100)}%`;
+        
+        if (job.stage === 'completed') {
+            return job;
+        }
+        if (job.stage === 'failed') {
+            throw new Error(job.error || 'Processing failed');
+        }
+        
+        showUploadStatus(`Processing: ${job.stage}...`, 'info');
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+}
+
 // Show upload status message
 function showUploadStatus(message, type) {
     uploadStatus.textContent = message;
@@ -228,17 +215,99 @@ function showUploadStatus(message, type) {
     uploadStatus.style.display = 'block';
 }
 
-// Simulate progress for better user experience
-function simulateProgress() {
-    let progress = 0;
+// Upload a file with the resumable protocol: create a session, PATCH chunks at
+// their offset, then finalize. Sessions are remembered per file, so retrying the
+// same file (even after a page reload) resumes from the server's offset.
+async function uploadResumable(file, conversationName) {
+    const sessionKey = `speakseek-upload:${file.name}:${file.size}:${file.lastModified}:${conversationName}`;
+    let session = null;
+    
+    const savedUploadId = localStorage.getItem(sessionKey);
+    if (savedUploadId) {
+        const response = await fetch(`${UPLOADS_ENDPOINT}/${savedUploadId}`);
+        if (response.ok) {
+            session = await response.json();
+            logDebug('Resuming upload:', session);
+        }
+    }
+    
+    if (!session) {
+        logDebug('Creating upload session at:', UPLOADS_ENDPOINT);
+        const response = await fetch(UPLOADS_ENDPOINT, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                filename: file.name,
+                conversation_name: conversationName,
+                size: file.size
+            })
+        });
+        if (!response.ok) {
+            throw new Error(await responseError(response));
+        }
+        session = await response.json();
+        localStorage.setItem(sessionKey, session.upload_id);
+    }
     
-    return setInterval(() => {
-        // Increase progress, but never reach 100% (that happens when complete)
-        if (progress < 90) {
-            progress += Math.random() * 10;
-            uploadProgressBar.style.width = `${progress}%`;
+    let offset = session.offset;
+    let retries = 0;
+    while (offset < file.size) {
+        const chunk = file.slice(offset, offset + session.chunk_size);
+        try {
+            const response = await fetch(`${UPLOADS_ENDPOINT}/${session.upload_id}`, {
+                method: 'PATCH',
+                headers: { 'Upload-Offset': String(offset) },
+                body: chunk
+            });
+            if (response.status === 409) {
+                // The server has a different offset (e.g. a chunk landed but its response was lost)
+                offset = Number(response.headers.get('Upload-Offset') ?? (await fetchUploadOffset(session.upload_id)));
+                continue;
+            }
+            if (!response.ok) {
+                throw new Error(await responseError(response));
+            }
+            offset = (await response.json()).offset;
+            retries = 0;
+        } catch (error) {
+            if (++retries > UPLOAD_MAX_RETRIES) {
+                throw error;
+            }
+            logDebug(`Upload chunk failed (attempt ${retries}), retrying:`, error.message);
+            await new Promise(resolve => setTimeout(resolve, 500 * 2 ** retries));
+            offset = await fetchUploadOffset(session.upload_id);
         }
-    }, 500);
+        uploadProgressBar.style.width = `${Math.round((offset / file.size) * 100)}%`;
+        showUploadStatus(`Uploading... ${Math.round((offset / file.size) * 100)}%`, 'info');
+    }
+    
+    const response = await fetch(`${UPLOADS_ENDPOINT}/${session.upload_id}/finalize`, { method: 'POST' });
+    if (!response.ok) {
+        throw new Error(await responseError(response));
+    }
+    localStorage.removeItem(sessionKey);
+    return response.json();
+}
+
+// Ask the server how many bytes of an upload it has
+async function fetchUploadOffset(uploadId) {
+    const response = await fetch(`${UPLOADS_ENDPOINT}/${uploadId}`);
+    if (!response.ok) {
+        throw new Error(await responseError(response));
+    }
+    return (await response.json()).offset;
+}
+
+// Build an error message from a failed response
+async function responseError(response) {
+    let errorMessage = `Error ${response.status}: ${response.statusText}`;
+    try {
+        const errorData = await response.json();
+        errorMessage = errorData.detail || errorMessage;
+    } catch (parseError) {
+        // Keep the status text
+    }
+    return errorMessage;
 }
 
 // Handle chat functionality
@@ -272,7 +341,7 @@ function initChatFunctionality() {
             
             logDebug('Request body:', requestBody);
             
-            const response = await fetch(QUESTION_ENDPOINT, {
+            const response = await fetch(QUESTION_STREAM_ENDPOINT, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -281,7 +350,6 @@ function initChatFunctionality() {
             });
             
             logDebug('Question response status:', response.status);
-            logDebug('Question response headers:', response.headers);
             
             if (!response.ok) {
                 let errorMessage = `Error ${response.status}: ${response.statusText}`;
@@ -289,38 +357,38 @@ function initChatFunctionality() {
                     const errorData = await response.json();
                     errorMessage = errorData.detail || errorMessage;
                 } catch (parseError) {
-                    // If JSON parsing fails, try to get text
-                    try {
-                        const errorText = await response.text();
-                        if (errorText) {
-                            errorMessage += ` - ${errorText}`;
-                        }
-                    } catch (textError) {
-                        // Ignore text parsing error
-                    }
+                    // Ignore parsing error and keep the status message
                 }
                 throw new Error(errorMessage);
             }
             
-            // Try to parse JSON response
-            let data;
-            try {
-                const responseText = await response.text();
-                logDebug('Question response text:', responseText);
-                data = JSON.parse(responseText);
-            } catch (e) {
-                throw new Error(`Error parsing response: ${e.message}`);
-            }
-            
-            logDebug('Question response data:', data);
+            // Render the answer as tokens arrive
+            let botMessage = null;
+            let contexts = [];
             
-            // Remove typing indicator
-            typingIndicator.remove();
+            await readEventStream(response, (event, data) => {
+                logDebug(`Stream event: ${event}`, data);
+                
+                if (event === 'contexts') {
+                    contexts = data.relevant_contexts || [];
+                } else if (event === 'token') {
+                    if (!botMessage) {
+                        typingIndicator.remove();
+                        botMessage = addMessage('', 'bot');
+                    }
+                    appendMessageText(botMessage, data.text);
+                } else if (event === 'done') {
+                    if (!botMessage) {
+                        typingIndicator.remove();
+                        botMessage = addMessage(data.answer, 'bot');
+                    }
+                    attachContexts(botMessage, contexts);
+                } else if (event === 'error') {
+                    throw new Error(data.detail || 'Streaming failed');
+                }
+            });
             
-            // Add bot response with relevant contexts
-            if (data && data.answer) {
-                addMessage(data.answer, 'bot', data.relevant_contexts || []);
-            } else {
+            if (!botMessage) {
                 throw new Error('Invalid response format: missing answer');
             }
             
@@ -341,34 +409,88 @@ function initChatFunctionality() {
 function addMessage(content, type, contexts = []) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${type}-message`;
-    messageDiv.textContent = content;
+    
+    const messageText = document.createElement('span');
+    messageText.className = 'message-text';
+    messageText.textContent = content;
+    messageDiv.appendChild(messageText);
     
     // Add context toggle for bot messages
-    if (type === 'bot' && contexts.length > 0) {
-        const contextToggle = document.createElement('div');
-        contextToggle.className = 'context-toggle';
-        contextToggle.innerHTML = '<i class="fas fa-info-circle"></i> Show source context';
-        messageDiv.appendChild(contextToggle);
-        
-        const contextContent = document.createElement('div');
-        contextContent.className = 'context-content';
-        contextContent.textContent = contexts.join('\n\n');
-        messageDiv.appendChild(contextContent);
-        
-        // Toggle context visibility
-        contextToggle.addEventListener('click', () => {
-            const isShowing = contextContent.style.display === 'block';
-            contextContent.style.display = isShowing ? 'none' : 'block';
-            contextToggle.innerHTML = isShowing ? 
-                '<i class="fas fa-info-circle"></i> Show source context' : 
-                '<i class="fas fa-times-circle"></i> Hide source context';
-        });
+    if (type === 'bot') {
+        attachContexts(messageDiv, contexts);
     }
     
     chatMessages.appendChild(messageDiv);
     
     // Scroll to bottom
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    
+    return messageDiv;
+}
+
+// Append streamed text to a message
+function appendMessageText(messageDiv, text) {
+    messageDiv.querySelector('.message-text').textContent += text;
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+// Add a toggle showing the source contexts of a bot message
+function attachContexts(messageDiv, contexts) {
+    if (!contexts || contexts.length === 0) {
+        return;
+    }
+    
+    const contextToggle = document.createElement('div');
+    contextToggle.className = 'context-toggle';
+    contextToggle.innerHTML = '<i class="fas fa-info-circle"></i> Show source context';
+    messageDiv.appendChild(contextToggle);
+    
+    const contextContent = document.createElement('div');
+    contextContent.className = 'context-content';
+    contextContent.textContent = contexts.join('\n\n');
+    messageDiv.appendChild(contextContent);
+    
+    // Toggle context visibility
+    contextToggle.addEventListener('click', () => {
+        const isShowing = contextContent.style.display === 'block';
+        contextContent.style.display = isShowing ? 'none' : 'block';
+        contextToggle.innerHTML = isShowing ? 
+            '<i class="fas fa-info-circle"></i> Show source context' : 
+            '<i class="fas fa-times-circle"></i> Hide source context';
+    });
+}
+
+// Read a server-sent event stream from a fetch response, calling onEvent(event, data) per event
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            }
+            onEvent(event, data ? JSON.parse(data) : {});
+        }
+    }
 }
 
 // Add typing indicator
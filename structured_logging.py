@@ -0,0 +1,109 @@
+"""
+Leveled, sampled, structured logging
+
+`configure_logging()` sends every `logging` record to stderr, either as one
+JSON object per line (the default) or as plain text. Fields passed with
+`extra={...}` become keys of the JSON object, so log lines can be filtered
+by conversation_id, stage, status and so on.
+
+High-volume records (e.g. one per Friendli request) pass `sampled()` as
+their extra: records below WARNING are then only emitted for a fraction
+(SPEAKSEEK_LOG_SAMPLE_RATE) of calls. Warnings and errors are never sampled.
+
+Settings:
+    SPEAKSEEK_LOG_LEVEL: DEBUG, INFO (default), WARNING, ...
+    SPEAKSEEK_LOG_FORMAT: json (default) or text
+    SPEAKSEEK_LOG_SAMPLE_RATE: Fraction of sampled records kept (default 0.1)
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+LOG_SAMPLE_RATE = float(os.getenv("SPEAKSEEK_LOG_SAMPLE_RATE", "0.1"))
+
+# Libraries that log every request or parsed chunk at DEBUG/INFO; kept at WARNING so the hot path stays quiet
+NOISY_LOGGERS = ("httpx", "httpcore", "urllib3", "multipart", "asyncio", "weaviate")
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def sampled(rate=None, **fields):
+    """
+    extra= for a high-volume record that should only be logged for a fraction of calls
+
+    Args:
+        rate (float, optional): Fraction kept (defaults to SPEAKSEEK_LOG_SAMPLE_RATE)
+        **fields: Structured fields to attach
+
+    Returns:
+        dict: Value for the `extra` argument of a logging call
+    """
+    return {**fields, "sample_rate": LOG_SAMPLE_RATE if rate is None else rate}
+
+
+def _fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class SamplingFilter(logging.Filter):
+    """Drops sampled records below WARNING with probability 1 - sample_rate"""
+
+    def filter(self, record):
+        rate = getattr(record, "sample_rate", None)
+        if rate is None or rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_fields(record)
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        fields = " ".join(f"{key}={value}" for key, value in _fields(record).items() if key != "sample_rate")
+        line = f"{timestamp} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        if fields:
+            line += f" [{fields}]"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def configure_logging(level=None, log_format=None):
+    """
+    Install the structured handler on the root logger (once; later calls only change the level)
+
+    Args:
+        level (str, optional): Log level name (defaults to SPEAKSEEK_LOG_LEVEL)
+        log_format (str, optional): "json" or "text" (defaults to SPEAKSEEK_LOG_FORMAT)
+    """
+    level = (level or os.getenv("SPEAKSEEK_LOG_LEVEL", "INFO")).upper()
+    log_format = (log_format or os.getenv("SPEAKSEEK_LOG_FORMAT", "json")).lower()
+    root = logging.getLogger()
+    root.setLevel(level)
+    for name in NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.getLevelName(level), logging.WARNING))
+    if any(getattr(handler, "_speakseek", False) for handler in root.handlers):
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler._speakseek = True
+    handler.setFormatter(TextFormatter() if log_format == "text" else JsonFormatter())
+    handler.addFilter(SamplingFilter())
+    root.addHandler(handler)
@@ -0,0 +1,232 @@
+"""
+Hierarchical transcript summaries for whole-meeting questions
+
+After a transcript is indexed, a map-reduce summary tree can be built:
+
+- chunk: the transcript cut into windows of a few thousand tokens (whole
+  sentences, no overlap), each summarized on its own
+- section: consecutive chunk summaries combined, `fanout` at a time
+- meeting: the section summaries reduced (again `fanout` at a time) until one
+  summary is left
+
+The summaries of one level are generated concurrently. The tree is stored as
+JSON next to the transcript (<conversation_id>.summary.json).
+
+Questions about the whole meeting ("summarize this meeting", "list all
+decisions") can't be answered from a few retrieved chunks. `route_question`
+recognizes them and `summary_contexts` picks the level to answer from: the
+meeting summary for overviews, and the most detailed level that fits the
+token budget for questions that enumerate things.
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from chunking import chunk_segments
+from conversation_ids import check_conversation_id
+
+SUMMARY_LEVELS = ("chunk", "section", "meeting")
+
+# Completion limits per level; higher levels cover more ground
+SUMMARY_MAX_TOKENS = {"chunk": 200, "section": 300, "meeting": 400}
+
+SUMMARY_SYSTEM_PROMPT = "You summarize meeting transcripts accurately and concisely. Never add information that is not in the text."
+
+CHUNK_PROMPT = (
+    "Summarize this part of a meeting transcript ({span}) in a few short bullet points. "
+    "Keep decisions, action items, names, numbers and open questions.\n\n{text}"
+)
+COMBINE_PROMPT = (
+    "These are summaries of consecutive parts of a meeting, in order. Combine them into one summary "
+    "of short bullet points, keeping every decision and action item.\n\n{text}"
+)
+MEETING_PROMPT = (
+    "These are summaries of consecutive parts of a meeting, in order. Write an overall summary of the "
+    "meeting: the topics discussed, decisions made and action items.\n\n{text}"
+)
+
+OVERVIEW_PATTERN = re.compile(
+    r"\b(summari[sz]e|summary|overview|recap|tl;?dr|gist|main (points|topics|ideas|themes)|"
+    r"key (points|takeaways|topics)|what (was|is) (this|the) (meeting|talk|call|conversation|recording|session) about|"
+    r"what (was|were) (discussed|covered|talked about))\b",
+    re.IGNORECASE
+)
+ENUMERATION_PATTERN = re.compile(
+    r"\b(list (all|every|the)|all (the )?(decisions|action items|topics|speakers|questions|tasks|points|names)|"
+    r"every (decision|action item|topic|speaker|question|task)|action items|decisions (made|were made)|next steps|"
+    r"what decisions|which decisions)\b",
+    re.IGNORECASE
+)
+
+
+def format_span(start, end):
+    def clock(seconds):
+        minutes, secs = divmod(int(seconds or 0), 60)
+        return f"{minutes:02d}:{secs:02d}"
+
+    return f"{clock(start)}-{clock(end)}"
+
+
+def route_question(question):
+    """
+    Whether a question is about the whole meeting, and how detailed the answer must be
+
+    Returns:
+        str: "overview", "enumeration", or None for questions answered from retrieved chunks
+    """
+    if ENUMERATION_PATTERN.search(question):
+        return "enumeration"
+    if OVERVIEW_PATTERN.search(question):
+        return "overview"
+    return None
+
+
+def build_summary_tree(segments, complete, chunk_tokens=1500, fanout=6, concurrency=4, on_progress=None):
+    """
+    Summarize a transcript bottom-up
+
+    Args:
+        segments (list): Timed transcript segments ({"start", "end", "text"})
+        complete (callable): complete(prompt, max_tokens) -> summary text (called from worker threads)
+        chunk_tokens (int): Transcript tokens per chunk summary
+        fanout (int): Summaries combined per reduce step
+        concurrency (int): Summaries generated at once
+        on_progress (callable, optional): Called with the fraction of LLM calls done
+
+    Returns:
+        dict: Level name -> list of {"start", "end", "text"}, in transcript order
+    """
+    fanout = max(fanout, 2)
+    windows = list(chunk_segments(segments, max_tokens=chunk_tokens, overlap_tokens=0))
+    if not windows:
+        return {level: [] for level in SUMMARY_LEVELS}
+
+    # Every reduce step shrinks a level by `fanout`, so the total number of calls is known up front
+    total_calls, count = len(windows), len(windows)
+    while count > 1:
+        count = -(-count // fanout)
+        total_calls += count
+    done = [0]
+    lock = threading.Lock()
+
+    def run(prompt, level):
+        text = complete(prompt, SUMMARY_MAX_TOKENS[level]).strip()
+        with lock:
+            done[0] += 1
+            if on_progress:
+                on_progress(done[0] / total_calls)
+        return text
+
+    def reduce(nodes, template, level, pool):
+        groups = [nodes[i:i + fanout] for i in range(0, len(nodes), fanout)]
+        prompts = [
+            template.format(text="\n\n".join(f"[{format_span(n['start'], n['end'])}]\n{n['text']}" for n in group))
+            for group in groups
+        ]
+        texts = pool.map(lambda prompt: run(prompt, level), prompts)
+        return [
+            {"start": group[0]["start"], "end": group[-1]["end"], "text": text}
+            for group, text in zip(groups, texts)
+        ]
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix="summarize") as pool:
+        chunk_prompts = [
+            CHUNK_PROMPT.format(span=format_span(window["start"], window["end"]), text=window["content"])
+            for window in windows
+        ]
+        chunk_texts = pool.map(lambda prompt: run(prompt, "chunk"), chunk_prompts)
+        tree = {"chunk": [
+            {"start": window["start"], "end": window["end"], "text": text}
+            for window, text in zip(windows, chunk_texts)
+        ]}
+        tree["section"] = reduce(tree["chunk"], COMBINE_PROMPT, "section", pool) if len(windows) > 1 else tree["chunk"]
+        nodes = tree["section"]
+        while len(nodes) > 1:
+            last_step = len(nodes) <= fanout
+            nodes = reduce(nodes, MEETING_PROMPT if last_step else COMBINE_PROMPT, "meeting" if last_step else "section", pool)
+        tree["meeting"] = nodes
+    return tree
+
+
+def summary_contexts(tree, route, token_budget, count_tokens):
+    """
+    Contexts for a whole-meeting question
+
+    Args:
+        tree (dict): Summary tree from build_summary_tree
+        route (str): "overview" or "enumeration" (see route_question)
+        token_budget (int): Maximum tokens of the returned contexts
+        count_tokens (callable): Token counter
+
+    Returns:
+        list: Summaries labelled with their time span, or [] if the tree is empty
+    """
+    levels = ("meeting",) if route == "overview" else ("chunk", "section", "meeting")
+    for level in levels:
+        contexts = [f"[{format_span(node['start'], node['end'])}] {node['text']}" for node in tree.get(level, [])]
+        if contexts and (level == "meeting" or sum(count_tokens(context) for context in contexts) <= token_budget):
+            return contexts
+    return []
+
+
+class SummaryStore:
+    """Summary trees stored as <conversation_id>.summary.json, cached in memory until the file changes"""
+
+    def __init__(self, root_dir, max_open=256):
+        self.root_dir = Path(root_dir)
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, conversation_id):
+        return self.root_dir / f"{check_conversation_id(conversation_id)}.summary.json"
+
+    def save(self, conversation_id, tree):
+        path = self._path(conversation_id)
+        # Write and rename, so readers never see a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"levels": tree}, f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._open.pop(conversation_id, None)
+
+    def get(self, conversation_id):
+        """
+        Returns:
+            dict: The summary tree, or None if the conversation has none
+        """
+        path = self._path(conversation_id)
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._open.get(conversation_id)
+            if cached and cached[0] == mtime:
+                self._open.move_to_end(conversation_id)
+                return cached[1]
+        with open(path, "r") as f:
+            tree = json.load(f)["levels"]
+        with self._lock:
+            self._open[conversation_id] = (mtime, tree)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return tree
+
+    def copy(self, source_id, conversation_id):
+        tree = self.get(source_id)
+        if tree is not None:
+            self.save(conversation_id, tree)
+        return tree is not None
+
+    def delete(self, conversation_id):
+        with self._lock:
+            self._open.pop(conversation_id, None)
+        self._path(conversation_id).unlink(missing_ok=True)
@@ -0,0 +1,17 @@
+import os
+import tempfile
+
+# main.py reads its settings at import time: keep everything it writes in a scratch directory and offline
+_data_dir = tempfile.mkdtemp(prefix="speakseek-tests-")
+for name, value in {
+    "SPEAKSEEK_VECTOR_BACKEND": "numpy",
+    "SPEAKSEEK_EMBEDDER": "hashing",
+    "SPEAKSEEK_SUMMARIES": "false",
+    "SPEAKSEEK_UPLOAD_DIR": os.path.join(_data_dir, "uploaded_audio"),
+    "SPEAKSEEK_TRANSCRIPTS_DIR": os.path.join(_data_dir, "transcripts"),
+    "SPEAKSEEK_VECTORS_DIR": os.path.join(_data_dir, "vectors"),
+    "SPEAKSEEK_KEYWORD_INDEX_DIR": os.path.join(_data_dir, "keyword_index"),
+    "SPEAKSEEK_JOBS_DB": os.path.join(_data_dir, "jobs.db"),
+    "FRIENDLI_API_KEY": "test",
+}.items():
+    os.environ[name] = value
@@ -0,0 +1,88 @@
+import asyncio
+
+import numpy as np
+
+from answer_cache import AnswerCache
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_retrieval_modes_do_not_share_entries():
+    cache = AnswerCache()
+    vector = unit(1, 0, 0)
+    cache.put("c1", "Who owns the launch?", {"answer": "vector"}, vector, variant="vector")
+
+    assert cache.get("c1", "who owns the launch", vector, variant="vector") == ({"answer": "vector"}, "exact")
+    # Neither the exact key nor the semantic fallback crosses modes
+    assert cache.get("c1", "Who owns the launch?", vector, variant="keyword") == (None, None)
+
+    cache.put("c1", "Who owns the launch?", {"answer": "keyword"}, vector, variant="keyword")
+    assert cache.get("c1", "Who owns the launch?", vector, variant="keyword")[0] == {"answer": "keyword"}
+    assert cache.get("c1", "Who owns the launch?", vector, variant="vector")[0] == {"answer": "vector"}
+
+    cache.invalidate("c1")
+    assert cache.stats()["entries"] == 0
+
+
+def test_concurrent_questions_coalesce_per_mode():
+    cache = AnswerCache()
+    calls = []
+
+    async def ask(variant):
+        async def compute():
+            calls.append(variant)
+            await asyncio.sleep(0.01)
+            return {"answer": variant}, True
+        return await cache.get_or_compute("c1", "What was decided?", compute, variant=variant)
+
+    async def run():
+        return await asyncio.gather(ask("hybrid"), ask("hybrid"), ask("keyword"))
+
+    results = asyncio.run(run())
+    assert sorted(calls) == ["hybrid", "keyword"]
+    assert [value for value, _ in results] == [{"answer": "hybrid"}, {"answer": "hybrid"}, {"answer": "keyword"}]
+    assert results[1][1] == "coalesced"
+
+
+def test_semantic_hit_refreshes_lru_order():
+    cache = AnswerCache(max_entries=2)
+    cache.put("c1", "When is the launch?", {"answer": "March"}, unit(1, 0, 0))
+    cache.put("c1", "Who owns the budget?", {"answer": "Ben"}, unit(0, 1, 0))
+    # Semantic lookups don't refresh the candidates they merely compare against
+    assert cache.get("c1", "When do we launch?", unit(1, 0.01, 0)) == ({"answer": "March"}, "semantic")
+
+    cache.put("c1", "What is blocked?", {"answer": "QA"}, unit(0, 0, 1))
+
+    assert cache.get("c1", "When is the launch?")[1] == "exact"
+    assert cache.get("c1", "Who owns the budget?") == (None, None)
+
+
+def test_cancelled_leader_does_not_fail_followers():
+    cache = AnswerCache()
+    calls = []
+
+    async def compute():
+        calls.append(len(calls))
+        await asyncio.sleep(0.05)
+        return {"answer": f"computed by call {len(calls) - 1}"}, True
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_compute("c1", "What was decided?", compute))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(cache.get_or_compute("c1", "What was decided?", compute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        # e.g. the leader's client disconnected
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        return leader, results
+
+    leader, results = asyncio.run(run())
+    assert leader.cancelled()
+    # One follower took over; the other coalesced onto it
+    assert len(calls) == 2
+    assert sorted(hit_type or "computed" for _, hit_type in results) == ["coalesced", "computed"]
+    assert all(value == {"answer": "computed by call 1"} for value, _ in results)
+    assert cache.get("c1", "What was decided?")[0] == {"answer": "computed by call 1"}
@@ -0,0 +1,78 @@
+import wave
+
+import numpy as np
+import pytest
+
+import audio_preprocessing
+from audio_preprocessing import FRAME_MS, OffsetMap, Resampler, UnsupportedAudio, preprocess_audio
+
+
+def write_tone(path, seconds, silences, sample_rate=48000, channels=2):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = 0.3 * np.sin(2 * np.pi * 220 * t)
+    for start, end in silences:
+        samples[int(start * sample_rate):int(end * sample_rate)] = 0.0
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(np.repeat((samples * 32767).astype("<i2")[:, None], channels, axis=1).tobytes())
+
+
+def test_offset_map_moves_times_past_a_cut():
+    offsets = OffsetMap()
+    # 4.3 s of audio kept, then the silence up to 8.68 s was cut
+    offsets.add(4.3, 8.68)
+
+    assert offsets.cuts == 1
+    assert offsets.to_original(2.0) == 2.0
+    assert offsets.to_original(4.6) == pytest.approx(8.98)
+    # At the cut a start belongs to the span after it and an end to the span before it
+    assert offsets.to_original(4.3) == pytest.approx(8.68)
+    assert offsets.to_original(4.3, end=True) == pytest.approx(4.3)
+    assert offsets.map_segments([{"start": 3.5, "end": 4.3, "text": "a"}, {"start": 4.3, "end": 4.6, "text": "b"}]) == [
+        {"start": 3.5, "end": 4.3, "text": "a"},
+        {"start": 8.68, "end": 8.98, "text": "b"},
+    ]
+
+
+def test_preprocessing_downmixes_resamples_and_trims_long_silences(tmp_path):
+    source, output = tmp_path / "call.wav", tmp_path / "call.preprocessed.wav"
+    write_tone(source, 14.0, [(4.0, 9.0), (11.0, 11.5)])
+    report = preprocess_audio(source, output, block_seconds=1.0)
+
+    with wave.open(str(output)) as wav:
+        assert (wav.getnchannels(), wav.getframerate(), wav.getsampwidth()) == (1, 16000, 2)
+        assert wav.getnframes() / 16000 == report["output_seconds"]
+    assert report["input_seconds"] == 14.0
+    # The 5 s silence shrinks to the padding on each side; the 0.5 s pause stays
+    assert report["output_seconds"] == pytest.approx(14.0 - 5.0 + 0.6, abs=2 * FRAME_MS / 1000)
+    assert report["output_bytes"] < report["input_bytes"] / 6
+    assert len(report["levels"]) == pytest.approx(report["output_seconds"] * 1000 / FRAME_MS, abs=1)
+
+    # Speech resuming after the cut lines up with the original recording again
+    offsets = report["offsets"]
+    assert offsets.cuts == 1
+    resumed = offsets.output_starts[1] + 0.3
+    assert offsets.to_original(resumed) == pytest.approx(9.0, abs=FRAME_MS / 1000)
+    assert offsets.to_original(report["output_seconds"], end=True) == pytest.approx(14.0, abs=FRAME_MS / 1000)
+
+
+def test_resampler_is_continuous_across_blocks():
+    t = np.arange(48000) / 48000
+    signal = np.sin(2 * np.pi * 220 * t).astype(np.float32)
+    whole = Resampler(48000, 16000).process(signal)
+    resampler = Resampler(48000, 16000)
+    blocks = np.concatenate([resampler.process(block) for block in np.array_split(signal, 7)])
+
+    assert abs(len(whole) - 16000) <= 1 and len(blocks) == len(whole)
+    assert np.allclose(blocks, whole, atol=1e-5)
+
+
+def test_non_wav_input_needs_ffmpeg(tmp_path, monkeypatch):
+    source = tmp_path / "call.mp3"
+    source.write_bytes(b"ID3" + bytes(100))
+    monkeypatch.setattr(audio_preprocessing.shutil, "which", lambda name: None)
+    with pytest.raises(UnsupportedAudio, match="ffmpeg is not installed"):
+        preprocess_audio(source, tmp_path / "out.wav")
+    assert not (tmp_path / "out.wav").exists()
@@ -0,0 +1,75 @@
+import httpx
+
+from benchmark import FriendliStub, benchmark_config, compare, parse_args, summarize, synthetic_wav, wav_duration
+
+
+def stub(**overrides):
+    settings = dict(llm_latency=0, llm_jitter=0, llm_tokens=5, whisper_latency=0, whisper_latency_per_minute=0,
+                    words_per_second=2.0, seed=7)
+    settings.update(overrides)
+    return FriendliStub(**settings)
+
+
+def test_friendli_stub_answers_chat_and_transcription():
+    friendli = stub()
+    url = friendli.start()
+    try:
+        audio = synthetic_wav(12.0, seed=1)
+        assert wav_duration(audio) == 12.0
+        transcription = httpx.post(f"{url}/whisper", files={"file": ("a.wav", audio)}, data={"model": "whisper"}).json()
+        again = httpx.post(f"{url}/whisper", files={"file": ("b.wav", audio)}, data={"model": "whisper"}).json()
+        completion = httpx.post(f"{url}/v1/chat/completions", json={"messages": [{"role": "user", "content": "hi"}]}).json()
+    finally:
+        friendli.stop()
+
+    assert [(segment["start"], segment["end"]) for segment in transcription["segments"]] == [(0, 5), (5, 10), (10, 12)]
+    assert len(transcription["segments"][0]["text"].split()) == 10
+    # Same audio, same transcript: re-runs are reproducible
+    assert again["text"] == transcription["text"]
+    assert len(completion["choices"][0]["message"]["content"].split()) == 5
+    assert friendli.requests == {"llm": 1, "whisper": 2}
+
+
+def test_friendli_stub_injects_faults():
+    friendli = stub(error_rates={"llm": 1.0})
+    url = friendli.start()
+    try:
+        response = httpx.post(f"{url}/v1/chat/completions", json={"messages": []})
+    finally:
+        friendli.stop()
+    assert response.status_code == 503 and friendli.faults == {"error": 1, "stall": 0}
+
+
+def test_summarize_reports_percentiles_in_milliseconds():
+    stats = summarize([i / 1000 for i in range(1, 101)])
+    assert stats["count"] == 100 and stats["max"] == 100.0
+    assert stats["p50"] == 50.5 and stats["p99"] == 99.01
+    assert summarize([]) == {"count": 0}
+
+
+def result_with(p50, p95, count=50, throughput=10.0, errors=0):
+    return {
+        "upload": {"throughput_per_s": 1.0, "errors": 0, "stages": {}},
+        "ask": {"throughput_per_s": throughput, "errors": errors,
+                "stages": {"llm": {"count": count, "p50": p50, "p95": p95, "p99": p95, "max": p95}}}
+    }
+
+
+def test_compare_flags_only_slowdowns_beyond_tolerance():
+    baseline = result_with(p50=100.0, p95=200.0)
+    assert compare(result_with(p50=120.0, p95=250.0), baseline, tolerance=0.25, slack_ms=5.0) == []
+
+    regressions = compare(result_with(p50=140.0, p95=200.0, throughput=5.0, errors=1), baseline, tolerance=0.25, slack_ms=5.0)
+    assert regressions == [
+        "ask throughput 5.0/s < baseline 10.0/s",
+        "ask errors 1 > baseline 0",
+        "ask.llm p50 140.0ms > baseline 100.0ms (+25% + 5.0ms)",
+    ]
+    # A p95 over a handful of samples is not gated on
+    assert compare(result_with(p50=100.0, p95=900.0, count=5), result_with(p50=100.0, p95=200.0, count=5), 0.25, 5.0) == []
+
+
+def test_runs_without_fault_injection_match_older_baselines():
+    config = benchmark_config(parse_args([]))
+    assert "hedge" not in config and "llm_error_rate" not in config
+    assert benchmark_config(parse_args(["--hedge", "--llm-stall-rate", "0.1"]))["stall_seconds"] == 5.0
@@ -0,0 +1,68 @@
+import itertools
+
+from chunking import chunk_segments, count_tokens, format_transcript, iter_sentences, parse_transcript_segments
+
+SEGMENTS = [
+    {"start": 0.0, "end": 4.0, "text": "Welcome everyone. Let's review the launch."},
+    {"start": 4.0, "end": 10.0, "text": "Marketing needs the final copy by Friday. Ben will send it."},
+    {"start": 10.0, "end": 12.0, "text": "Any questions?"},
+]
+
+
+def test_sentences_get_times_interpolated_within_their_segment():
+    sentences = list(iter_sentences(SEGMENTS))
+    assert [sentence["text"] for sentence in sentences[:2]] == ["Welcome everyone.", "Let's review the launch."]
+    assert sentences[0]["start"] == 0.0 and sentences[1]["end"] == 4.0
+    # The first sentence ends where the second begins, a little under halfway through the segment
+    assert 1.5 < sentences[0]["end"] < sentences[1]["start"] < 2.0
+    assert [sentence["segment"] for sentence in sentences] == [0, 0, 1, 1, 2]
+
+
+def test_chunks_pack_whole_sentences_with_overlap_and_real_times():
+    chunks = list(chunk_segments(SEGMENTS, max_tokens=14, overlap_tokens=6))
+
+    assert [chunk["index"] for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert count_tokens(chunk["content"]) <= 14
+        assert chunk["content"].endswith((".", "?"))
+    assert chunks[0]["content"] == "Welcome everyone. Let's review the launch."
+    assert (chunks[0]["start"], chunks[0]["end"]) == (0.0, 4.0)
+    # "Ben will send it." closes one chunk and opens the next
+    assert chunks[-2]["content"].endswith("Ben will send it.")
+    assert chunks[-1]["content"] == "Ben will send it. Any questions?"
+    assert chunks[-1]["end"] == 12.0 and 4.0 < chunks[-1]["start"] < 10.0
+    assert (chunks[-1]["first_segment"], chunks[-1]["last_segment"]) == (1, 2)
+
+
+def test_overlong_sentence_is_split_into_timed_windows():
+    segment = {"start": 0.0, "end": 10.0, "text": " ".join(f"word{i}" for i in range(10))}
+    chunks = list(chunk_segments([segment], max_tokens=4, overlap_tokens=0))
+
+    assert [chunk["content"] for chunk in chunks] == ["word0 word1 word2 word3", "word4 word5 word6 word7", "word8 word9"]
+    assert [(chunk["start"], chunk["end"]) for chunk in chunks] == [(0.0, 4.0), (4.0, 8.0), (8.0, 10.0)]
+
+
+def test_chunking_streams_over_the_segments():
+    def endless():
+        for i in itertools.count():
+            yield {"start": float(i), "end": i + 1.0, "text": f"Sentence number {i} is here."}
+
+    first = next(chunk_segments(endless(), max_tokens=20, overlap_tokens=0))
+    assert first["start"] == 0.0 and first["content"].startswith("Sentence number 0")
+
+
+def test_transcript_file_round_trip():
+    segments = [
+        {"start": 0.5, "end": 3.25, "text": "Good morning.", "speaker": "Speaker 1"},
+        {"start": 3661.0, "end": 3662.5, "text": "One hour in."},
+    ]
+    text = format_transcript(segments)
+    assert "01:01:01,000 --> 01:01:02,500" in text
+    assert list(parse_transcript_segments(text.splitlines(keepends=True))) == segments
+
+    untimed = list(parse_transcript_segments(["First paragraph\n", "continues.\n", "\n", "Second.\n"]))
+    assert untimed == [
+        {"start": None, "end": None, "text": "First paragraph continues."},
+        {"start": None, "end": None, "text": "Second."},
+    ]
+    assert list(chunk_segments(untimed))[0]["start"] is None
@@ -0,0 +1,59 @@
+from context_assembly import answer_token_limit, select_contexts
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def hit(content, score, vector_score=None):
+    return {"content": content, "score": score, "vector_score": vector_score}
+
+
+def test_select_contexts_stays_within_the_token_budget():
+    hits = [
+        hit("one two three four five six", 0.9),
+        hit("seven eight nine ten eleven twelve thirteen", 0.8),
+        hit("fourteen fifteen", 0.7),
+    ]
+    selected = select_contexts(hits, token_budget=8, max_contexts=5, mmr_lambda=1.0, count_tokens=count_words)
+
+    # The second hit doesn't fit what is left; the shorter third one does
+    assert [context["content"] for context in selected] == ["one two three four five six", "fourteen fifteen"]
+    assert sum(context["tokens"] for context in selected) <= 8
+    # The best hit is kept even when it alone exceeds the budget
+    assert len(select_contexts(hits, token_budget=2, max_contexts=5, count_tokens=count_words)) == 1
+    assert len(select_contexts(hits, token_budget=100, max_contexts=2, count_tokens=count_words)) == 2
+
+
+def test_mmr_skips_near_duplicate_chunks():
+    hits = [
+        hit("Anna owns the launch plan for March", 0.95),
+        hit("Anna owns the launch plan for March too", 0.94),
+        hit("QA found a blocker in the beta build", 0.93),
+        hit("Lunch is on Friday", 0.50),
+    ]
+    relevance_only = select_contexts(hits, token_budget=100, max_contexts=2, mmr_lambda=1.0, count_tokens=count_words)
+    diverse = select_contexts(hits, token_budget=100, max_contexts=2, mmr_lambda=0.7, count_tokens=count_words)
+
+    assert [context["score"] for context in relevance_only] == [0.95, 0.94]
+    assert [context["score"] for context in diverse] == [0.95, 0.93]
+
+
+def test_low_vector_scores_and_exact_duplicates_are_dropped():
+    hits = [
+        hit("launch moved to March", 0.9, vector_score=0.82),
+        hit("launch moved to March", 0.85, vector_score=0.82),
+        hit("lunch is on Friday", 0.6, vector_score=0.4),
+        # Found by BM25 only: no vector score to judge it by
+        hit("the launch checklist", 0.5),
+    ]
+    selected = select_contexts(hits, token_budget=100, max_contexts=5, min_score=0.5, count_tokens=count_words)
+    assert [context["content"] for context in selected] == ["launch moved to March", "the launch checklist"]
+    assert select_contexts([hit("x", 1.0, vector_score=0.1)], 100, 5, min_score=0.5, count_tokens=count_words) == []
+
+
+def test_answer_token_limit_grows_with_context_and_open_questions():
+    assert answer_token_limit("Who owns QA?", 0, 64, 512) == 64
+    assert answer_token_limit("Who owns QA?", 400, 64, 512) == 164
+    assert answer_token_limit("Summarize the meeting", 400, 64, 512) == 328
+    assert answer_token_limit("Summarize the meeting", 4000, 64, 512) == 512
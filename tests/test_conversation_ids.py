@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from conversation_ids import InvalidConversationId, check_conversation_id, new_conversation_id
+from keyword_index import KeywordIndexStore
+from summaries import SummaryStore
+from vector_store import NumpyVectorStore
+
+UNSAFE_IDS = ["../outside", "..", "a/b", "notes.txt", "Upper", ""]
+
+
+def test_new_ids_are_safe():
+    for name in ["Weekly Sync", "../../tmp/x", "Q3 review: budget & hiring", "..."]:
+        check_conversation_id(new_conversation_id(name))
+
+
+@pytest.mark.parametrize("conversation_id", UNSAFE_IDS)
+def test_stores_reject_unsafe_ids(tmp_path, conversation_id):
+    vectors = NumpyVectorStore(tmp_path / "vectors")
+    keywords = KeywordIndexStore(tmp_path / "keyword_index")
+    summaries = SummaryStore(tmp_path / "summaries")
+    with pytest.raises(InvalidConversationId):
+        vectors.search(conversation_id, np.ones(4, dtype=np.float32))
+    with pytest.raises(InvalidConversationId):
+        keywords.search(conversation_id, "budget")
+    with pytest.raises(InvalidConversationId):
+        summaries.get(conversation_id)
+
+
+def test_endpoints_answer_unsafe_ids_with_400():
+    with TestClient(main.app) as client:
+        assert main.backends_ready.wait(10)
+        question = {"conversation_id": "../vectors/x", "question": "What was decided?"}
+        assert client.post("/ask-question", json=question).status_code == 400
+        assert client.post("/ask-question/stream", json=question).status_code == 400
+        batch = {"conversation_id": "../vectors/x", "questions": ["What was decided?"]}
+        assert client.post("/ask-questions", json=batch).status_code == 400
+        search = {"query": "budget", "conversation_ids": ["ok_id", "../../etc"]}
+        assert client.post("/search", json=search).status_code == 400
+        assert client.get("/conversations/notes.txt/transcript").status_code == 400
@@ -0,0 +1,75 @@
+import hashlib
+import io
+import os
+import wave
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import main
+from dedup import ContentIndex
+from jobs import JobQueue
+from test_jobs import wait_until_finished
+from uploads import save_upload
+
+
+def test_content_index_is_keyed_by_hash_and_signature(tmp_path):
+    index = ContentIndex(tmp_path / "jobs.db")
+    assert index.lookup("abc", "hashing:512", size=10) is None
+
+    index.record("abc", "hashing:512", "call_1", "call_1.wav", "call_1.txt", size=10)
+    assert index.lookup("abc", "hashing:512", size=10)["conversation_id"] == "call_1"
+    # An index built with other settings is never reused
+    assert index.lookup("abc", "openai:1536", size=10) is None
+
+    index.forget("abc", "hashing:512")
+    assert index.lookup("abc", "hashing:512") is None
+    assert index.stats() == {"hits": 1, "misses": 3, "bytes_saved": 10, "hit_rate": 0.25, "entries": 0}
+
+
+def test_save_upload_hashes_while_writing(tmp_path):
+    data = b"RIFF\x00\x00\x00\x00WAVE" + os.urandom(5000)
+    digest = save_upload(io.BytesIO(data), str(tmp_path / "call.upload"), chunk_size=1024)
+
+    assert (tmp_path / "call.upload").read_bytes() == data
+    assert digest.sha256 == hashlib.sha256(data).hexdigest()
+    assert digest.size == len(data) and digest.audio_format == "wav"
+
+
+def test_same_recording_uploaded_twice_is_transcribed_once(tmp_path, monkeypatch):
+    transcribed = []
+
+    def transcribe_file(file_path, on_stage=None):
+        transcribed.append(file_path)
+        segments = [{"start": 0.0, "end": 2.0, "text": "We ship in March."}, {"start": 2.0, "end": 4.0, "text": "Ben owns QA."}]
+        return "We ship in March. Ben owns QA.", segments
+
+    monkeypatch.setattr(main, "transcribe_file", transcribe_file)
+    monkeypatch.setattr(main, "job_queue", JobQueue(main.job_store, main.process_upload_job, max_workers=1))
+    wav_path = tmp_path / "call.wav"
+    with wave.open(str(wav_path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(np.random.default_rng().integers(-1000, 1000, 16000, dtype=np.int16).tobytes())
+
+    def upload(client, name):
+        with open(wav_path, "rb") as f:
+            body = client.post("/upload-audio", files={"file": ("call.wav", f)}, data={"conversation_name": name}).json()
+        assert wait_until_finished(main.job_store, body["job_id"])["stage"] == "completed"
+        return body
+
+    with TestClient(main.app) as client:
+        assert main.backends_ready.wait(10)
+        hits = main.content_index.stats()["hits"]
+        first = upload(client, "Planning")
+        second = upload(client, "Planning again")
+
+        assert first["duplicate_of"] is None
+        assert second["duplicate_of"] == first["conversation_id"]
+        assert len(transcribed) == 1
+        assert main.content_index.stats()["hits"] == hits + 1
+        # The new conversation has its own copy of the transcript and index
+        assert main.transcript_store.get(second["conversation_id"])["name"] == "Planning again"
+        assert main.vector_store.export(second["conversation_id"])[0] == main.vector_store.export(first["conversation_id"])[0]
+        assert client.get("/cache/stats").json()["dedup"]["hits"] == hits + 1
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from embeddings import Embedder, HashingEmbedder, QueryVectorCache, get_embedder
+from vector_store import WeaviateVectorStore
+
+
+class RecordingEmbedder(Embedder):
+    name = "recording"
+    dimension = 3
+    batch_size = 2
+
+    def __init__(self):
+        self.batches = []
+
+    def _embed_batch(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[len(text), 1.0, 0.0] for text in texts], dtype=np.float64)
+
+
+def test_embed_batches_and_normalizes():
+    embedder = RecordingEmbedder()
+    vectors = embedder.embed(["a", "bb", "ccc", "dddd", "e"])
+
+    assert embedder.batches == [["a", "bb"], ["ccc", "dddd"], ["e"]]
+    assert vectors.shape == (5, 3) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert embedder.embed([]).shape == (0, 3)
+    assert np.allclose(embedder.embed_query("ccc"), vectors[2])
+
+
+def test_hashing_embedder_is_deterministic_and_ranks_overlap_higher():
+    embedder = HashingEmbedder(dimension=256)
+    chunks = embedder.embed([
+        "We agreed to ship the mobile release in March.",
+        "Lunch is catered on Friday for the whole office.",
+    ])
+    query = HashingEmbedder(dimension=256).embed_query("When do we ship the mobile release?")
+
+    assert np.array_equal(chunks, embedder.embed([
+        "We agreed to ship the mobile release in March.",
+        "Lunch is catered on Friday for the whole office.",
+    ]))
+    scores = chunks @ query
+    assert scores[0] > scores[1]
+    # Text without any word tokens embeds to a zero vector instead of NaNs
+    assert not np.any(embedder.embed(["..."]))
+
+
+def test_get_embedder():
+    assert isinstance(get_embedder("hashing"), HashingEmbedder)
+    with pytest.raises(ValueError, match="Unknown embedder"):
+        get_embedder("word2vec")
+
+
+def test_weaviate_schema_expects_client_vectors():
+    created = []
+    schema = SimpleNamespace(get=lambda: {"classes": []}, create_class=created.append)
+    WeaviateVectorStore(SimpleNamespace(schema=schema)).setup_schema()
+
+    assert created[0]["vectorizer"] == "none"
+    assert "moduleConfig" not in created[0]
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dimension=64)
+        self.embedded = []
+
+    def _embed_batch(self, texts):
+        self.embedded.extend(texts)
+        return super()._embed_batch(texts)
+
+
+def test_query_vector_cache_embeds_each_normalized_question_once():
+    embedder = CountingEmbedder()
+    cache = QueryVectorCache(embedder, max_entries=2)
+
+    first = cache.embed_query("What were the action items?")
+    assert cache.embed_query("  what were the ACTION items ") is first
+    assert embedder.embedded == ["What were the action items?"]
+
+    vectors = cache.embed_queries(["Who owns the budget?", "what were the action items", "When is the launch?"])
+    assert vectors[1] is first
+    assert embedder.embedded[1:] == ["Who owns the budget?", "When is the launch?"]
+    # Bounded LRU: the least recently used question was evicted
+    assert cache.stats() == {"hits": 2, "misses": 3, "hit_rate": 0.4, "entries": 2}
+    cache.embed_query("What were the action items?")
+    assert len(embedder.embedded) == 4
+
+
+def test_query_vector_cache_persists_per_embedder(tmp_path):
+    path = str(tmp_path / "query_vectors.npz")
+    cache = QueryVectorCache(CountingEmbedder(), persist_path=path, persist_every=1)
+    vector = cache.embed_query("What was decided?")
+
+    reloaded = QueryVectorCache(CountingEmbedder(), persist_path=path)
+    assert np.array_equal(reloaded.embed_query("what was decided"), vector)
+    assert reloaded.embedder.embedded == []
+
+    # Vectors from another embedder configuration are not reused
+    other = QueryVectorCache(HashingEmbedder(dimension=32), persist_path=path)
+    assert other.stats()["entries"] == 0
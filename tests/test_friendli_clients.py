@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+
+from friendli_http import CONNECT_TIMEOUT, httpx_attempt_timeout
+from friendli_llm_api import AsyncFriendliLLMAPI
+from friendli_whisper_api import AsyncFriendliWhisperAPI
+from resilience import ResiliencePolicy
+
+
+class SlowEndpoint:
+    """MockTransport handler that answers after a delay and tracks requests in flight"""
+
+    def __init__(self, body, delay=0.02, status_code=200):
+        self.body = body
+        self.delay = delay
+        self.status_code = status_code
+        self.requests = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return httpx.Response(self.status_code, json=self.body)
+
+
+def test_llm_calls_share_the_client_and_respect_the_concurrency_limit():
+    endpoint = SlowEndpoint({"choices": [{"message": {"content": "Ben owns it."}}]})
+    ticks = []
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(endpoint)) as http_client:
+            client = AsyncFriendliLLMAPI(http_client, max_concurrency=2)
+            client.policy = ResiliencePolicy("test", max_retries=0)
+
+            async def ticker():
+                # Keeps running while the calls wait on the network: nothing blocks the loop
+                for _ in range(5):
+                    ticks.append(endpoint.in_flight)
+                    await asyncio.sleep(0.01)
+
+            results = await asyncio.gather(
+                *(client.generate_response(f"question {i}", system_prompt="Be brief") for i in range(6)),
+                ticker()
+            )
+            return results[:6]
+
+    results = asyncio.run(scenario())
+    assert [result["choices"][0]["message"]["content"] for result in results] == ["Ben owns it."] * 6
+    assert len(endpoint.requests) == 6 and endpoint.peak == 2
+    assert any(ticks)
+    assert endpoint.requests[0].headers["Authorization"] == "Bearer test"
+
+
+def test_llm_http_errors_are_reported():
+    endpoint = SlowEndpoint({"error": "overloaded"}, delay=0, status_code=400)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(endpoint)) as http_client:
+            client = AsyncFriendliLLMAPI(http_client)
+            client.policy = ResiliencePolicy("test", max_retries=0)
+            await client.generate_response("question")
+
+    with pytest.raises(Exception, match="(?s)Error calling Friendli LLM API.*overloaded"):
+        asyncio.run(scenario())
+
+
+def test_async_whisper_posts_the_audio_as_multipart(tmp_path):
+    endpoint = SlowEndpoint({"text": "hello there"}, delay=0)
+    audio_path = tmp_path / "call.mp3"
+    audio_path.write_bytes(b"ID3 audio bytes")
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(endpoint)) as http_client:
+            client = AsyncFriendliWhisperAPI(http_client)
+            client.policy = ResiliencePolicy("test", max_retries=0)
+            return await client.transcribe_audio(str(audio_path), language="en", response_format="verbose_json")
+
+    assert asyncio.run(scenario()) == {"text": "hello there"}
+    body = endpoint.requests[0].read()
+    assert b'filename="call.mp3"' in body and b"ID3 audio bytes" in body
+    assert b'name="response_format"' in body and b"verbose_json" in body
+
+
+def test_attempt_timeouts_never_outlive_the_deadline():
+    timeout = httpx_attempt_timeout(0.5)
+    assert timeout.read == 0.5 and timeout.connect == min(CONNECT_TIMEOUT, 0.5)
+    assert httpx_attempt_timeout(1e9).connect == CONNECT_TIMEOUT
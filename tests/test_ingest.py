@@ -0,0 +1,48 @@
+import pytest
+
+import ingest
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    import main
+
+    main.init_backends()
+    root = tmp_path / "archive"
+    transcripts_dir = root / "transcripts"
+    transcripts_dir.mkdir(parents=True)
+    monkeypatch.setattr(main, "TRANSCRIPTS_DIR", transcripts_dir)
+    (root / "notes").mkdir()
+    (root / "notes" / "planning.txt").write_text("We agreed to ship the beta in March.\n\nAnna owns the launch plan.")
+    (transcripts_dir / "standup_1234abcd.txt").write_text("The build is green again.")
+    return root, transcripts_dir
+
+
+def run_ingest(directory, *args):
+    return ingest.run(ingest.parse_args([str(directory), "--transcribe-workers", "1", "--index-workers", "1", *args]))
+
+
+def test_ingest_twice_is_idempotent(archive, capsys):
+    root, transcripts_dir = archive
+
+    assert run_ingest(root) == 0
+    first = sorted(path.name for path in transcripts_dir.glob("*.txt"))
+    # The app's own transcript keeps its id; the archived file gets one copy
+    assert "standup_1234abcd.txt" in first and len(first) == 2
+    assert "2 file(s) to ingest" in capsys.readouterr().out
+
+    assert run_ingest(root) == 0
+    assert sorted(path.name for path in transcripts_dir.glob("*.txt")) == first
+    assert "0 file(s) to ingest" in capsys.readouterr().out
+
+
+def test_ingest_transcripts_dir_does_not_grow(archive, tmp_path, capsys):
+    _, transcripts_dir = archive
+    manifest = tmp_path / "manifest.jsonl"
+
+    for _ in range(3):
+        assert run_ingest(transcripts_dir, "--manifest", str(manifest)) == 0
+    assert [path.name for path in transcripts_dir.glob("*.txt")] == ["standup_1234abcd.txt"]
+
+    import main
+    assert main.transcript_store.get("standup_1234abcd")["source"] == "ingest"
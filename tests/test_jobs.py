@@ -0,0 +1,120 @@
+import threading
+import time
+import wave
+
+from fastapi.testclient import TestClient
+
+import main
+from jobs import FINISHED_STAGES, JobQueue, JobStore
+
+
+def wait_until_finished(store, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = store.get(job_id)
+        if job["stage"] in FINISHED_STAGES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {store.get(job_id)['stage']}")
+
+
+def test_job_runs_through_its_stages(tmp_path):
+    store = JobStore(tmp_path / "jobs.db")
+    seen = []
+
+    def handler(job, context):
+        for stage in ("transcribing", "chunking", "indexing"):
+            context.stage(stage)
+            context.progress(0.5)
+            seen.append((stage, store.get(job["job_id"])["stage"]))
+
+    queue = JobQueue(store, handler, max_workers=1)
+    job = store.create("meeting_1", "Meeting", tmp_path / "meeting.wav")
+    assert job["stage"] == "queued" and job["progress"] == 0
+    queue.submit(job)
+
+    job = wait_until_finished(store, job["job_id"])
+    queue.shutdown()
+    assert seen == [("transcribing", "transcribing"), ("chunking", "chunking"), ("indexing", "indexing")]
+    assert job["stage"] == "completed" and job["progress"] == 1.0 and job["error"] is None
+    assert set(job["stage_timings"]) == {"transcribing", "chunking", "indexing"}
+    assert job["finished_at"] >= job["started_at"] >= job["created_at"]
+
+
+def test_failed_job_records_the_error_and_its_stage_timings(tmp_path):
+    store = JobStore(tmp_path / "jobs.db")
+
+    def handler(job, context):
+        context.stage("transcribing")
+        raise RuntimeError("transcription service unavailable")
+
+    queue = JobQueue(store, handler, max_workers=1)
+    job = store.create("meeting_1", "Meeting", "x.wav")
+    queue.submit(job)
+
+    job = wait_until_finished(store, job["job_id"])
+    queue.shutdown()
+    assert job["stage"] == "failed"
+    assert job["error"] == "transcription service unavailable"
+    assert "transcribing" in job["stage_timings"]
+
+
+def test_unfinished_jobs_resume_after_a_restart(tmp_path):
+    db_path = tmp_path / "jobs.db"
+    release = threading.Event()
+
+    # First process: the worker is stuck mid-job when the app goes away
+    store = JobStore(db_path)
+    stuck = JobQueue(store, lambda job, context: (context.stage("transcribing"), release.wait(5)), max_workers=1)
+    running = store.create("meeting_1", "Meeting", "a.wav")
+    stuck.submit(running)
+    waiting = store.create("meeting_2", "Other", "b.wav")
+    stuck.submit(waiting)
+    done = store.create("meeting_0", "Done", "c.wav")
+    store.update(done["job_id"], stage="completed", progress=1.0)
+
+    # Second process: only the two unfinished jobs run again, oldest first
+    handled = []
+    restarted = JobStore(db_path)
+    queue = JobQueue(restarted, lambda job, context: handled.append(job["conversation_id"]), max_workers=1)
+    assert queue.resume() == 2
+    for job in (running, waiting):
+        assert wait_until_finished(restarted, job["job_id"])["stage"] == "completed"
+    assert handled == ["meeting_1", "meeting_2"]
+    assert restarted.get(done["job_id"])["stage"] == "completed"
+
+    release.set()
+    stuck.shutdown()
+    queue.shutdown()
+
+
+def test_upload_returns_before_the_job_runs(tmp_path, monkeypatch):
+    release = threading.Event()
+
+    def handler(job, context):
+        context.stage("transcribing")
+        release.wait(5)
+
+    # A fresh queue: each TestClient lifespan shuts the module's queue down on exit
+    monkeypatch.setattr(main, "job_queue", JobQueue(main.job_store, handler, max_workers=1))
+    wav_path = tmp_path / "call.wav"
+    with wave.open(str(wav_path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(b"\x01\x00" * 1600)
+
+    with TestClient(main.app) as client:
+        assert main.backends_ready.wait(10)
+        with open(wav_path, "rb") as f:
+            response = client.post("/upload-audio", files={"file": ("call.wav", f)}, data={"conversation_name": "Call"})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["status"] == "queued" and body["conversation_id"].startswith("call_")
+
+        status = client.get(f"/jobs/{body['job_id']}").json()
+        assert status["conversation_id"] == body["conversation_id"]
+        assert status["stage"] in ("queued", "transcribing")
+        release.set()
+        assert wait_until_finished(main.job_store, body["job_id"])["stage"] == "completed"
+        assert client.get("/jobs/missing").status_code == 404
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+
+import pytest
+
+import main
+from keyword_index import BM25Index, KeywordIndexStore, reciprocal_rank_fusion
+
+
+@pytest.fixture
+def keyword_index(monkeypatch):
+    main.init_backends()
+    for conversation_id, contents in {
+        "kw_budget_a": ["The launch moved to March.", "Anna owns the launch plan."],
+        "kw_budget_b": ["The build is green again."],
+    }.items():
+        main.keyword_index.build(conversation_id, contents)
+    loads = []
+    get = main.keyword_index.get
+
+    def recording_get(conversation_id):
+        loads.append((conversation_id, threading.get_ident()))
+        return get(conversation_id)
+
+    monkeypatch.setattr(main.keyword_index, "get", recording_get)
+    return loads
+
+
+def test_conversation_keyword_search_runs_off_the_event_loop(keyword_index):
+    async def search():
+        loop_thread = threading.get_ident()
+        hit_lists = await main.search_conversation_many("kw_budget_a", ["launch plan", "March"], mode="keyword")
+        return loop_thread, hit_lists
+
+    loop_thread, hit_lists = asyncio.run(search())
+
+    assert [hits[0]["content"] for hits in hit_lists] == ["Anna owns the launch plan.", "The launch moved to March."]
+    # One load for both questions, in a worker thread
+    assert len(keyword_index) == 1 and keyword_index[0][1] != loop_thread
+
+
+def test_search_keyword_statistics_respect_the_time_budget(keyword_index, monkeypatch):
+    request = main.SearchRequest(query="launch", conversation_ids=["kw_budget_a", "kw_budget_b"], retrieval_mode="keyword")
+
+    monkeypatch.setattr(main, "SEARCH_TIME_BUDGET", -1.0)
+    result = asyncio.run(main.search(request))
+    assert keyword_index == []
+    assert result["truncated"] and result["conversations_searched"] == 0 and result["conversations_total"] == 2
+
+    monkeypatch.setattr(main, "SEARCH_TIME_BUDGET", 60.0)
+    result = asyncio.run(main.search(request))
+    assert not result["truncated"] and result["conversations_searched"] == 2
+    assert result["hits"][0]["conversation_id"] == "kw_budget_a"
+
+
+CHUNKS = [
+    "The launch moved to March because QA found a blocker.",
+    "QA signed off on the beta build.",
+    "Anna owns the launch plan and the launch checklist.",
+    "Lunch is on Friday.",
+]
+
+
+def test_bm25_ranks_rare_and_repeated_terms_first():
+    index = BM25Index.build(CHUNKS, spans=[(0.0, 5.0), (5.0, 9.0), (9.0, 14.0), (14.0, 16.0)])
+
+    assert [i for i, _ in index.search("launch checklist")] == [2, 0]
+    assert [i for i, _ in index.search("QA blocker")] == [0, 1]
+    assert index.search("what was it") == [] and index.search("xylophone") == []
+    assert index.hit(2, 1.5, "planning") == {
+        "content": CHUNKS[2], "conversation_id": "planning", "timestamp": 9.0, "end_timestamp": 14.0, "score": 1.5
+    }
+
+
+def test_appended_chunks_index_like_a_full_rebuild(tmp_path):
+    store = KeywordIndexStore(tmp_path)
+    store.build("planning", CHUNKS[:2])
+    store.build("planning", CHUNKS[1:], start=1)
+    rebuilt = BM25Index.build(CHUNKS)
+
+    for query in ("launch", "QA beta", "Friday lunch"):
+        assert [hit["content"] for hit in store.search("planning", query)] == [CHUNKS[i] for i, _ in rebuilt.search(query)]
+    with pytest.raises(ValueError):
+        store.build("planning", CHUNKS, start=9)
+
+
+def test_global_idf_makes_scores_comparable_across_conversations(tmp_path):
+    store = KeywordIndexStore(tmp_path)
+    store.build("mentions_everywhere", ["launch review", "launch dates", "launch owners"])
+    store.build("mentions_once", ["launch review", "budget plan", "hiring plan"])
+
+    # Within its own conversation "launch" is a common word, so a local IDF would rank the same chunk lower
+    local = [store.search(conversation_id, "launch review")[0]["score"] for conversation_id in ("mentions_everywhere", "mentions_once")]
+    assert local[0] < local[1]
+    idf = store.global_idf(["mentions_everywhere", "mentions_once"], "launch review")
+    shared = [store.search(conversation_id, "launch review", idf=idf)[0]["score"] for conversation_id in ("mentions_everywhere", "mentions_once")]
+    assert shared[0] == pytest.approx(shared[1])
+
+
+def test_reciprocal_rank_fusion_prefers_hits_found_by_both_retrievers():
+    def hits(*contents, conversation_id="c1"):
+        return [{"content": content, "conversation_id": conversation_id, "score": 1.0} for content in contents]
+
+    vector = hits("launch plan", "beta build", "march date")
+    keyword = hits("march date", "launch plan")
+    fused = reciprocal_rank_fusion([vector, keyword], limit=4)
+    assert [hit["content"] for hit in fused] == ["launch plan", "march date", "beta build"]
+    assert fused[0]["score"] == pytest.approx(1 / 61 + 1 / 62)
+
+    # A zero weight leaves a retriever out; equal text in another conversation is a different hit
+    assert [hit["content"] for hit in reciprocal_rank_fusion([vector, keyword], weights=[1.0, 0.0])] == ["launch plan", "beta build", "march date"]
+    assert len(reciprocal_rank_fusion([hits("same"), hits("same", conversation_id="c2")])) == 2
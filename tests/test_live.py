@@ -0,0 +1,104 @@
+import asyncio
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from live import LiveTranscriber
+
+SAMPLE_RATE = 1000
+BLOCK = SAMPLE_RATE // 10
+
+
+def speech(seconds):
+    """PCM where every 0.1 s block holds its own index, so a fake transcript can name the audio it heard"""
+    return np.repeat(np.arange(int(seconds * 10), dtype=np.int16), BLOCK).tobytes()
+
+
+def fake_whisper(split_seconds):
+    """Continuous speech: one segment up to split_seconds, then one running to the end of the window"""
+    async def transcribe(wav_bytes, file_name):
+        with wave.open(io.BytesIO(wav_bytes), "rb") as wav:
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        duration = len(samples) / SAMPLE_RATE
+        bounds = [0.0, split_seconds, duration] if duration > split_seconds else [0.0, duration]
+        segments = []
+        for start, end in zip(bounds, bounds[1:]):
+            blocks = samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)][::BLOCK]
+            segments.append({"start": start, "end": end, "text": " ".join(str(block) for block in blocks)})
+        return {"segments": segments}
+    return transcribe
+
+
+@pytest.mark.parametrize("split_seconds", [1.5, 5.0])
+def test_stream_without_silence_loses_no_audio(split_seconds):
+    finalized = []
+
+    async def on_segments(segments):
+        finalized.extend(segments)
+
+    async def run():
+        transcriber = LiveTranscriber(
+            fake_whisper(split_seconds), on_segments, sample_rate=SAMPLE_RATE, window_seconds=10.0, tail_seconds=2.0
+        )
+        runner = asyncio.create_task(transcriber.run())
+        pcm = speech(35)
+        for offset in range(0, len(pcm), 2 * SAMPLE_RATE):
+            await transcriber.feed(pcm[offset:offset + 2 * SAMPLE_RATE])
+        await transcriber.end()
+        await runner
+
+    asyncio.run(run())
+    heard = [int(block) for segment in finalized for block in segment["text"].split()]
+    # Every block exactly once, in order
+    assert heard == list(range(350))
+    assert all(earlier["end"] <= later["start"] for earlier, later in zip(finalized, finalized[1:]))
+
+
+def test_live_indexing_stores_only_new_chunks(monkeypatch):
+    import main
+
+    main.init_backends()
+    conversation_id = "live_append_test"
+    segments = [
+        {"start": i * 4.0, "end": i * 4.0 + 4.0, "text": f"Item {i} is about the {['budget', 'launch', 'hiring'][i % 3]} plan. We agreed on step {i}."}
+        for i in range(60)
+    ]
+    embedded = []
+    embed = main.embedder.embed
+    monkeypatch.setattr(main.embedder, "embed", lambda texts: embedded.append(len(texts)) or embed(texts))
+
+    main.transcript_store.save(conversation_id, [], source="live")
+    chunks = []
+    for end in range(3, len(segments) + 1, 3):
+        main.transcript_store.append(conversation_id, segments[end - 3:end])
+        main.index_live_segments(conversation_id, segments[:end], chunks)
+
+    assert len(chunks) > 5
+    # Each window embeds the chunk it extends and the ones it adds, never the whole transcript again
+    assert sum(embedded) < 2 * len(chunks) + len(embedded)
+    assert [chunk["index"] for chunk in chunks] == list(range(len(chunks)))
+    contents, vectors, spans = main.vector_store.export(conversation_id)
+    assert contents == [chunk["content"] for chunk in chunks] and len(vectors) == len(chunks)
+    assert spans == [(chunk["start"], chunk["end"]) for chunk in chunks]
+    assert [int(i) for i, _ in main.keyword_index.get(conversation_id).search("step 59", limit=1)] == [len(chunks) - 1]
+    assert chunks[-1]["last_segment"] == len(segments) - 1
+    assert main.transcript_store.chunk_segments(conversation_id, len(chunks) - 1)[-1]["text"] == segments[-1]["text"]
+
+
+def test_live_conversation_name_cannot_escape_the_transcripts_dir(tmp_path):
+    import main
+    from fastapi.testclient import TestClient
+
+    name = f"../../{tmp_path.name}/escaped"
+    with TestClient(main.app) as client:
+        assert main.backends_ready.wait(10)
+        with client.websocket_connect(f"/live?conversation_name={name}") as websocket:
+            conversation_id = websocket.receive_json()["conversation_id"]
+            websocket.send_text("end")
+            assert websocket.receive_json()["event"] == "completed"
+
+    assert conversation_id.rsplit("_", 1)[0] == f"{tmp_path.name.lower()}_escaped"
+    assert (main.TRANSCRIPTS_DIR / f"{conversation_id}.txt").exists()
+    assert not list(tmp_path.parent.glob("**/escaped*"))
@@ -0,0 +1,125 @@
+import json
+import logging
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+import main
+import metrics
+from friendli_llm_api import FriendliLLMAPI
+from metrics import Registry, time_stage
+from resilience import ResiliencePolicy
+from structured_logging import JsonFormatter, SamplingFilter, sampled
+
+
+def test_registry_renders_the_prometheus_text_format():
+    registry = Registry()
+    latency = registry.histogram("demo_seconds", "Demo latency", ["stage"], buckets=(0.1, 1.0))
+    errors = registry.counter("demo_errors_total", "Demo errors", ["route"])
+    registry.gauge("demo_entries", "Demo entries", lambda: 3)
+    registry.gauge("demo_broken", "Fails to collect", lambda: 1 / 0)
+    for value in (0.05, 0.5, 2.0):
+        latency.observe(value, stage="llm")
+    errors.inc(route='/say "hi"')
+
+    assert registry.render().splitlines() == [
+        "# HELP demo_seconds Demo latency",
+        "# TYPE demo_seconds histogram",
+        'demo_seconds_bucket{stage="llm",le="0.1"} 1',
+        'demo_seconds_bucket{stage="llm",le="1.0"} 2',
+        'demo_seconds_bucket{stage="llm",le="+Inf"} 3',
+        'demo_seconds_sum{stage="llm"} 2.55',
+        'demo_seconds_count{stage="llm"} 3',
+        "# HELP demo_errors_total Demo errors",
+        "# TYPE demo_errors_total counter",
+        'demo_errors_total{route="/say \\"hi\\""} 1',
+        "# HELP demo_entries Demo entries",
+        "# TYPE demo_entries gauge",
+        "demo_entries 3",
+    ]
+    with pytest.raises(ValueError):
+        registry.counter("demo_errors_total", "Registered twice")
+
+
+def test_time_stage_times_successes_and_counts_failures():
+    runs = metrics.STAGE_SECONDS.count(stage="test_stage")
+    errors = metrics.STAGE_ERRORS.value(stage="test_stage")
+    with time_stage("test_stage"):
+        pass
+    with pytest.raises(RuntimeError):
+        with time_stage("test_stage"):
+            raise RuntimeError("boom")
+
+    assert metrics.STAGE_SECONDS.count(stage="test_stage") == runs + 2
+    assert metrics.STAGE_ERRORS.value(stage="test_stage") == errors + 1
+
+
+def test_metrics_endpoint_labels_requests_by_route_template():
+    with TestClient(main.app) as client:
+        assert main.backends_ready.wait(10)
+        assert client.get("/jobs/does-not-exist").status_code == 404
+        response = client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'speakseek_http_requests_total{method="GET",route="/jobs/{job_id}",status="404"}' in body
+    assert "does-not-exist" not in body
+    assert "# TYPE speakseek_stage_seconds histogram" in body
+
+
+class Records(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class FakeAdapter(requests.adapters.BaseAdapter):
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"choices": []}'
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def test_llm_client_logs_no_secrets_or_prompts():
+    handler = Records()
+    logger = logging.getLogger("friendli_llm_api")
+    logger.addHandler(handler)
+    previous_level = logger.level
+    logger.setLevel(logging.DEBUG)
+    try:
+        client = FriendliLLMAPI()
+        client.session.mount("https://", FakeAdapter())
+        client.policy = ResiliencePolicy("test", max_retries=0)
+        client.generate_response("secret plans for the merger", system_prompt="Be brief")
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(previous_level)
+
+    assert handler.records
+    for record in handler.records:
+        line = JsonFormatter().format(record)
+        assert "Bearer" not in line and "secret plans" not in line
+    fields = json.loads(JsonFormatter().format(handler.records[0]))
+    assert fields["status_code"] == 200 and fields["prompt_chars"] == len("secret plans for the merger") + len("Be brief")
+
+
+def test_sampling_keeps_warnings_and_drops_sampled_debug_records():
+    sampling = SamplingFilter()
+
+    def record(level, extra):
+        return logging.makeLogRecord({"levelno": level, "levelname": logging.getLevelName(level), **extra})
+
+    assert not sampling.filter(record(logging.DEBUG, sampled(rate=0.0, stage="llm")))
+    assert sampling.filter(record(logging.WARNING, sampled(rate=0.0, stage="llm")))
+    assert sampling.filter(record(logging.DEBUG, {"stage": "llm"}))
+    line = json.loads(JsonFormatter().format(record(logging.INFO, {"msg": "done", "conversation_id": "c1"})))
+    assert line["conversation_id"] == "c1" and line["message"] == "done" and line["level"] == "info"
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from friendli_llm_api import AsyncFriendliLLMAPI
+from resilience import CircuitOpenError, ResiliencePolicy
+
+
+def half_open_policy():
+    policy = ResiliencePolicy("test", max_retries=0, failure_threshold=1, reset_seconds=0.01)
+    policy.breaker.record_failure()
+    time.sleep(0.02)
+    assert policy.stats()["circuit"] == "half_open"
+    return policy
+
+
+def test_cancelled_async_probe_is_released():
+    policy = half_open_policy()
+
+    async def scenario():
+        async def slow(timeout):
+            await asyncio.sleep(10)
+
+        probe = asyncio.ensure_future(policy.call_async(slow))
+        await asyncio.sleep(0.01)
+        # While the probe is in flight every other call is rejected
+        with pytest.raises(CircuitOpenError):
+            await policy.call_async(slow)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        async def fast(timeout):
+            return "ok"
+
+        return await policy.call_async(fast)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert policy.stats()["circuit"] == "closed"
+
+
+def test_interrupted_sync_probe_is_released():
+    policy = half_open_policy()
+
+    def interrupted(timeout):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        policy.call(interrupted)
+    # Neither a success nor a failure: still half-open, and the next call is admitted as the probe
+    assert policy.stats()["circuit"] == "half_open"
+    assert policy.call(lambda timeout: "ok") == "ok"
+    assert policy.stats()["circuit"] == "closed"
+
+
+def test_probe_failure_still_reopens_circuit():
+    policy = half_open_policy()
+
+    def failing(timeout):
+        raise TimeoutError("slow endpoint")
+
+    with pytest.raises(TimeoutError):
+        policy.call(failing)
+    assert policy.stats()["circuit"] == "open"
+
+
+def test_stream_closed_by_client_releases_probe():
+    body = b'data: {"choices": [{"delta": {"content": "Hello"}}]}\n\ndata: {"choices": [{"delta": {"content": " there"}}]}\n\ndata: [DONE]\n\n'
+
+    async def scenario():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+        async with httpx.AsyncClient(transport=transport) as http_client:
+            client = AsyncFriendliLLMAPI(http_client)
+            client.policy = half_open_policy()
+            stream = client.stream_response("question")
+            assert await stream.__anext__() == "Hello"
+            # What StreamingResponse does when the SSE client disconnects
+            await stream.aclose()
+            return client.policy
+
+    policy = asyncio.run(scenario())
+    assert policy.breaker.before_call() is True
@@ -0,0 +1,93 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from chunking import chunk_segments, parse_transcript_segments
+from transcript_store import TranscriptStore, import_transcripts
+
+SEGMENTS = [
+    {"start": 0.0, "end": 5.0, "text": "Good morning, let's start the planning meeting.", "speaker": "Speaker 1"},
+    {"start": 5.0, "end": 11.0, "text": "We are launching the mobile app in March."},
+    {"start": 11.0, "end": 17.5, "text": "Ben owns the QA budget for the launch."},
+    {"start": 17.5, "end": 20.0, "text": "Thanks everyone."},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TranscriptStore(tmp_path / "transcripts.db")
+    store.save("planning", SEGMENTS, chunks=list(chunk_segments(SEGMENTS, max_tokens=20, overlap_tokens=0)), name="Planning")
+    store.save("other", [{"start": 0.0, "end": 3.0, "text": "The launch party is on Friday."}])
+    return store
+
+
+def test_conversations_store_timed_segments_and_chunk_mapping(store):
+    conversation = store.get("planning")
+    assert (conversation["name"], conversation["segment_count"], conversation["duration"]) == ("Planning", 4, 20.0)
+    assert store.get("missing") is None
+    assert store.segments("planning")[0]["speaker"] == "Speaker 1"
+
+    # Range queries return the segments overlapping [start, end)
+    assert [segment["position"] for segment in store.segments("planning", start=6.0, end=12.0)] == [1, 2]
+    assert [segment["position"] for segment in store.segments("planning", start=17.5)] == [3]
+
+    assert [segment["position"] for segment in store.chunk_segments("planning", 1)] == [2, 3]
+
+    # Saving again replaces the whole transcript
+    store.save("planning", SEGMENTS[:1])
+    assert len(store.segments("planning")) == 1 and store.chunk_segments("planning", 1) == []
+    assert store.get("planning")["name"] == "Planning"
+
+
+def test_full_text_search_ranks_stemmed_matches_within_one_conversation(store):
+    assert store.full_text
+    hits = store.search("planning", "Who is launching the QA budget?")
+
+    assert [hit["position"] for hit in hits] == [2, 1]
+    assert hits[0]["score"] > hits[1]["score"]
+    assert all(hit["text"] != "The launch party is on Friday." for hit in hits)
+    # Only stop words: they are searched after all
+    assert {hit["position"] for hit in store.search("planning", "the")} == {0, 1, 2}
+    assert store.search("planning", "?!") == []
+
+
+def test_like_fallback_without_fts5(store):
+    store.full_text = False
+    hits = store.search("planning", "Who owns the QA budget?")
+    assert [hit["position"] for hit in hits] == [2]
+    assert hits[0]["score"] == 3.0
+
+
+def test_append_copy_delete_and_import(store, tmp_path):
+    store.append("other", [{"start": 3.0, "end": 6.5, "text": "Bring snacks."}])
+    assert [segment["position"] for segment in store.segments("other")] == [0, 1]
+    assert store.get("other")["duration"] == 6.5
+    assert store.search("other", "snacks")[0]["position"] == 1
+
+    assert store.copy("planning", "planning_copy", name="Copy")
+    assert store.get("planning_copy")["source"] == "copy"
+    assert store.segments("planning_copy") == store.segments("planning")
+    assert not store.copy("missing", "nothing")
+
+    store.delete("planning_copy")
+    assert store.get("planning_copy") is None and store.search("planning_copy", "launch") == []
+
+    (tmp_path / "standup.txt").write_text("00:00:00,000 --> 00:00:04,000 [Speaker 2]\nThe deploy is blocked.\n")
+    (tmp_path / "planning.txt").write_text("already stored\n")
+    assert import_transcripts(store, tmp_path, parse_transcript_segments) == 1
+    assert store.search("standup", "deploy")[0]["speaker"] == "Speaker 2"
+    assert store.stats() == {"conversations": 3, "segments": 7, "full_text": True}
+
+
+def test_questions_without_retrieved_contexts_fall_back_to_the_transcript():
+    main.init_backends()
+    main.transcript_store.save("fallback_meeting", SEGMENTS, name="Fallback")
+    assert main.transcript_contexts("fallback_meeting", "Who owns the QA budget?")[0] == SEGMENTS[2]["text"]
+    # No word matches: the opening of the transcript
+    assert main.transcript_contexts("fallback_meeting", "xylophone")[0] == SEGMENTS[0]["text"]
+
+    with TestClient(main.app) as client:
+        assert main.backends_ready.wait(10)
+        response = client.get("/conversations/fallback_meeting/transcript", params={"start": 10, "end": 18})
+        assert [segment["position"] for segment in response.json()["segments"]] == [1, 2, 3]
+        assert client.get("/conversations/nobody/transcript").status_code == 404
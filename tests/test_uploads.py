@@ -0,0 +1,60 @@
+import asyncio
+import wave
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from uploads import ResumableUploads, UploadCompleted
+
+
+async def body(data):
+    yield data
+
+
+def test_concurrent_finalize_completes_once(tmp_path):
+    uploads = ResumableUploads(tmp_path / "parts", max_bytes=1024)
+    session = uploads.create("call.wav", "Call", 5)
+
+    async def run():
+        await uploads.append(session["upload_id"], 0, body(b"audio"))
+        return await asyncio.gather(
+            uploads.complete(session["upload_id"], str(tmp_path / "first.upload")),
+            uploads.complete(session["upload_id"], str(tmp_path / "second.upload")),
+            return_exceptions=True
+        )
+
+    first, second = asyncio.run(run())
+    assert first.size == 5 and (tmp_path / "first.upload").read_bytes() == b"audio"
+    assert isinstance(second, UploadCompleted) and not (tmp_path / "second.upload").exists()
+    assert uploads.get(session["upload_id"])["completed_at"]
+
+    with pytest.raises(UploadCompleted):
+        asyncio.run(uploads.append(session["upload_id"], 5, body(b"")))
+    with pytest.raises(KeyError):
+        asyncio.run(uploads.complete("missing", str(tmp_path / "missing.upload")))
+
+
+def test_finalize_twice_over_http(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "queue_uploaded_audio", lambda name, conversation_id, path, digest: {
+        "conversation_id": conversation_id, "status": "queued", "message": "queued"
+    })
+    wav_path = tmp_path / "call.wav"
+    with wave.open(str(wav_path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(b"\x00\x00" * 1600)
+    data = wav_path.read_bytes()
+
+    with TestClient(main.app) as client:
+        assert main.backends_ready.wait(10)
+        upload_id = client.post("/uploads", json={"filename": "call.wav", "conversation_name": "Call", "size": len(data)}).json()["upload_id"]
+        assert client.patch(f"/uploads/{upload_id}", content=data, headers={"Upload-Offset": "0"}).status_code == 200
+
+        assert client.post(f"/uploads/{upload_id}/finalize").status_code == 200
+        again = client.post(f"/uploads/{upload_id}/finalize")
+        assert again.status_code == 409 and "already finalized" in again.json()["detail"]
+        assert client.patch(f"/uploads/{upload_id}", content=b"", headers={"Upload-Offset": str(len(data))}).status_code == 409
+        assert client.get(f"/uploads/{upload_id}").json()["completed_at"]
+        assert client.post("/uploads/missing/finalize").status_code == 404
@@ -0,0 +1,186 @@
+import re
+from types import SimpleNamespace
+
+import numpy as np
+from weaviate.gql.query import Query
+
+from vector_store import NumpyVectorStore, VectorStore, WeaviateVectorStore
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, body):
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class FakeConnection:
+    """Records GraphQL queries and answers each aliased query with one hit"""
+
+    server_version = "1.22.0"
+    grpc_stub = None
+
+    def __init__(self):
+        self.queries = []
+
+    def post(self, path, weaviate_object, params=None):
+        query = weaviate_object["query"]
+        self.queries.append(query)
+        aliases = re.findall(r"(\w+)\s*:\s*AudioTranscript", query) or ["AudioTranscript"]
+        return FakeResponse({"data": {"Get": {
+            alias: [{
+                "content": f"chunk for {alias}",
+                "conversation_id": "meeting",
+                "timestamp": 1.0,
+                "end_timestamp": 2.0,
+                "_additional": {"distance": 0.25}
+            }]
+            for alias in aliases
+        }}})
+
+
+def weaviate_store():
+    connection = FakeConnection()
+    return WeaviateVectorStore(SimpleNamespace(query=Query(connection))), connection
+
+
+def test_weaviate_search_many_sends_one_request():
+    store, connection = weaviate_store()
+    vectors = np.eye(3, dtype=np.float32)
+    results = store.search_many("meeting", vectors, limit=2)
+
+    assert len(connection.queries) == 1
+    query = connection.queries[0]
+    assert query.count("nearVector") == 3
+    assert query.count('valueString: "meeting"') == 3
+    assert [hits[0]["content"] for hits in results] == ["chunk for q0", "chunk for q1", "chunk for q2"]
+    assert results[0][0]["score"] == 0.75
+    assert results[0][0]["end_timestamp"] == 2.0
+
+
+def test_weaviate_search_many_single_and_empty():
+    store, connection = weaviate_store()
+    assert store.search_many("meeting", []) == []
+    results = store.search_many("meeting", [np.ones(3, dtype=np.float32)])
+    assert len(results) == 1 and results[0][0]["content"] == "chunk for AudioTranscript"
+    assert len(connection.queries) == 1
+
+
+def test_weaviate_search_many_failed_query_returns_no_hits():
+    store, connection = weaviate_store()
+    connection.post = lambda path, weaviate_object, params=None: FakeResponse({"errors": [{"message": "boom"}]})
+    assert store.search_many("meeting", np.eye(2, dtype=np.float32)) == [[], []]
+
+
+def test_base_search_many_loops_over_search():
+    class OneHitStore(VectorStore):
+        def search(self, conversation_id, query_vector, limit=3):
+            return [{"content": str(float(query_vector[0])), "score": 1.0}]
+
+    results = OneHitStore().search_many("meeting", [np.array([1.0]), np.array([2.0])])
+    assert [hits[0]["content"] for hits in results] == ["1.0", "2.0"]
+
+
+def test_numpy_search_many_matches_search(tmp_path):
+    store = NumpyVectorStore(tmp_path)
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(20, 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    store.add("meeting", [f"chunk {i}" for i in range(20)], vectors)
+
+    queries = rng.normal(size=(4, 8)).astype(np.float32)
+    batched = store.search_many("meeting", queries, limit=5)
+    for query, hits in zip(queries, batched):
+        assert [hit["content"] for hit in hits] == [hit["content"] for hit in store.search("meeting", query, limit=5)]
+
+
+class InMemoryWeaviate:
+    """Just enough of the v3 client for WeaviateVectorStore.add, export and delete"""
+
+    def __init__(self):
+        self.objects = {}
+        self.batch = self
+        self.query = self
+
+    # client.batch
+    def configure(self, **kwargs):
+        self._callback = kwargs.get("callback")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def add_data_object(self, data_object, class_name, uuid, vector):
+        self.objects[uuid] = {**data_object, "_additional": {"id": uuid, "vector": vector}}
+
+    def delete_objects(self, class_name, where):
+        self.objects = {uuid: item for uuid, item in self.objects.items() if not self._matches(item, where)}
+
+    @classmethod
+    def _matches(cls, item, where):
+        if where.get("operator") == "Or":
+            return any(cls._matches(item, operand) for operand in where["operands"])
+        field = item["_additional"]["id"] if where["path"] == ["id"] else item.get(where["path"][0])
+        return field == where["valueString"]
+
+    # client.query
+    def aggregate(self, class_name):
+        return InMemoryQuery(self, aggregate=True)
+
+    def get(self, class_name, properties):
+        return InMemoryQuery(self, aggregate=False)
+
+
+class InMemoryQuery:
+    def __init__(self, client, aggregate):
+        self.client = client
+        self.aggregate = aggregate
+        self.where = None
+        self.offset = 0
+        self.limit = None
+
+    def with_where(self, where):
+        self.where = where
+        return self
+
+    def with_meta_count(self):
+        return self
+
+    def with_additional(self, fields):
+        return self
+
+    def with_limit(self, limit):
+        self.limit = limit
+        return self
+
+    def with_offset(self, offset):
+        self.offset = offset
+        return self
+
+    def do(self):
+        items = [item for item in self.client.objects.values() if InMemoryWeaviate._matches(item, self.where)]
+        if self.aggregate:
+            return {"data": {"Aggregate": {"AudioTranscript": [{"meta": {"count": len(items)}}]}}}
+        return {"data": {"Get": {"AudioTranscript": items[self.offset:self.offset + self.limit]}}}
+
+
+def test_weaviate_readding_fewer_chunks_removes_the_stale_tail():
+    client = InMemoryWeaviate()
+    store = WeaviateVectorStore(client)
+    store.add("meeting", [f"old {i}" for i in range(5)], np.eye(5, dtype=np.float32))
+    store.add("other", ["kept"], np.eye(1, 5, dtype=np.float32))
+
+    store.add("meeting", ["new 0", "new 1"], np.eye(2, 5, dtype=np.float32))
+
+    chunks, vectors, _ = store.export("meeting")
+    assert chunks == ["new 0", "new 1"] and vectors.shape == (2, 5)
+    assert store.export("other")[0] == ["kept"]
+
+    # Appending from a position keeps the chunks before it
+    store.add("meeting", ["new 1 longer", "new 2"], np.eye(2, 5, dtype=np.float32), start=1)
+    assert store.export("meeting")[0] == ["new 0", "new 1 longer", "new 2"]
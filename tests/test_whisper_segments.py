@@ -0,0 +1,107 @@
+import inspect
+import time
+import wave
+
+import numpy as np
+import pytest
+
+import friendli_whisper_api
+from audio_preprocessing import FRAME_MS, preprocess_audio
+from friendli_whisper_api import AsyncFriendliWhisperAPI, FriendliWhisperAPI, plan_segments, read_wav_span
+
+
+def speech_levels(seconds, silences):
+    """Frame levels of speech at -20 dBFS with silent (seconds, seconds) stretches"""
+    levels = np.full(int(seconds * 1000 / FRAME_MS), 0.1, dtype=np.float32)
+    for start, end in silences:
+        levels[int(start * 1000 / FRAME_MS):int(end * 1000 / FRAME_MS)] = 0.0005
+    return levels
+
+
+def test_plan_segments_cuts_in_silences():
+    levels = speech_levels(100, [(28, 29), (61, 62), (90, 90.2)])
+    spans = plan_segments(levels, 100_000, target_ms=30_000)
+
+    assert spans[0][0] == 0 and spans[-1][1] == 100_000
+    assert all(end == next_start for (_, end), (next_start, _) in zip(spans, spans[1:]))
+    # Cuts fall in the middle of the silences (to the frame); the 200 ms pause is too short to cut at
+    assert [start for start, _ in spans[1:]] == pytest.approx([28_500, 61_500], abs=FRAME_MS)
+
+
+def test_plan_segments_never_exceeds_max_without_silence():
+    spans = plan_segments(speech_levels(200, []), 200_000, target_ms=30_000)
+    assert max(end - start for start, end in spans) <= 45_000
+    assert spans[-1][1] == 200_000
+
+
+def test_plan_segments_is_fast_for_an_hour():
+    levels = speech_levels(3600, [(t, t + 0.8) for t in range(20, 3600, 25)])
+    started = time.perf_counter()
+    spans = plan_segments(levels, 3_600_000)
+    assert time.perf_counter() - started < 0.5
+    assert len(spans) > 100
+
+
+def write_wav(path, seconds, silences, sample_rate=16000):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = 0.3 * np.sin(2 * np.pi * 220 * t)
+    for start, end in silences:
+        samples[int(start * sample_rate):int(end * sample_rate)] = 0.0
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes((samples * 32767).astype("<i2").tobytes())
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("FRIENDLI_WHISPER_SEGMENT_SECONDS", "20")
+    client = FriendliWhisperAPI()
+    calls = []
+
+    def fake_segment(audio_bytes, file_name, offset_seconds, language=None, prompt=None):
+        calls.append((file_name, offset_seconds, len(audio_bytes)))
+        return {"text": file_name, "segments": [{"start": offset_seconds, "end": offset_seconds + 1, "text": file_name}]}
+
+    monkeypatch.setattr(client, "_transcribe_segment", fake_segment)
+    client.calls = calls
+    return client
+
+
+def test_segmented_transcription_reuses_preprocessing_levels(tmp_path, client, monkeypatch):
+    source = tmp_path / "meeting.wav"
+    write_wav(source, 70, [(18, 19), (41, 43)])
+    report = preprocess_audio(source, tmp_path / "meeting.preprocessed.wav")
+
+    def no_decoding(path):
+        raise AssertionError("the recording was decoded again")
+
+    monkeypatch.setattr(friendli_whisper_api, "audio_levels", no_decoding)
+    result = client.transcribe_audio_segmented(tmp_path / "meeting.preprocessed.wav", levels=report["levels"])
+
+    offsets = sorted(offset for _, offset, _ in client.calls)
+    assert len(offsets) == 3 and offsets[0] == 0.0
+    assert result["duration"] == pytest.approx(report["output_seconds"], abs=0.01)
+    assert [segment["start"] for segment in result["segments"]] == offsets
+
+
+def test_segmented_transcription_measures_levels_when_not_given(tmp_path, client):
+    source = tmp_path / "meeting.wav"
+    write_wav(source, 45, [(19, 20)])
+    result = client.transcribe_audio_segmented(source)
+    assert sorted(offset for _, offset, _ in client.calls) == [0.0, 19.5]
+    assert result["duration"] == 45.0
+
+
+def test_read_wav_span(tmp_path):
+    source = tmp_path / "clip.wav"
+    write_wav(source, 2, [])
+    span = tmp_path / "span.wav"
+    span.write_bytes(read_wav_span(source, 500, 1250))
+    with wave.open(str(span)) as wav:
+        assert wav.getnframes() == 12_000 and wav.getframerate() == 16000
+
+
+def test_async_transcribe_audio_matches_parent_signature():
+    assert inspect.signature(AsyncFriendliWhisperAPI.transcribe_audio) == inspect.signature(FriendliWhisperAPI.transcribe_audio)
@@ -0,0 +1,374 @@
+"""
+Structured transcript store
+
+One SQLite database (WAL mode) holds, for every conversation:
+
+- a conversations row: name, source (upload, ingest, live, copy), duration
+  and segment count
+- its timed segments, in order, indexed by start time for range queries
+- the chunk -> segment mapping of the indexed chunks, so a retrieved chunk
+  can be traced back to the exact segments (and audio) it came from
+- an FTS5 full-text index over segment text (porter stemming), used when
+  retrieval has nothing for a question
+
+Writes go through one connection under a lock and commit per conversation,
+so a transcript is always stored or replaced as a whole. Every thread reads
+through its own connection; with WAL, readers never wait for a writer.
+SQLite builds without FTS5 fall back to a LIKE scan of the conversation's
+segments.
+
+The .txt transcripts in the transcripts directory are still written as a
+readable export; `import_transcripts` backfills conversations that only
+exist as .txt files.
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+QUERY_TERM = re.compile(r"\w+")
+
+# Words too common to make a full-text match meaningful
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from had has have how i in is it its of on or said say says "
+    "that the their there this to was were what when where which who why will with you".split()
+)
+
+
+class TranscriptStore:
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conn = self._connect()
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS conversations (
+                    conversation_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    source TEXT,
+                    duration REAL,
+                    segment_count INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS segments (
+                    segment_id INTEGER PRIMARY KEY,
+                    conversation_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    start_seconds REAL,
+                    end_seconds REAL,
+                    speaker TEXT,
+                    text TEXT NOT NULL,
+                    UNIQUE (conversation_id, position)
+                );
+                CREATE INDEX IF NOT EXISTS segments_by_time ON segments (conversation_id, start_seconds);
+                CREATE TABLE IF NOT EXISTS chunks (
+                    conversation_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    first_segment INTEGER NOT NULL,
+                    last_segment INTEGER NOT NULL,
+                    start_seconds REAL,
+                    end_seconds REAL,
+                    PRIMARY KEY (conversation_id, position)
+                ) WITHOUT ROWID;
+                """
+            )
+            self.full_text = self._create_full_text_index()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Durable at checkpoints; a crash can lose the last commits but never corrupts the database
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _create_full_text_index(self):
+        try:
+            self._conn.executescript(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+                    conversation_id, text, content='segments', content_rowid='segment_id', tokenize='porter unicode61'
+                );
+                CREATE TRIGGER IF NOT EXISTS segments_fts_insert AFTER INSERT ON segments BEGIN
+                    INSERT INTO segments_fts (rowid, conversation_id, text) VALUES (new.segment_id, new.conversation_id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS segments_fts_delete AFTER DELETE ON segments BEGIN
+                    INSERT INTO segments_fts (segments_fts, rowid, conversation_id, text)
+                    VALUES ('delete', old.segment_id, old.conversation_id, old.text);
+                END;
+                """
+            )
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning("SQLite has no FTS5, transcript search falls back to LIKE: %s", e)
+            return False
+
+    def _reader(self):
+        """This thread's read connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @staticmethod
+    def _segment_rows(conversation_id, segments, first_position=0):
+        for position, segment in enumerate(segments, first_position):
+            yield (
+                conversation_id, position, segment.get("start"), segment.get("end"),
+                segment.get("speaker"), (segment.get("text") or "").strip()
+            )
+
+    @staticmethod
+    def _chunk_rows(conversation_id, chunks, first_position=0):
+        for position, chunk in enumerate(chunks, first_position):
+            if chunk.get("first_segment") is None:
+                continue
+            yield (
+                conversation_id, position, chunk["first_segment"], chunk["last_segment"],
+                chunk.get("start"), chunk.get("end")
+            )
+
+    @staticmethod
+    def _duration(segments):
+        ends = [segment["end"] for segment in segments if segment.get("end") is not None]
+        return max(ends) if ends else None
+
+    def save(self, conversation_id, segments, chunks=None, name=None, source=None):
+        """
+        Store a conversation's transcript, replacing any earlier version, in one transaction
+
+        Args:
+            segments (list): Segments ({"start", "end", "text", optional "speaker"}) in order
+            chunks (list, optional): Indexed chunks with "first_segment" / "last_segment" (see chunking.chunk_segments)
+            name (str, optional): Conversation name
+            source (str, optional): Where the transcript came from ("upload", "ingest", "live", ...)
+        """
+        segments = list(segments)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM segments WHERE conversation_id = ?", (conversation_id,))
+            self._conn.execute("DELETE FROM chunks WHERE conversation_id = ?", (conversation_id,))
+            self._conn.execute(
+                "INSERT INTO conversations (conversation_id, name, source, duration, segment_count, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (conversation_id) DO UPDATE SET "
+                "name = COALESCE(excluded.name, name), source = COALESCE(excluded.source, source), "
+                "duration = excluded.duration, segment_count = excluded.segment_count, updated_at = excluded.updated_at",
+                (conversation_id, name, source, self._duration(segments), len(segments), now, now)
+            )
+            self._conn.executemany(
+                "INSERT INTO segments (conversation_id, position, start_seconds, end_seconds, speaker, text) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self._segment_rows(conversation_id, segments)
+            )
+            if chunks:
+                self._conn.executemany(
+                    "INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?)", self._chunk_rows(conversation_id, chunks)
+                )
+
+    def append(self, conversation_id, segments):
+        """Add segments after the ones already stored (live transcription)"""
+        segments = list(segments)
+        if not segments:
+            return
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS n FROM segments WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+            self._conn.executemany(
+                "INSERT INTO segments (conversation_id, position, start_seconds, end_seconds, speaker, text) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self._segment_rows(conversation_id, segments, row["n"])
+            )
+            self._conn.execute(
+                "UPDATE conversations SET segment_count = ?, duration = MAX(COALESCE(duration, 0), COALESCE(?, 0)), "
+                "updated_at = ? WHERE conversation_id = ?",
+                (row["n"] + len(segments), self._duration(segments), time.time(), conversation_id)
+            )
+
+    def save_chunks(self, conversation_id, chunks, start=0):
+        """Replace the chunk -> segment mapping of a conversation from chunk position start on"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE conversation_id = ? AND position >= ?", (conversation_id, start))
+            self._conn.executemany(
+                "INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?)", self._chunk_rows(conversation_id, chunks, start)
+            )
+
+    def copy(self, source_id, conversation_id, name=None):
+        """
+        Copy a conversation's segments and chunk mapping inside the database
+
+        Returns:
+            bool: Whether the source conversation exists
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            copied = self._conn.execute(
+                "INSERT OR REPLACE INTO conversations "
+                "SELECT ?, COALESCE(?, name), 'copy', duration, segment_count, ?, ? FROM conversations WHERE conversation_id = ?",
+                (conversation_id, name, now, now, source_id)
+            ).rowcount
+            if not copied:
+                return False
+            self._conn.execute("DELETE FROM segments WHERE conversation_id = ?", (conversation_id,))
+            self._conn.execute("DELETE FROM chunks WHERE conversation_id = ?", (conversation_id,))
+            self._conn.execute(
+                "INSERT INTO segments (conversation_id, position, start_seconds, end_seconds, speaker, text) "
+                "SELECT ?, position, start_seconds, end_seconds, speaker, text FROM segments "
+                "WHERE conversation_id = ? ORDER BY position",
+                (conversation_id, source_id)
+            )
+            self._conn.execute(
+                "INSERT INTO chunks SELECT ?, position, first_segment, last_segment, start_seconds, end_seconds "
+                "FROM chunks WHERE conversation_id = ?",
+                (conversation_id, source_id)
+            )
+        return True
+
+    def delete(self, conversation_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM segments WHERE conversation_id = ?", (conversation_id,))
+            self._conn.execute("DELETE FROM chunks WHERE conversation_id = ?", (conversation_id,))
+            self._conn.execute("DELETE FROM conversations WHERE conversation_id = ?", (conversation_id,))
+
+    def get(self, conversation_id):
+        """
+        Returns:
+            dict: The conversation's metadata, or None if it is not stored
+        """
+        row = self._reader().execute(
+            "SELECT * FROM conversations WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def conversation_ids(self):
+        return {row[0] for row in self._reader().execute("SELECT conversation_id FROM conversations")}
+
+    @staticmethod
+    def _segment(row):
+        segment = {
+            "position": row["position"],
+            "start": row["start_seconds"],
+            "end": row["end_seconds"],
+            "text": row["text"]
+        }
+        if row["speaker"]:
+            segment["speaker"] = row["speaker"]
+        return segment
+
+    def segments(self, conversation_id, start=None, end=None, limit=None):
+        """
+        Segments in order, optionally only those overlapping [start, end) seconds
+
+        Untimed segments are only returned when no time range is given.
+        """
+        query = "SELECT * FROM segments WHERE conversation_id = ?"
+        params = [conversation_id]
+        if start is not None:
+            query += " AND end_seconds > ?"
+            params.append(start)
+        if end is not None:
+            query += " AND start_seconds < ?"
+            params.append(end)
+        query += " ORDER BY position"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [self._segment(row) for row in self._reader().execute(query, params)]
+
+    def chunk_segments(self, conversation_id, chunk_position):
+        """The segments an indexed chunk was cut from"""
+        rows = self._reader().execute(
+            "SELECT s.* FROM chunks c JOIN segments s ON s.conversation_id = c.conversation_id "
+            "AND s.position BETWEEN c.first_segment AND c.last_segment "
+            "WHERE c.conversation_id = ? AND c.position = ? ORDER BY s.position",
+            (conversation_id, chunk_position)
+        )
+        return [self._segment(row) for row in rows]
+
+    def text(self, conversation_id):
+        return " ".join(segment["text"] for segment in self.segments(conversation_id))
+
+    def search(self, conversation_id, query, limit=5):
+        """
+        Full-text search over one conversation's segments
+
+        Query words are OR-ed together and ranked by BM25 (stop words are
+        dropped unless nothing else is left).
+
+        Returns:
+            list: Segments with a "score" (higher is better), best first
+        """
+        terms = [term for term in QUERY_TERM.findall(query.lower())]
+        terms = [term for term in terms if term not in STOPWORDS] or terms
+        if not terms:
+            return []
+        if not self.full_text:
+            return self._search_like(conversation_id, terms, limit)
+        match = 'conversation_id : "{}" AND ({})'.format(
+            conversation_id.replace('"', '""'), " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+        )
+        rows = self._reader().execute(
+            "SELECT s.*, bm25(segments_fts) AS rank FROM segments_fts JOIN segments s ON s.segment_id = segments_fts.rowid "
+            "WHERE segments_fts MATCH ? AND s.conversation_id = ? ORDER BY rank LIMIT ?",
+            (match, conversation_id, limit)
+        )
+        # bm25() is lower for better matches
+        return [{**self._segment(row), "score": -row["rank"]} for row in rows]
+
+    def _search_like(self, conversation_id, terms, limit):
+        clauses = " OR ".join("text LIKE ?" for _ in terms)
+        rows = self._reader().execute(
+            f"SELECT * FROM segments WHERE conversation_id = ? AND ({clauses})",
+            [conversation_id] + [f"%{term}%" for term in terms]
+        ).fetchall()
+        scored = [
+            {**self._segment(row), "score": float(sum(term in row["text"].lower() for term in terms))}
+            for row in rows
+        ]
+        scored.sort(key=lambda segment: (-segment["score"], segment["position"]))
+        return scored[:limit]
+
+    def stats(self):
+        conn = self._reader()
+        return {
+            "conversations": conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0],
+            "segments": conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0],
+            "full_text": self.full_text
+        }
+
+
+def import_transcripts(store, transcripts_dir, parse_segments, chunk_segments=None):
+    """
+    Backfill conversations that only exist as <conversation_id>.txt files
+
+    Args:
+        store (TranscriptStore): The store to fill
+        transcripts_dir (Path): Directory of .txt transcripts
+        parse_segments (callable): Lines of a transcript file -> segments
+        chunk_segments (callable, optional): Segments -> indexed chunks, to record the chunk mapping too
+
+    Returns:
+        int: Conversations imported
+    """
+    known = store.conversation_ids()
+    imported = 0
+    for path in sorted(transcripts_dir.glob("*.txt")):
+        if path.stem in known:
+            continue
+        try:
+            with open(path, "r") as f:
+                segments = list(parse_segments(f))
+            store.save(path.stem, segments, chunks=chunk_segments(segments) if chunk_segments else None, source="import")
+            imported += 1
+        except Exception as e:
+            logger.warning("Could not import transcript %s: %s", path.name, e)
+    if imported:
+        logger.info("Imported %d transcript file(s) into the transcript store", imported)
+    return imported
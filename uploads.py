@@ -0,0 +1,305 @@
+"""
+Streaming and resumable audio uploads
+
+Uploaded bytes are written in fixed-size blocks off the event loop. The same
+pass enforces the size limit, computes the SHA-256 used for deduplication and
+sniffs the audio container from the first bytes, so the file is never re-read.
+
+Large recordings can use the resumable protocol instead of one multipart
+POST: a session is created with the expected size, chunks are appended with
+PATCH at an explicit offset, and the upload is finalized once every byte has
+arrived. Sessions are kept as a .part file plus a JSON sidecar, so a client
+can ask for the current offset and continue after a dropped connection or a
+server restart. Appends and the finalize of one session are serialized, and a
+finalized session stays marked as completed until it expires, so a repeated
+finalize is told so instead of failing on the moved file.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+from fastapi.concurrency import run_in_threadpool
+
+# Leading bytes needed to recognize the supported containers
+SNIFF_BYTES = 12
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UploadCompleted(ValueError):
+    def __init__(self, upload_id):
+        super().__init__(f"Upload already finalized: {upload_id}")
+        self.upload_id = upload_id
+
+
+class UploadOffsetMismatch(ValueError):
+    def __init__(self, expected):
+        super().__init__(f"Upload offset mismatch; the server has {expected} bytes")
+        self.expected = expected
+
+
+def sniff_audio_format(header):
+    """
+    Recognize an audio container from its first bytes
+
+    Returns:
+        str: "wav", "mp3", "flac", "ogg" or "m4a", or None if unrecognized
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[4:8] == b"ftyp":
+        return "m4a"
+    # ID3 tag, or a bare MPEG audio frame sync
+    if header[:3] == b"ID3" or (len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
+
+class UploadDigest:
+    """Running size, SHA-256 and header of bytes as they are written"""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.header = b""
+        self._sha256 = hashlib.sha256()
+
+    def update(self, block):
+        if self.max_bytes is not None and self.size + len(block) > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the {self.max_bytes} byte limit")
+        if len(self.header) < SNIFF_BYTES:
+            self.header += block[:SNIFF_BYTES - len(self.header)]
+        self._sha256.update(block)
+        self.size += len(block)
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+    @property
+    def audio_format(self):
+        return sniff_audio_format(self.header)
+
+
+def save_upload(source, path, max_bytes=None, chunk_size=1024 * 1024):
+    """
+    Copy a file object to path in fixed-size blocks, digesting the bytes on the way
+
+    Args:
+        source: Readable binary file object
+        path (str): Destination file (removed again if the upload is too large)
+        max_bytes (int, optional): Size limit
+        chunk_size (int): Bytes read per block
+
+    Returns:
+        UploadDigest: Size, SHA-256 and sniffed format of the written bytes
+    """
+    digest = UploadDigest(max_bytes)
+    try:
+        with open(path, "wb") as destination:
+            while True:
+                block = source.read(chunk_size)
+                if not block:
+                    break
+                digest.update(block)
+                destination.write(block)
+    except UploadTooLarge:
+        os.remove(path)
+        raise
+    return digest
+
+
+class ResumableUploads:
+    """Upload sessions stored as <upload_id>.part with a <upload_id>.json sidecar"""
+
+    def __init__(self, root_dir, max_bytes, chunk_size=1024 * 1024, ttl_seconds=24 * 3600):
+        """
+        Args:
+            root_dir (str): Directory for partial uploads
+            max_bytes (int): Largest accepted upload
+            chunk_size (int): Bytes buffered per disk write
+            ttl_seconds (float): Age after which abandoned sessions are removed
+        """
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.ttl_seconds = ttl_seconds
+        # Digests of sessions appended to by this process; rebuilt from disk after a restart
+        self._digests = {}
+        self._locks = {}
+
+    def _paths(self, upload_id):
+        return self.root_dir / f"{upload_id}.part", self.root_dir / f"{upload_id}.json"
+
+    def create(self, filename, conversation_name, size):
+        """
+        Start an upload session
+
+        Returns:
+            dict: The session (upload_id, filename, conversation_name, size, offset, ...)
+        """
+        if size > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the {self.max_bytes} byte limit")
+        self.cleanup()
+        session = {
+            "upload_id": uuid.uuid4().hex,
+            "filename": filename,
+            "conversation_name": conversation_name,
+            "size": size,
+            "offset": 0,
+            "created_at": time.time(),
+            "updated_at": time.time()
+        }
+        part_path, _ = self._paths(session["upload_id"])
+        part_path.touch()
+        self._save(session)
+        self._digests[session["upload_id"]] = UploadDigest(self.max_bytes)
+        return session
+
+    def get(self, upload_id):
+        _, meta_path = self._paths(upload_id)
+        if not meta_path.exists():
+            return None
+        with open(meta_path, "r") as f:
+            return json.load(f)
+
+    async def append(self, upload_id, offset, stream):
+        """
+        Append a request body at offset
+
+        Args:
+            upload_id (str): Session id
+            offset (int): Byte offset the client is sending from; must equal the session offset
+            stream: Async iterator of body bytes (Request.stream())
+
+        Returns:
+            dict: The updated session
+        """
+        session = await self._session(upload_id)
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        if lock.locked():
+            # Another PATCH (or the finalize) for this session is still running
+            raise UploadOffsetMismatch(session["offset"])
+        async with lock:
+            session = await self._session(upload_id)
+            if offset != session["offset"]:
+                raise UploadOffsetMismatch(session["offset"])
+            digest = self._digests.get(upload_id)
+            if digest is not None and digest.size != offset:
+                digest = None
+            self._digests.pop(upload_id, None)
+
+            part_path, _ = self._paths(upload_id)
+            destination = await run_in_threadpool(open, part_path, "r+b")
+            try:
+                await run_in_threadpool(destination.seek, offset)
+                await run_in_threadpool(destination.truncate)
+                buffer = bytearray()
+                async for block in stream:
+                    if session["offset"] + len(buffer) + len(block) > session["size"]:
+                        raise UploadTooLarge("Chunk runs past the declared upload size")
+                    buffer += block
+                    if len(buffer) >= self.chunk_size:
+                        await self._write(destination, buffer, digest, session)
+                        buffer = bytearray()
+                if buffer:
+                    await self._write(destination, buffer, digest, session)
+            finally:
+                # Whatever reached the disk counts, so an interrupted chunk resumes from there
+                await run_in_threadpool(destination.close)
+                session["updated_at"] = time.time()
+                await run_in_threadpool(self._save, session)
+                if digest is not None:
+                    self._digests[upload_id] = digest
+        return session
+
+    async def _write(self, destination, buffer, digest, session):
+        block = bytes(buffer)
+        if digest is not None:
+            digest.update(block)
+        await run_in_threadpool(destination.write, block)
+        session["offset"] += len(block)
+
+    async def complete(self, upload_id, target_path):
+        """
+        Move a fully received upload to target_path
+
+        Returns:
+            UploadDigest: Size, SHA-256 and sniffed format of the upload
+
+        Raises:
+            KeyError: No such session
+            UploadCompleted: The session was already finalized
+            UploadOffsetMismatch: Not every byte has arrived yet
+        """
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        async with lock:
+            session = await self._session(upload_id)
+            if session["offset"] != session["size"]:
+                raise UploadOffsetMismatch(session["offset"])
+            part_path, _ = self._paths(upload_id)
+            digest = self._digests.pop(upload_id, None)
+            try:
+                if digest is None or digest.size != session["size"]:
+                    # The session was resumed across a restart, so its running hash is gone
+                    digest = await run_in_threadpool(self._digest_file, part_path)
+                # The rename claims the upload; another process finalizing it finds the part file gone
+                await run_in_threadpool(os.replace, part_path, target_path)
+            except FileNotFoundError:
+                raise UploadCompleted(upload_id)
+            session["completed_at"] = session["updated_at"] = time.time()
+            await run_in_threadpool(self._save, session)
+        return digest
+
+    async def _session(self, upload_id):
+        session = await run_in_threadpool(self.get, upload_id)
+        if session is None:
+            raise KeyError(upload_id)
+        if session.get("completed_at"):
+            raise UploadCompleted(upload_id)
+        return session
+
+    def _digest_file(self, path):
+        digest = UploadDigest(self.max_bytes)
+        with open(path, "rb") as source:
+            for block in iter(lambda: source.read(self.chunk_size), b""):
+                digest.update(block)
+        return digest
+
+    def discard(self, upload_id):
+        part_path, meta_path = self._paths(upload_id)
+        part_path.unlink(missing_ok=True)
+        meta_path.unlink(missing_ok=True)
+        self._digests.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+
+    def cleanup(self):
+        """Remove sessions (and completed markers) untouched for longer than ttl_seconds"""
+        cutoff = time.time() - self.ttl_seconds
+        for meta_path in self.root_dir.glob("*.json"):
+            try:
+                with open(meta_path, "r") as f:
+                    updated_at = json.load(f).get("updated_at", 0)
+            except (OSError, ValueError):
+                continue
+            if updated_at < cutoff:
+                self.discard(meta_path.stem)
+
+    def _save(self, session):
+        _, meta_path = self._paths(session["upload_id"])
+        tmp_path = meta_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(session, f)
+        os.replace(tmp_path, meta_path)
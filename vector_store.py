@@ -0,0 +1,466 @@
+"""
+Retrieval backends for transcript chunks
+
+Both backends store chunk vectors produced by the app's embedder and answer
+top-k queries within one conversation:
+
+- WeaviateVectorStore keeps chunks in the AudioTranscript class of a Weaviate instance
+- NumpyVectorStore keeps each conversation as a memory-mapped float32 matrix
+  (vectors.npy) with a JSON metadata sidecar, searched in-process
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from conversation_ids import check_conversation_id
+
+logger = logging.getLogger(__name__)
+
+CLASS_NAME = "AudioTranscript"
+
+
+class VectorStore:
+    """Interface shared by the retrieval backends"""
+
+    name = "base"
+
+    def add(self, conversation_id, chunks, vectors, spans=None, on_progress=None, start=0):
+        """
+        Store chunks with their vectors, replacing any existing chunks at the same index
+
+        Args:
+            conversation_id (str): Conversation the chunks belong to
+            chunks (list): Chunk texts
+            vectors (numpy.ndarray): (len(chunks), dimension) float32 array
+            spans (list, optional): Per-chunk (start, end) seconds in the audio; None entries when untimed
+            on_progress (callable, optional): Called with the fraction of chunks stored
+            start (int): Position of the first chunk; the chunks before it are kept (used to append
+                to a growing live transcript without storing it again)
+
+        Returns:
+            dict: "indexed" count, "total" count and a "failed" list of {index, uuid, error}
+        """
+        raise NotImplementedError
+
+    def search(self, conversation_id, query_vector, limit=3):
+        """
+        Returns:
+            list: Hits as dicts with "content", "conversation_id", "timestamp" (start seconds),
+            "end_timestamp" and "score", best first
+        """
+        raise NotImplementedError
+
+    def search_many(self, conversation_id, query_vectors, limit=3):
+        """
+        Search one conversation for several query vectors
+
+        Backends override this when they can answer all queries in one pass.
+
+        Returns:
+            list: One hit list (as returned by search) per query vector, in order
+        """
+        return [self.search(conversation_id, query_vector, limit) for query_vector in query_vectors]
+
+    def export(self, conversation_id):
+        """
+        Read back a conversation's stored chunks
+
+        Returns:
+            tuple: (chunk texts, (n, dimension) float32 vectors, per-chunk (start, end) spans), in chunk order
+        """
+        raise NotImplementedError
+
+    def delete(self, conversation_id):
+        raise NotImplementedError
+
+    def list_conversations(self):
+        """
+        Returns:
+            list: Ids of every conversation with stored chunks
+        """
+        raise NotImplementedError
+
+    def is_ready(self):
+        """Whether the backend can serve reads and writes right now (used by /readyz)"""
+        return True
+
+
+class WeaviateVectorStore(VectorStore):
+    name = "weaviate"
+
+    def __init__(self, client, batch_size=100, max_conversations=100_000):
+        self.client = client
+        self.batch_size = batch_size
+        self.max_conversations = max_conversations
+        # The Weaviate batch object is shared by the client, so ingestion workers take turns using it
+        self._batch_lock = threading.Lock()
+
+    def is_ready(self):
+        try:
+            return self.client.is_ready()
+        except Exception:
+            return False
+
+    def setup_schema(self):
+        """Create the AudioTranscript class if it doesn't exist"""
+        try:
+            # Check if schema exists
+            schema = self.client.schema.get()
+            if not any(cls["class"] == CLASS_NAME for cls in schema["classes"]):
+                # Create schema for audio transcripts
+                class_obj = {
+                    "class": CLASS_NAME,
+                    "description": "Transcripts from audio files",
+                    "properties": [
+                        {
+                            "name": "conversation_id",
+                            "dataType": ["string"],
+                            "description": "Unique identifier for the conversation"
+                        },
+                        {
+                            "name": "content",
+                            "dataType": ["text"],
+                            "description": "Transcribed text content"
+                        },
+                        {
+                            "name": "timestamp",
+                            "dataType": ["number"],
+                            "description": "Timestamp in the audio (in seconds)"
+                        },
+                        {
+                            "name": "end_timestamp",
+                            "dataType": ["number"],
+                            "description": "End of the chunk in the audio (in seconds)"
+                        }
+                    ],
+                    # Vectors come from the app's embedder (see embeddings.py)
+                    "vectorizer": "none"
+                }
+                self.client.schema.create_class(class_obj)
+        except Exception as e:
+            logger.warning("Error setting up Weaviate schema: %s", e)
+            # Continue anyway, as we might be using an external Weaviate instance
+
+    @staticmethod
+    def chunk_uuid(conversation_id, chunk_index):
+        """Deterministic object id so re-indexing a conversation overwrites instead of duplicating"""
+        from weaviate.util import generate_uuid5
+
+        return generate_uuid5(f"{conversation_id}:{chunk_index}", CLASS_NAME)
+
+    def add(self, conversation_id, chunks, vectors, spans=None, on_progress=None, start=0):
+        import weaviate
+
+        uuid_to_index = {}
+        failed = []
+        completed = 0
+
+        def on_batch_result(results):
+            nonlocal completed
+            for result in results or []:
+                completed += 1
+                errors = result.get("result", {}).get("errors")
+                if errors:
+                    object_uuid = result.get("id")
+                    message = "; ".join(error.get("message", "") for error in errors.get("error", [])) or str(errors)
+                    failed.append({"index": uuid_to_index.get(object_uuid), "uuid": object_uuid, "error": message})
+            if on_progress and chunks:
+                on_progress(completed / len(chunks))
+
+        with self._batch_lock:
+            # dynamic=True resizes batches from the observed creation time of previous batches
+            self.client.batch.configure(
+                batch_size=self.batch_size,
+                dynamic=True,
+                timeout_retries=3,
+                weaviate_error_retries=weaviate.WeaviateErrorRetryConf(number_retries=2),
+                callback=on_batch_result
+            )
+            with self.client.batch as batch:
+                for i, chunk in enumerate(chunks):
+                    # Object ids are keyed by position, so chunks before `start` are left untouched
+                    object_uuid = self.chunk_uuid(conversation_id, start + i)
+                    uuid_to_index[object_uuid] = start + i
+                    span_start, span_end = spans[i] if spans else (None, None)
+                    properties = {
+                        "conversation_id": conversation_id,
+                        "content": chunk,
+                        # Untimed transcripts fall back to the chunk index
+                        "timestamp": span_start if span_start is not None else start + i
+                    }
+                    if span_end is not None:
+                        properties["end_timestamp"] = span_end
+                    batch.add_data_object(
+                        data_object=properties,
+                        class_name=CLASS_NAME,
+                        uuid=object_uuid,
+                        vector=vectors[i].tolist()
+                    )
+
+        # A conversation re-indexed with fewer chunks would otherwise keep its old tail as stale context
+        end = start + len(chunks)
+        try:
+            self._delete_positions(conversation_id, range(end, self._count(conversation_id)))
+        except Exception as e:
+            logger.error("Error removing stale chunks of %s past position %d: %s", conversation_id, end, e)
+
+        return {"indexed": len(chunks) - len(failed), "total": len(chunks), "failed": failed}
+
+    @staticmethod
+    def _conversation_filter(conversation_id):
+        return {"path": ["conversation_id"], "operator": "Equal", "valueString": conversation_id}
+
+    def _count(self, conversation_id):
+        result = self.client.query.aggregate(CLASS_NAME).with_where(
+            self._conversation_filter(conversation_id)
+        ).with_meta_count().do()
+        groups = (result or {}).get("data", {}).get("Aggregate", {}).get(CLASS_NAME) or []
+        return int(groups[0]["meta"]["count"]) if groups else 0
+
+    def _delete_positions(self, conversation_id, positions):
+        operands = [
+            {"path": ["id"], "operator": "Equal", "valueString": self.chunk_uuid(conversation_id, i)} for i in positions
+        ]
+        if not operands:
+            return
+        self.client.batch.delete_objects(
+            class_name=CLASS_NAME,
+            where=operands[0] if len(operands) == 1 else {"operator": "Or", "operands": operands}
+        )
+
+    def _near_vector_query(self, conversation_id, query_vector, limit):
+        return self.client.query.get(
+            CLASS_NAME,
+            ["content", "conversation_id", "timestamp", "end_timestamp"]
+        ).with_where({
+            "path": ["conversation_id"],
+            "operator": "Equal",
+            "valueString": conversation_id
+        }).with_near_vector({
+            "vector": np.asarray(query_vector).tolist()
+        }).with_additional(["distance"]).with_limit(limit)
+
+    @staticmethod
+    def _hits(items, conversation_id):
+        return [
+            {
+                "content": item["content"],
+                "conversation_id": item.get("conversation_id", conversation_id),
+                "timestamp": item.get("timestamp"),
+                "end_timestamp": item.get("end_timestamp"),
+                # Cosine distance -> similarity, to match NumpyVectorStore scores
+                "score": 1.0 - float((item.get("_additional") or {}).get("distance") or 0.0)
+            }
+            for item in items or []
+        ]
+
+    @staticmethod
+    def _get_results(query_result):
+        """The "Get" section of a GraphQL response ({} when the query failed)"""
+        query_result = query_result or {}
+        if query_result.get("errors"):
+            logger.warning("Weaviate query failed: %s", query_result["errors"])
+        return (query_result.get("data") or {}).get("Get") or {}
+
+    def search(self, conversation_id, query_vector, limit=3):
+        results = self._get_results(self._near_vector_query(conversation_id, query_vector, limit).do())
+        return self._hits(results.get(CLASS_NAME), conversation_id)
+
+    def search_many(self, conversation_id, query_vectors, limit=3):
+        if len(query_vectors) == 0:
+            return []
+        if len(query_vectors) == 1:
+            return [self.search(conversation_id, query_vectors[0], limit)]
+        # One GraphQL request with an aliased nearVector query per question
+        query_result = self.client.query.multi_get([
+            self._near_vector_query(conversation_id, query_vector, limit).with_alias(f"q{i}")
+            for i, query_vector in enumerate(query_vectors)
+        ]).do()
+        results = self._get_results(query_result)
+        return [self._hits(results.get(f"q{i}"), conversation_id) for i in range(len(query_vectors))]
+
+    def export(self, conversation_id, page_size=500):
+        where = self._conversation_filter(conversation_id)
+        total = self._count(conversation_id)
+        # Object ids are derived from the chunk index, which recovers the chunk order
+        uuid_to_index = {self.chunk_uuid(conversation_id, i): i for i in range(total)}
+        chunks, vectors, spans = [None] * total, [None] * total, [None] * total
+
+        for offset in range(0, total, page_size):
+            query_result = self.client.query.get(
+                CLASS_NAME,
+                ["content", "timestamp", "end_timestamp"]
+            ).with_where(where).with_additional(["id", "vector"]).with_limit(page_size).with_offset(offset).do()
+            for item in (query_result or {}).get("data", {}).get("Get", {}).get(CLASS_NAME) or []:
+                i = uuid_to_index.get(item["_additional"]["id"])
+                if i is None:
+                    continue
+                chunks[i] = item["content"]
+                vectors[i] = item["_additional"]["vector"]
+                spans[i] = (item.get("timestamp"), item.get("end_timestamp"))
+
+        if any(chunk is None for chunk in chunks):
+            raise ValueError(f"Could not read back every chunk of conversation {conversation_id}")
+        return chunks, np.array(vectors, dtype=np.float32).reshape(total, -1), spans
+
+    def list_conversations(self):
+        result = self.client.query.aggregate(CLASS_NAME).with_group_by_filter(
+            ["conversation_id"]
+        ).with_fields("groupedBy { value }").with_limit(self.max_conversations).do()
+        groups = (result or {}).get("data", {}).get("Aggregate", {}).get(CLASS_NAME) or []
+        return [group["groupedBy"]["value"] for group in groups]
+
+    def delete(self, conversation_id):
+        self.client.batch.delete_objects(class_name=CLASS_NAME, where=self._conversation_filter(conversation_id))
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process backend: one directory per conversation holding vectors.npy
+    (float32, L2-normalized rows) and meta.json (chunk texts and timestamps).
+    Matrices are opened memory-mapped on first use, and only the most recently
+    used conversations are kept open.
+    """
+
+    name = "numpy"
+
+    def __init__(self, root_dir, max_open=256):
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _conversation_dir(self, conversation_id):
+        return self.root_dir / check_conversation_id(conversation_id)
+
+    def add(self, conversation_id, chunks, vectors, spans=None, on_progress=None, start=0):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(vectors) != len(chunks):
+            raise ValueError(f"Got {len(vectors)} vectors for {len(chunks)} chunks")
+        stored = [
+            {
+                "content": chunk,
+                "timestamp": spans[i][0] if spans and spans[i][0] is not None else start + i,
+                "end_timestamp": spans[i][1] if spans else None
+            }
+            for i, chunk in enumerate(chunks)
+        ]
+        if start:
+            # Splice after the kept chunks; only the new rows are built in Python
+            kept_matrix, kept_chunks = self._load(conversation_id) or (None, [])
+            if len(kept_chunks) < start:
+                raise ValueError(f"Cannot store chunks from position {start}; {len(kept_chunks)} are stored")
+            vectors = np.concatenate([kept_matrix[:start], vectors])
+            stored = kept_chunks[:start] + stored
+        meta = {
+            "conversation_id": conversation_id,
+            "dimension": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+            "chunks": stored
+        }
+
+        conversation_dir = self._conversation_dir(conversation_id)
+        conversation_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._open.pop(conversation_id, None)
+            # Write to temp files and rename so readers never see a half-written matrix
+            np.save(conversation_dir / "vectors.tmp.npy", vectors)
+            with open(conversation_dir / "meta.tmp.json", "w") as f:
+                json.dump(meta, f)
+            os.replace(conversation_dir / "vectors.tmp.npy", conversation_dir / "vectors.npy")
+            os.replace(conversation_dir / "meta.tmp.json", conversation_dir / "meta.json")
+
+        if on_progress:
+            on_progress(1.0)
+        return {"indexed": len(chunks), "total": len(chunks), "failed": []}
+
+    def _load(self, conversation_id):
+        with self._lock:
+            if conversation_id in self._open:
+                self._open.move_to_end(conversation_id)
+                return self._open[conversation_id]
+            conversation_dir = self._conversation_dir(conversation_id)
+            if not (conversation_dir / "vectors.npy").exists():
+                return None
+            matrix = np.load(conversation_dir / "vectors.npy", mmap_mode="r")
+            with open(conversation_dir / "meta.json", "r") as f:
+                meta = json.load(f)
+            self._open[conversation_id] = (matrix, meta["chunks"])
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+            return self._open[conversation_id]
+
+    def search(self, conversation_id, query_vector, limit=3):
+        loaded = self._load(conversation_id)
+        if loaded is None:
+            return []
+        matrix, chunks = loaded
+        if len(chunks) == 0:
+            return []
+        scores = matrix @ np.asarray(query_vector, dtype=np.float32)
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {
+                "content": chunks[i]["content"],
+                "conversation_id": conversation_id,
+                "timestamp": chunks[i]["timestamp"],
+                "end_timestamp": chunks[i].get("end_timestamp"),
+                "score": float(scores[i])
+            }
+            for i in top
+        ]
+
+    def search_many(self, conversation_id, query_vectors, limit=3):
+        loaded = self._load(conversation_id)
+        if loaded is None or len(query_vectors) == 0:
+            return [[] for _ in query_vectors]
+        matrix, chunks = loaded
+        if len(chunks) == 0:
+            return [[] for _ in query_vectors]
+        # One (chunks x queries) product instead of a pass over the matrix per question
+        scores = matrix @ np.asarray(query_vectors, dtype=np.float32).T
+        k = min(limit, len(chunks))
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        results = []
+        for column in range(scores.shape[1]):
+            column_top = top[:, column]
+            column_top = column_top[np.argsort(-scores[column_top, column])]
+            results.append([
+                {
+                    "content": chunks[i]["content"],
+                    "conversation_id": conversation_id,
+                    "timestamp": chunks[i]["timestamp"],
+                    "end_timestamp": chunks[i].get("end_timestamp"),
+                    "score": float(scores[i, column])
+                }
+                for i in column_top
+            ])
+        return results
+
+    def export(self, conversation_id):
+        loaded = self._load(conversation_id)
+        if loaded is None:
+            return [], np.zeros((0, 0), dtype=np.float32), []
+        matrix, chunks = loaded
+        return (
+            [chunk["content"] for chunk in chunks],
+            np.array(matrix, dtype=np.float32),
+            [(chunk["timestamp"], chunk.get("end_timestamp")) for chunk in chunks]
+        )
+
+    def list_conversations(self):
+        return sorted(path.parent.name for path in self.root_dir.glob("*/vectors.npy"))
+
+    def delete(self, conversation_id):
+        with self._lock:
+            self._open.pop(conversation_id, None)
+            shutil.rmtree(self._conversation_dir(conversation_id), ignore_errors=True)